@@ -2,14 +2,40 @@
 Aplicación principal FastAPI para procesamiento de audio
 """
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 import os
 
 from backend.controlador.rutas_audio import router as router_audio
 from backend.controlador.rutas_web import router as router_web
+from backend.controlador.middleware_metricas import MiddlewareMetricas
+from backend.controlador.middleware_bitacora import MiddlewareIdSolicitud
+from backend.controlador.middleware_limite import MiddlewareLimiteCuerpo
+from backend.servicios.ejecutor import ejecutor_trabajos, ColaLlenaError
+from backend.servicios.trabajos import cola_trabajos
+from backend.servicios.servicio_audio import servicio_audio, ArchivoDemasiadoGrandeError
+from backend.servicios.metricas import metricas, TIPO_CONTENIDO
+from backend.configuracion import config
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """Inicializar y liberar recursos de la aplicación"""
+    await cola_trabajos.iniciar()
+    await servicio_audio.recolector.iniciar()
+    # Detección de ffmpeg e imports pesados en segundo plano: el servidor
+    # acepta peticiones sin esperarlos
+    precarga = asyncio.create_task(asyncio.to_thread(servicio_audio.precargar)) if config.PRECARGAR_AL_INICIAR else None
+    yield
+    if precarga is not None:
+        await asyncio.gather(precarga, return_exceptions=True)
+    await servicio_audio.recolector.detener()
+    await cola_trabajos.detener()
+    ejecutor_trabajos.cerrar()
 
 # Crear instancia de FastAPI
 aplicacion = FastAPI(
@@ -17,9 +43,22 @@ aplicacion = FastAPI(
     description="API para procesar, convertir y analizar archivos de audio",
     version="1.0.0",
     docs_url="/documentacion",
-    redoc_url="/documentacion-redoc"
+    redoc_url="/documentacion-redoc",
+    lifespan=ciclo_de_vida
 )
 
+# Tamaño de las subidas, controlado mientras llega el cuerpo
+aplicacion.add_middleware(MiddlewareLimiteCuerpo, limites={
+    "/api/audio/subir": (
+        config.MAX_TAMANO_ARCHIVO + config.MARGEN_MULTIPART,
+        str(ArchivoDemasiadoGrandeError(config.MAX_TAMANO_ARCHIVO))
+    ),
+    "/api/audio/subir-lote": (
+        config.MAX_TAMANO_LOTE,
+        f"El lote es demasiado grande. Máximo {config.MAX_TAMANO_LOTE // (1024 * 1024)}MB"
+    ),
+})
+
 # CORS abierto para desarrollo
 aplicacion.add_middleware(
     CORSMiddleware,
@@ -29,6 +68,20 @@ aplicacion.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia y bytes por ruta
+aplicacion.add_middleware(MiddlewareMetricas)
+# ID de petición para la bitácora (se agrega último para envolver a los demás)
+aplicacion.add_middleware(MiddlewareIdSolicitud)
+
+@aplicacion.exception_handler(ColaLlenaError)
+async def manejar_cola_llena(request: Request, error: ColaLlenaError):
+    """Responder 503 con Retry-After cuando el pool de trabajos está saturado"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(error.reintentar_despues)}
+    )
+
 # Configurar archivos estáticos
 ruta_estaticos = os.path.join(os.path.dirname(__file__), "..", "frontend", "estaticos")
 if os.path.exists(ruta_estaticos):
@@ -54,4 +107,9 @@ async def raiz():
 @aplicacion.get("/salud")
 async def verificar_salud():
     """Endpoint para verificar el estado de la aplicación"""
-    return {"estado": "funcionando", "servicio": "procesamiento_audio"} 
\ No newline at end of file
+    return {"estado": "funcionando", "servicio": "procesamiento_audio"} 
+
+@aplicacion.get("/metricas", include_in_schema=False)
+async def exponer_metricas():
+    """Métricas del proceso en el formato de texto de Prometheus"""
+    return Response(content=metricas.exponer(), media_type=TIPO_CONTENIDO)
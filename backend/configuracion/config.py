@@ -2,6 +2,8 @@
 Configuración del sistema (editable directamente)
 """
 
+import os
+
 # Configuración principal
 NOMBRE_APLICACION = "Sistema de Procesamiento de Audio"
 VERSION = "1.0.0"
@@ -15,13 +17,103 @@ PUERTO = 8000
 DIRECTORIO_UPLOADS = "uploads"
 DIRECTORIO_TEMPORALES = "temp"
 MAX_TAMANO_ARCHIVO = 50 * 1024 * 1024  # 50MB
+TAMANO_BLOQUE_SUBIDA = 1024 * 1024  # Las subidas se copian a disco en bloques de 1MB
+MAX_ARCHIVOS_LOTE = 200  # Archivos por subida en lote, contando los de los comprimidos
+MAX_TAMANO_LOTE = 1024 * 1024 * 1024  # 1GB por subida en lote
+MARGEN_MULTIPART = 64 * 1024  # Cabeceras multipart que se toleran sobre MAX_TAMANO_ARCHIVO
 
 # Audio
 FORMATOS_AUDIO_PERMITIDOS = [".wav", ".mp3", ".flac", ".ogg", ".m4a", ".webm"]
 FRECUENCIA_MUESTREO_DEFAULT = 40000
 BITS_DEFAULT = 16
+TAMANO_BLOQUE_CONVERSION = 65536  # Muestras por bloque al convertir (memoria acotada)
+MAX_DESTINOS_LOTE = 16  # Configuraciones por conversión en lote
+# Formatos que ffmpeg puede decodificar leyendo de una tubería (sin acceso aleatorio)
+FORMATOS_TRANSCODIFICACION_TUBERIA = [".mp3", ".flac", ".ogg", ".webm"]
 
-import os
+# Procesamiento concurrente
+TRABAJADORES_POOL = os.cpu_count() or 2  # Hilos para decodificar, convertir y analizar
+TRABAJADORES_PROCESOS = 0  # Procesos para cálculos puros (FFT); 0 = deshabilitado
+MAX_TRABAJOS_EN_COLA = 32  # Trabajos en espera antes de responder 503
+SUBIDAS_LOTE_EN_PARALELO = TRABAJADORES_POOL  # Archivos de un mismo lote decodificándose a la vez
+REINTENTAR_DESPUES_SEGUNDOS = 5  # Valor de la cabecera Retry-After
+
+# Arranque: detectar ffmpeg e importar scipy.signal en segundo plano al iniciar
+# (si es False, se hace con la primera petición que los necesita)
+PRECARGAR_AL_INICIAR = True
+
+# ffmpeg: lo detectado (ruta, versión y códecs) se guarda para los procesos siguientes
+RUTA_CACHE_FFMPEG = os.path.join(DIRECTORIO_TEMPORALES, "ffmpeg.json")
+
+# Registro de archivos subidos
+REGISTRO_ARCHIVOS = "sqlite"  # "sqlite" (compartido entre procesos) o "memoria" (un solo proceso)
+RUTA_BASE_REGISTRO = os.path.join(DIRECTORIO_TEMPORALES, "registro.sqlite3")
+INTERVALO_ACCESO_SEGUNDOS = 30  # Frecuencia máxima con que se guarda el último acceso de un archivo
+
+# Almacenamiento de los WAV
+ALMACENAMIENTO = "local"  # "local" (disco del nodo) o "s3" (S3 o compatible; el disco queda como caché)
+S3_BUCKET = "audio"
+S3_PREFIJO = "wav/"  # Prefijo de las claves de los objetos
+S3_URL = None  # Endpoint de un servicio compatible, p. ej. "http://localhost:9000" para MinIO
+S3_REGION = None
+TAMANO_PARTE_S3 = 8 * 1024 * 1024  # Partes de las subidas y descargas multiparte
+TAMANO_BLOQUE_DESCARGA = 256 * 1024  # Bytes por bloque al reenviar una descarga desde S3
+
+# Recolección de temporales
+TTL_TEMPORALES_SEGUNDOS = 2 * 3600  # Archivos sin acceso durante este tiempo se eliminan
+CUOTA_TEMPORALES_BYTES = 5 * 1024 * 1024 * 1024  # 5GB; al superarla se eliminan los menos usados
+INTERVALO_RECOLECCION_SEGUNDOS = 60  # Cada cuánto se revisa el directorio de temporales
+GRACIA_HUERFANOS_SEGUNDOS = 600  # Antigüedad mínima de un archivo sin registrar para borrarlo
+
+# Trabajos en segundo plano (conversiones largas)
+TRABAJADORES_FONDO = 2  # Trabajos procesados a la vez
+MAX_TRABAJOS_FONDO_EN_COLA = 100  # Trabajos sin terminar antes de responder 503
+RUTA_BASE_TRABAJOS = os.path.join(DIRECTORIO_TEMPORALES, "trabajos.sqlite3")
+INTERVALO_PROGRESO_SEGUNDOS = 0.5  # Cada cuánto se guarda y se publica el progreso
+RETENCION_TRABAJOS_SEGUNDOS = 24 * 3600  # Los trabajos terminados se borran después de un día
+
+# Escucha previa comprimida
+BITRATE_PREVIA_OPUS = "96k"
+BITRATE_PREVIA_MP3 = "128k"
+MAX_CANALES_PREVIA = 2  # Las previas con pérdida se mezclan a estéreo
+TAMANO_BLOQUE_PREVIA = 16 * 1024  # Bytes leídos de ffmpeg por bloque enviado
+
+# Grabación con análisis en vivo (WebSocket)
+FOTOGRAMAS_POR_SEGUNDO_VIVO = 15  # Actualizaciones de envolvente y espectro enviadas por segundo
+SEGUNDOS_ONDA_VIVO = 10.0  # Segundos más recientes que muestra la envolvente
+PUNTOS_ONDA_VIVO = 500  # Puntos de la envolvente
+LONGITUD_SEGMENTO_VIVO = 2048  # Muestras de la ventana del espectro
+BINS_ESPECTRO_VIVO = 256  # Bins del espectro enviados
+
+# Caché HTTP de las lecturas (descargas y análisis)
+MAX_EDAD_CACHE_SEGUNDOS = 3600  # Respuestas de una variante fija; las que dependen del procesado actual se revalidan
+
+# Bitácora
+NIVEL_BITACORA = "INFO"  # DEBUG agrega el detalle de cada subida (extensión, bytes, transcodificación)
+FORMATO_BITACORA = "json"  # "json" (una línea por registro) o "texto"
+MAX_REGISTROS_EN_COLA = 10000  # Registros pendientes de escribir antes de descartar
+
+# Caché
+MEMORIA_CACHE_MUESTRAS = 256 * 1024 * 1024  # 256MB de muestras decodificadas (float32)
+MAX_BYTES_ENTRADA_CACHE = 64 * 1024 * 1024  # Archivos más grandes se procesan por bloques sin cachear
+MAX_PIRAMIDES_EN_MEMORIA = 64  # Pirámides de forma de onda que se mantienen cargadas
+
+# Estadísticas al subir
+UMBRAL_RECORTE = 32767 / 32768  # |muestra| desde la que se cuenta como recortada (fondo de escala en 16 bits)
+
+# Forma de onda
+MUESTRAS_POR_BLOQUE_ONDA = 256  # Resolución del nivel base de la pirámide de envolventes
+
+# Espectro (método de Welch)
+VENTANA_ESPECTRO_DEFAULT = "hann"
+SOLAPAMIENTO_ESPECTRO_DEFAULT = 0.5  # Fracción de solapamiento entre segmentos
+MAX_LONGITUD_SEGMENTO_ESPECTRO = 65536  # Limita la memoria y el costo de cada FFT
+
+# Espectrograma
+LONGITUD_VENTANA_ESPECTROGRAMA = 1024  # Muestras por trama de la STFT (512 bins)
+SALTO_ESPECTROGRAMA = 256  # Muestras entre tramas consecutivas
+TAMANO_TESELA_ESPECTROGRAMA = 256  # Tramas × bins por tesela
+RANGO_DB_ESPECTROGRAMA = (-120.0, 0.0)  # dBFS que se mapean a 0..255
 
 def crear_directorios():
     """Crear directorios necesarios para la aplicación"""
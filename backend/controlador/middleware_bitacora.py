@@ -0,0 +1,66 @@
+"""
+Middleware de ID de petición
+Toma el ID de la cabecera X-Request-ID (o genera uno), lo deja en el contexto
+para que lo lleven todos los registros de la bitácora y lo devuelve en la
+respuesta
+"""
+
+import logging
+import time
+import uuid
+
+from backend.servicios.bitacora import id_solicitud
+
+log = logging.getLogger(__name__)
+
+CABECERA_ID = b"x-request-id"
+MAX_LONGITUD_ID = 128
+
+
+def _id_recibido(scope) -> str:
+    """ID enviado por el cliente o un proxy, si es razonable; si no, uno nuevo"""
+    for nombre, valor in scope.get("headers", ()):
+        if nombre == CABECERA_ID:
+            texto = valor.decode("latin-1").strip()
+            if 0 < len(texto) <= MAX_LONGITUD_ID and texto.isprintable():
+                return texto
+            break
+    return uuid.uuid4().hex
+
+
+class MiddlewareIdSolicitud:
+    """Middleware ASGI puro; con nivel DEBUG registra además cada petición atendida"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        valor = _id_recibido(scope)
+        token = id_solicitud.set(valor)
+        inicio = time.perf_counter()
+        estado = {"codigo": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [(CABECERA_ID, valor.encode("latin-1"))]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception:
+            log.exception("Error no controlado", extra={"metodo": scope["method"], "ruta": scope["path"]})
+            raise
+        finally:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Petición atendida", extra={
+                    "metodo": scope["method"],
+                    "ruta": scope["path"],
+                    "estado": estado["codigo"],
+                    "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2),
+                })
+            id_solicitud.reset(token)
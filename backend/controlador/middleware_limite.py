@@ -0,0 +1,77 @@
+"""
+Middleware de límite de cuerpo
+Corta las subidas que superan el máximo de su ruta a medida que llegan los
+bytes, antes de que FastAPI termine de parsear el multipart (que lo vuelca
+entero a disco antes de llamar al handler). Con Content-Length declarado
+rechaza sin leer el cuerpo; sin él (subidas en bloques) cuenta los bytes
+recibidos.
+"""
+
+import json
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+
+
+class MiddlewareLimiteCuerpo:
+    """
+    Middleware ASGI puro. `limites` asocia cada ruta a (máximo de bytes del
+    cuerpo, mensaje de error); las demás rutas pasan sin tocar.
+    """
+
+    def __init__(self, app, limites: Dict[str, Tuple[int, str]]):
+        self.app = app
+        self.limites = limites
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limites.get(scope["path"]) if scope["type"] == "http" else None
+        if limite is None:
+            await self.app(scope, receive, send)
+            return
+
+        maximo, mensaje = limite
+        for nombre, valor in scope.get("headers", ()):
+            if nombre == b"content-length":
+                if valor.isdigit() and int(valor) > maximo:
+                    await _rechazar(send, mensaje)
+                    return
+                break
+
+        estado = {"recibidos": 0, "iniciada": False}
+
+        async def recibir():
+            mensaje_asgi = await receive()
+            if mensaje_asgi["type"] == "http.request":
+                estado["recibidos"] += len(mensaje_asgi.get("body", b""))
+                if estado["recibidos"] > maximo:
+                    # FastAPI deja pasar las HTTPException que salen de leer el cuerpo
+                    raise HTTPException(status_code=400, detail=mensaje)
+            return mensaje_asgi
+
+        async def enviar(mensaje_asgi):
+            if mensaje_asgi["type"] == "http.response.start":
+                estado["iniciada"] = True
+            await send(mensaje_asgi)
+
+        try:
+            await self.app(scope, recibir, enviar)
+        except HTTPException as e:
+            # Por si el cuerpo se leyó fuera del manejo de errores de FastAPI
+            if estado["iniciada"] or estado["recibidos"] <= maximo:
+                raise
+            await _rechazar(send, e.detail)
+
+
+async def _rechazar(send, mensaje: str):
+    """Responder 400 sin leer el resto del cuerpo"""
+    cuerpo = json.dumps({"detail": mensaje}, separators=(",", ":")).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 400,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(cuerpo)).encode()),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
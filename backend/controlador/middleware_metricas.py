@@ -0,0 +1,109 @@
+"""
+Middleware de métricas HTTP
+Mide la latencia y los bytes de cada petición, etiquetados por la plantilla
+de la ruta (`/api/audio/espectro/{archivo_id}`) y no por la URL concreta
+"""
+
+import inspect
+import time
+
+from backend.servicios.metricas import metricas
+
+duracion_solicitudes = metricas.histograma(
+    "audio_http_duracion_segundos",
+    "Tiempo hasta terminar de enviar la respuesta, por ruta",
+    ["metodo", "ruta", "estado"]
+)
+bytes_recibidos = metricas.contador(
+    "audio_http_bytes_recibidos_total", "Bytes de cuerpo recibidos, por ruta", ["ruta"]
+)
+bytes_enviados = metricas.contador(
+    "audio_http_bytes_enviados_total", "Bytes de cuerpo enviados, por ruta", ["ruta"]
+)
+solicitudes_en_curso = metricas.medidor(
+    "audio_http_solicitudes_en_curso", "Peticiones que todavía no terminaron de responderse"
+)
+
+
+def _ruta(scope) -> str:
+    """
+    Plantilla de la ruta que atendió la petición: la URL con los parámetros
+    de ruta reemplazados por su nombre. Se reconstruye desde el scope para no
+    depender de cómo guarda cada versión de FastAPI las rutas de los routers.
+    """
+    if "endpoint" not in scope:
+        # Sin ruta (404) se agrupa todo para no crear una serie por URL
+        return "otra"
+    if not inspect.isfunction(scope["endpoint"]):
+        # Aplicación montada (archivos estáticos): una sola serie para todo el montaje
+        return scope.get("root_path", "") + "/{path}"
+    plantilla = scope["path"]
+    for nombre, valor in scope.get("path_params", {}).items():
+        valor = str(valor)
+        if not valor:
+            continue
+        if plantilla.endswith("/" + valor):
+            plantilla = plantilla[:-len(valor)] + "{" + nombre + "}"
+        else:
+            plantilla = plantilla.replace("/" + valor + "/", "/{" + nombre + "}/", 1)
+    return plantilla
+
+
+def _largo(cabeceras) -> int:
+    """Content-Length de la respuesta; 0 si no lo declara"""
+    for clave, valor in cabeceras:
+        if clave.lower() == b"content-length":
+            return int(valor) if valor.isdigit() else 0
+    return 0
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI puro: no acumula el cuerpo, así que no afecta a las
+    respuestas en flujo (SSE, escucha, descargas). En esas la latencia
+    registrada es la duración completa del envío. Los archivos enviados por
+    el servidor (zerocopy, pathsend) se cuentan con el largo declarado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = {"codigo": 500, "recibidos": 0, "enviados": 0, "largo": 0}
+
+        async def recibir():
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                estado["recibidos"] += len(mensaje.get("body", b""))
+            return mensaje
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+                estado["largo"] = _largo(mensaje.get("headers", []))
+            elif mensaje["type"] == "http.response.body":
+                estado["enviados"] += len(mensaje.get("body", b""))
+            elif mensaje["type"] == "http.response.zerocopy":
+                # El servidor envía el archivo sin que los bytes pasen por aquí
+                cantidad = mensaje.get("count")
+                estado["enviados"] += cantidad if cantidad is not None else estado["largo"]
+            elif mensaje["type"] == "http.response.pathsend":
+                estado["enviados"] += estado["largo"]
+            await send(mensaje)
+
+        solicitudes_en_curso.sumar(1)
+        try:
+            await self.app(scope, recibir, enviar)
+        finally:
+            solicitudes_en_curso.sumar(-1)
+            ruta = _ruta(scope)
+            duracion_solicitudes.observar(
+                time.perf_counter() - inicio, metodo=scope["method"], ruta=ruta, estado=estado["codigo"]
+            )
+            bytes_recibidos.incrementar(estado["recibidos"], ruta=ruta)
+            bytes_enviados.incrementar(estado["enviados"], ruta=ruta)
@@ -0,0 +1,105 @@
+"""
+Respuesta de archivo con tramos
+FileResponse que atiende por su cuenta un tramo simple de Range (206 con
+Content-Range, 416 si queda fuera del archivo) e If-Range contra la ETag o la
+fecha de modificación, sin depender de la versión de Starlette: la que fija
+requirements.txt ignora Range y siempre envía el archivo completo. Varios
+tramos en una misma petición se atienden como el archivo completo (200), lo
+que RFC 9110 permite.
+
+El cuerpo se envía con lo mejor que ofrezca el servidor ASGI:
+- `http.response.zerocopy`: se le pasa el descriptor con el desplazamiento y
+  la cantidad de bytes y el servidor los envía con os.sendfile (archivo
+  completo o tramo)
+- `http.response.pathsend` (Granian, entre otros): se le pasa la ruta y el
+  servidor envía el archivo sin pasar por Python (solo el archivo completo)
+- si no ofrece ninguna (uvicorn), se lee por bloques en un hilo
+"""
+
+import asyncio
+import os
+
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.types import Receive, Scope, Send
+
+from backend.servicios.almacenamiento import RangoInvalidoError, tramo_simple
+
+EXTENSION_CERO_COPIA = "http.response.zerocopy"
+EXTENSION_RUTA = "http.response.pathsend"
+
+
+class RespuestaArchivo(FileResponse):
+    """FileResponse con Range propio y envío sin copias cuando el servidor lo permite"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            estado = await asyncio.to_thread(os.stat, self.path)
+        except FileNotFoundError:
+            # Se borró entre la consulta al registro y el envío
+            await PlainTextResponse("Archivo no encontrado", status_code=404)(scope, receive, send)
+            return
+        self.set_stat_headers(estado)
+        self.headers.setdefault("accept-ranges", "bytes")
+
+        solo_cabeceras = scope.get("method") == "HEAD"
+        cabeceras = {clave.decode("latin-1"): valor.decode("latin-1") for clave, valor in scope["headers"]}
+        rango = cabeceras.get("range") if not solo_cabeceras else None
+        si_rango = cabeceras.get("if-range")
+        if si_rango is not None and si_rango not in (self.headers.get("etag"), self.headers.get("last-modified")):
+            # La versión del cliente ya no es la actual: se envía el archivo completo
+            rango = None
+
+        tramo = None
+        if rango is not None:
+            try:
+                tramo = tramo_simple(rango, estado.st_size)
+            except RangoInvalidoError as e:
+                await PlainTextResponse(
+                    "Rango no satisfacible", status_code=416, headers={"Content-Range": f"bytes */{e.tamano}"}
+                )(scope, receive, send)
+                return
+
+        inicio, fin = tramo or (0, estado.st_size)
+        crudas = [(clave, valor) for clave, valor in self.raw_headers if clave != b"content-length"]
+        crudas.append((b"content-length", str(fin - inicio).encode("latin-1")))
+        codigo = self.status_code
+        if tramo is not None:
+            codigo = 206
+            crudas.append((b"content-range", f"bytes {inicio}-{fin - 1}/{estado.st_size}".encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": codigo, "headers": crudas})
+        if solo_cabeceras:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            await self._enviar_tramo(scope, send, inicio, fin - inicio, completo=tramo is None)
+        if self.background is not None:
+            await self.background()
+
+    async def _enviar_tramo(self, scope: Scope, send: Send, inicio: int, cantidad: int, completo: bool):
+        extensiones = scope.get("extensions", {})
+        if EXTENSION_CERO_COPIA not in extensiones and EXTENSION_RUTA in extensiones and completo:
+            # Solo sirve para el archivo completo: pathsend no admite desplazamiento
+            await send({"type": EXTENSION_RUTA, "path": os.path.abspath(self.path)})
+            return
+        # Abrir también toca el disco: se hace en un hilo, como el stat y las lecturas
+        archivo = await asyncio.to_thread(open, self.path, "rb")
+        with archivo:
+            if EXTENSION_CERO_COPIA in extensiones:
+                await send({
+                    "type": EXTENSION_CERO_COPIA,
+                    "file": archivo,
+                    "offset": inicio,
+                    "count": cantidad,
+                    "more_body": False,
+                })
+                return
+            archivo.seek(inicio)
+            restantes = cantidad
+            while True:
+                bloque = await asyncio.to_thread(archivo.read, min(self.chunk_size, restantes))
+                restantes -= len(bloque)
+                # Si el archivo se acortó mientras se enviaba, se cierra la respuesta igual
+                ultimo = not bloque or restantes <= 0
+                await send({"type": "http.response.body", "body": bloque, "more_body": not ultimo})
+                if ultimo:
+                    break
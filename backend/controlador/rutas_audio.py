@@ -2,21 +2,48 @@
 Controlador para rutas de procesamiento de audio
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
-from fastapi.responses import FileResponse, JSONResponse
-from typing import Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query, Request, Body, Header, WebSocket
+from starlette.websockets import WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime, timezone
+from pydantic import BaseModel
+from typing import BinaryIO, Optional, Literal, List, Dict
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import shutil
+import tempfile
+import numpy as np
 
-from backend.servicios.servicio_audio import servicio_audio
+from backend.servicios.servicio_audio import servicio_audio, ArchivoDemasiadoGrandeError
+from backend.servicios.almacenamiento import RangoInvalidoError
+from backend.servicios.ejecutor import ejecutor_trabajos, ColaLlenaError
+from backend.servicios.analisis_vivo import SesionEnVivo, FORMATOS_MUESTRA, sesiones_en_vivo
+from backend.servicios.lote_subida import entradas_lote, es_comprimido, LoteDemasiadoGrandeError
+from backend.servicios.trabajos import cola_trabajos
+from backend.servicios.metricas import medir_etapa
+from backend.servicios.transporte import elegir_formato, empaquetar, a_base64, FACTOR_INT16
+from backend.controlador.respuesta_archivo import RespuestaArchivo
 from backend.modelo.esquemas import (
     ConfiguracionAudio, 
     RespuestaAudio, 
+    RespuestaConversionLote,
+    ResultadoSubidaLote,
+    ResumenSubidaLote,
+    EstadoTrabajo,
+    EstadoAlmacenamiento,
     DatosFormaOnda, 
     DatosEspectro,
+    InfoEspectrograma,
+    InfoArchivoAudio,
     RespuestaError
 )
 from backend.configuracion import config
 
+log = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/subir", response_model=RespuestaAudio)
@@ -35,18 +62,10 @@ async def subir_archivo_audio(audio: UploadFile = File(...)):
                 detail=f"Formato de archivo no permitido. Formatos válidos: {', '.join(config.FORMATOS_AUDIO_PERMITIDOS)}"
             )
         
-        # Leer contenido del archivo
-        contenido = await audio.read()
-        
-        # Validar tamaño del archivo
-        if len(contenido) > 50 * 1024 * 1024:  # 50MB
-            raise HTTPException(
-                status_code=400,
-                detail="El archivo es demasiado grande. Máximo 50MB"
-            )
-        
-        # Guardar archivo temporalmente
-        archivo_id = servicio_audio.guardar_archivo_temporal(contenido, audio.filename)
+        # Guardar archivo temporalmente, leyendo el contenido en bloques
+        archivo_id = await ejecutor_trabajos.ejecutar(
+            servicio_audio.guardar_archivo_temporal, audio.file, audio.filename
+        )
         
         return RespuestaAudio(
             mensaje="Archivo subido correctamente",
@@ -54,17 +73,159 @@ async def subir_archivo_audio(audio: UploadFile = File(...)):
             formato=extension
         )
         
+    except (HTTPException, ColaLlenaError):
+        raise
+    except ArchivoDemasiadoGrandeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error detallado al subir archivo: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.error("Error al subir archivo", exc_info=True, extra={"nombre": audio.filename})
         raise HTTPException(status_code=500, detail=f"Error al subir archivo: {str(e)}")
 
+def _guardar_entrada(abrir, nombre: str) -> str:
+    """Abrir una entrada del lote, estandarizarla a WAV y cerrar su flujo"""
+    flujo = abrir()
+    try:
+        return servicio_audio.guardar_archivo_temporal(flujo, nombre)
+    finally:
+        flujo.close()
+
+def _copiar_a_temporal(flujo: BinaryIO) -> BinaryIO:
+    """
+    Copiar un archivo subido a un temporal propio. FastAPI cierra los
+    UploadFile al terminar el handler, antes de que corra la respuesta en flujo.
+    """
+    copia = tempfile.NamedTemporaryFile(dir=config.DIRECTORIO_TEMPORALES)
+    try:
+        flujo.seek(0)
+        shutil.copyfileobj(flujo, copia, config.TAMANO_BLOQUE_SUBIDA)
+        copia.seek(0)
+    except Exception:
+        copia.close()
+        raise
+    return copia
+
+@router.post(
+    "/subir-lote",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def subir_lote_audio(audios: List[UploadFile] = File(...)):
+    """
+    Subir varios archivos de audio, o comprimidos .zip/.tar con archivos de audio
+    
+    - **audios**: Archivos de audio y/o comprimidos (.zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz)
+    
+    Las entradas se decodifican en paralelo en el pool de trabajos. La respuesta
+    es NDJSON: una línea ResultadoSubidaLote por entrada a medida que termina
+    (con `archivo_id` o `error`) y al final una línea ResumenSubidaLote.
+    """
+    for audio in audios:
+        extension = os.path.splitext(audio.filename or "")[1].lower()
+        if not es_comprimido(audio.filename or "") and extension not in config.FORMATOS_AUDIO_PERMITIDOS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Formato de archivo no permitido: {audio.filename}. Formatos válidos: "
+                       f"{', '.join(config.FORMATOS_AUDIO_PERMITIDOS)} o comprimidos .zip/.tar"
+            )
+    
+    copias = []
+    try:
+        for audio in audios:
+            copias.append(await asyncio.to_thread(_copiar_a_temporal, audio.file))
+    except Exception:
+        for copia in copias:
+            copia.close()
+        log.error("Error al copiar el lote", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al recibir el lote")
+    
+    async def resultados():
+        try:
+            # Las entradas se leen en un hilo (descomprimir bloquea) y se procesan
+            # como mucho SUBIDAS_LOTE_EN_PARALELO a la vez
+            iterador = entradas_lote([(audio.filename, copia) for audio, copia in zip(audios, copias)])
+            pendientes = {}
+            resumen = ResumenSubidaLote(total=0, correctos=0, errores=0)
+        
+            def linea(resultado: BaseModel) -> bytes:
+                return (resultado.model_dump_json(exclude_none=True) + "\n").encode()
+        
+            def contar(resultado: ResultadoSubidaLote) -> bytes:
+                resumen.total += 1
+                if resultado.error:
+                    resumen.errores += 1
+                else:
+                    resumen.correctos += 1
+                return linea(resultado)
+        
+            async def terminados(esperar_todos: bool):
+                while pendientes and (esperar_todos or len(pendientes) >= config.SUBIDAS_LOTE_EN_PARALELO):
+                    listos, _ = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                    for tarea in listos:
+                        indice, nombre = pendientes.pop(tarea)
+                        resultado = ResultadoSubidaLote(indice=indice, nombre=nombre)
+                        try:
+                            resultado.archivo_id = tarea.result()
+                            resultado.formato = os.path.splitext(nombre)[1].lower()
+                        except ColaLlenaError as e:
+                            resultado.error = f"{e}. Reintentar en {e.reintentar_despues} s"
+                        except Exception as e:
+                            resultado.error = str(e)
+                        yield contar(resultado)
+        
+            indice = 0
+            try:
+                while True:
+                    entrada = await asyncio.to_thread(next, iterador, None)
+                    if entrada is None:
+                        break
+                    nombre, abrir, error = entrada
+                    if error:
+                        yield contar(ResultadoSubidaLote(indice=indice, nombre=nombre, error=error))
+                    else:
+                        tarea = asyncio.ensure_future(
+                            ejecutor_trabajos.ejecutar(_guardar_entrada, abrir, nombre)
+                        )
+                        pendientes[tarea] = (indice, nombre)
+                        async for resultado in terminados(esperar_todos=False):
+                            yield resultado
+                    indice += 1
+            except LoteDemasiadoGrandeError as e:
+                resumen.error = str(e)
+            except Exception as e:
+                log.error("Error al leer el lote", exc_info=True)
+                resumen.error = f"Error al leer el lote: {str(e)}"
+            async for resultado in terminados(esperar_todos=True):
+                yield resultado
+            log.info("Lote subido", extra={
+                "total": resumen.total, "correctos": resumen.correctos, "errores": resumen.errores
+            })
+            yield linea(resumen)
+        finally:
+            for copia in copias:
+                copia.close()
+    
+    return StreamingResponse(resultados(), media_type="application/x-ndjson")
+
+def _validar_configuracion(frecuencia_muestreo: int, bits: int):
+    """Validar los parámetros de una conversión"""
+    if frecuencia_muestreo < 8000 or frecuencia_muestreo > 192000:
+        raise HTTPException(
+            status_code=400,
+            detail="Frecuencia de muestreo debe estar entre 8000 y 192000 Hz"
+        )
+    
+    if bits not in [8, 16, 24, 32]:
+        raise HTTPException(
+            status_code=400,
+            detail="Bits debe ser 8, 16, 24 o 32"
+        )
+
 @router.post("/convertir/{archivo_id}", response_model=RespuestaAudio)
 async def convertir_archivo_audio(
     archivo_id: str,
     frecuencia_muestreo: int = Form(config.FRECUENCIA_MUESTREO_DEFAULT),
-    bits: int = Form(config.BITS_DEFAULT)
+    bits: int = Form(config.BITS_DEFAULT),
+    dither: bool = Form(False)
 ):
     """
     Convertir archivo de audio con nueva configuración
@@ -72,29 +233,23 @@ async def convertir_archivo_audio(
     - **archivo_id**: ID del archivo subido
     - **frecuencia_muestreo**: Nueva frecuencia de muestreo (Hz)
     - **bits**: Nueva profundidad de bits
+    - **dither**: Aplicar dither triangular al reducir la profundidad de bits
     """
     try:
         # Validar parámetros
-        if frecuencia_muestreo < 8000 or frecuencia_muestreo > 192000:
-            raise HTTPException(
-                status_code=400,
-                detail="Frecuencia de muestreo debe estar entre 8000 y 192000 Hz"
-            )
-        
-        if bits not in [8, 16, 24, 32]:
-            raise HTTPException(
-                status_code=400,
-                detail="Bits debe ser 8, 16, 24 o 32"
-            )
+        _validar_configuracion(frecuencia_muestreo, bits)
         
         # Crear configuración
         config = ConfiguracionAudio(
             frecuencia_muestreo=frecuencia_muestreo,
-            bits=bits
+            bits=bits,
+            dither=dither
         )
         
         # Convertir audio
-        ruta_procesado = servicio_audio.convertir_audio(archivo_id, config)
+        ruta_procesado = await ejecutor_trabajos.ejecutar(
+            servicio_audio.convertir_audio, archivo_id, config
+        )
         
         return RespuestaAudio(
             mensaje="Audio convertido correctamente",
@@ -103,24 +258,310 @@ async def convertir_archivo_audio(
             bits=bits
         )
         
+    except (HTTPException, ColaLlenaError):
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al convertir audio: {str(e)}")
+
+@router.post("/convertir-lote/{archivo_id}", response_model=RespuestaConversionLote)
+async def convertir_lote_audio(
+    archivo_id: str,
+    destinos: List[ConfiguracionAudio] = Body(..., min_length=1, max_length=config.MAX_DESTINOS_LOTE)
+):
+    """
+    Convertir un archivo a varias configuraciones decodificándolo una sola vez
+    
+    - **archivo_id**: ID del archivo subido
+    - **destinos**: Lista de configuraciones (frecuencia_muestreo, bits, dither)
+    
+    Cada resultado queda disponible con su `variante_id` en
+    `/descargar`, `/forma-onda`, `/espectro` y `/espectrograma` (`?variante=`).
+    """
+    try:
+        for destino in destinos:
+            _validar_configuracion(destino.frecuencia_muestreo, destino.bits)
+        
+        variantes = await ejecutor_trabajos.ejecutar(
+            servicio_audio.convertir_lote, archivo_id, destinos
+        )
+        
+        return RespuestaConversionLote(
+            mensaje="Audio convertido correctamente",
+            archivo_id=archivo_id,
+            variantes=variantes
+        )
+        
+    except (HTTPException, ColaLlenaError):
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al convertir audio: {str(e)}")
 
+def _fecha(marca: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(marca, timezone.utc) if marca else None
+
+def _estado_trabajo(trabajo: dict) -> EstadoTrabajo:
+    """Armar la respuesta de estado a partir del registro de la cola"""
+    procesadas, total = trabajo["procesadas"], trabajo["total"]
+    muestras_por_segundo = 0.0
+    if trabajo["iniciado"]:
+        duracion = (trabajo["terminado"] or datetime.now().timestamp()) - trabajo["iniciado"]
+        muestras_por_segundo = procesadas / duracion if duracion > 0 else 0.0
+    
+    descargas = []
+    if trabajo["resultado"]:
+        descargas = [
+            f"/api/audio/descargar/{trabajo['archivo_id']}?variante={variante}"
+            for variante in trabajo["resultado"]["variantes"]
+        ]
+    
+    return EstadoTrabajo(
+        trabajo_id=trabajo["id"],
+        tipo=trabajo["tipo"],
+        archivo_id=trabajo["archivo_id"],
+        estado=trabajo["estado"],
+        porcentaje=100.0 if trabajo["estado"] == "completado" else (100.0 * procesadas / total if total else 0.0),
+        muestras_procesadas=procesadas,
+        muestras_totales=total,
+        muestras_por_segundo=muestras_por_segundo,
+        velocidad=muestras_por_segundo / trabajo["frecuencia"] if trabajo["frecuencia"] else 0.0,
+        creado=_fecha(trabajo["creado"]),
+        iniciado=_fecha(trabajo["iniciado"]),
+        terminado=_fecha(trabajo["terminado"]),
+        descargas=descargas,
+        error=trabajo["error"]
+    )
+
+async def _encolar(tipo: str, archivo_id: str, parametros: dict) -> EstadoTrabajo:
+    # El registro y la cola se guardan en SQLite: las consultas van en un hilo
+    if not await asyncio.to_thread(servicio_audio.existe_archivo, archivo_id):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return _estado_trabajo(await cola_trabajos.enviar(tipo, archivo_id, parametros))
+
+@router.post("/trabajos/convertir/{archivo_id}", response_model=EstadoTrabajo, status_code=202)
+async def encolar_conversion(
+    archivo_id: str,
+    frecuencia_muestreo: int = Form(config.FRECUENCIA_MUESTREO_DEFAULT),
+    bits: int = Form(config.BITS_DEFAULT),
+    dither: bool = Form(False)
+):
+    """
+    Encolar una conversión y responder de inmediato con el ID del trabajo
+    
+    Mismos parámetros que `/convertir`. El progreso se consulta en
+    `/trabajos/{trabajo_id}` o se sigue en `/trabajos/{trabajo_id}/eventos`.
+    """
+    _validar_configuracion(frecuencia_muestreo, bits)
+    destino = ConfiguracionAudio(frecuencia_muestreo=frecuencia_muestreo, bits=bits, dither=dither)
+    return await _encolar("convertir", archivo_id, destino.model_dump())
+
+@router.post("/trabajos/convertir-lote/{archivo_id}", response_model=EstadoTrabajo, status_code=202)
+async def encolar_conversion_lote(
+    archivo_id: str,
+    destinos: List[ConfiguracionAudio] = Body(..., min_length=1, max_length=config.MAX_DESTINOS_LOTE)
+):
+    """
+    Encolar una conversión en lote y responder de inmediato con el ID del trabajo
+    
+    Mismo cuerpo que `/convertir-lote`.
+    """
+    for destino in destinos:
+        _validar_configuracion(destino.frecuencia_muestreo, destino.bits)
+    return await _encolar("convertir_lote", archivo_id, {"destinos": [destino.model_dump() for destino in destinos]})
+
+@router.get("/trabajos/{trabajo_id}", response_model=EstadoTrabajo)
+async def obtener_estado_trabajo(trabajo_id: str):
+    """
+    Consultar el estado y el progreso de un trabajo
+    
+    - **trabajo_id**: ID devuelto al encolar
+    """
+    trabajo = await asyncio.to_thread(cola_trabajos.obtener, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return _estado_trabajo(trabajo)
+
+@router.get("/trabajos/{trabajo_id}/eventos")
+async def seguir_trabajo(trabajo_id: str):
+    """
+    Seguir el progreso de un trabajo como Server-Sent Events
+    
+    Se envía un evento con el estado cada vez que cambia; el flujo se
+    cierra cuando el trabajo termina (completado o error).
+    """
+    if await asyncio.to_thread(cola_trabajos.obtener, trabajo_id) is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    
+    async def eventos():
+        async for trabajo in cola_trabajos.eventos(trabajo_id):
+            yield f"data: {_estado_trabajo(trabajo).model_dump_json()}\n\n"
+    
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _etiqueta(clave: str, parametros: dict) -> str:
+    """ETag fuerte: clave de contenido de la variante más los parámetros de la respuesta"""
+    texto = clave + "?" + "&".join(f"{nombre}={valor}" for nombre, valor in sorted(parametros.items()))
+    return '"' + hashlib.sha256(texto.encode()).hexdigest()[:32] + '"'
+
+def _coincide_etiqueta(if_none_match: Optional[str], etiqueta: str) -> bool:
+    """Comparar If-None-Match con la ETag (comparación débil, como pide RFC 9110 para GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidatas = (candidata.strip() for candidata in if_none_match.split(","))
+    return any(
+        (candidata[2:] if candidata.startswith("W/") else candidata) == etiqueta
+        for candidata in candidatas
+    )
+
+async def _validar_cache(
+    archivo_id: str,
+    variante: Optional[str],
+    if_none_match: Optional[str],
+    parametros: dict,
+    vary: Optional[str] = None
+):
+    """
+    Calcular las cabeceras de caché de una lectura y, si el cliente ya tiene
+    esa versión, la respuesta 304 (sin tocar el audio).
+    
+    La ETag sale de la clave de contenido de la variante y de los parámetros,
+    así que cambia cuando cambia el WAV. Con una variante fija (original o un
+    variante_id) la respuesta no cambia mientras exista el archivo y se puede
+    reutilizar un rato; sin variante o con `procesado` depende de la última
+    conversión y se revalida siempre.
+    Retorna (cabeceras, respuesta 304 o None).
+    """
+    try:
+        # Consulta (y actualiza el último acceso en) el registro: en un hilo
+        clave = await asyncio.to_thread(servicio_audio.clave_contenido, archivo_id, variante)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    etiqueta = _etiqueta(clave, parametros)
+    cabeceras = {
+        "ETag": etiqueta,
+        "Cache-Control": (
+            f"public, max-age={config.MAX_EDAD_CACHE_SEGUNDOS}"
+            if variante not in (None, "procesado") else "public, no-cache"
+        ),
+    }
+    if vary:
+        cabeceras["Vary"] = vary
+    if _coincide_etiqueta(if_none_match, etiqueta):
+        return cabeceras, Response(status_code=304, headers=cabeceras)
+    return cabeceras, None
+
+def _nombre_cabecera(campo: str) -> str:
+    """frecuencia_muestreo → X-Frecuencia-Muestreo"""
+    return "X-" + "-".join(parte.capitalize() for parte in campo.split("_"))
+
+@medir_etapa("serializacion")
+def _responder_arreglos(
+    formato: str,
+    columnas: Dict[str, np.ndarray],
+    metadatos: dict,
+    tipo: str = "float32",
+    cabeceras: Optional[dict] = None
+) -> Response:
+    """
+    Responder columnas numéricas en el formato pedido:
+    - `json`: listas de números, sin pasar por la validación de Pydantic
+    - `binario`: matriz little-endian (filas × columnas) descrita en las cabeceras
+      X-Forma, X-Tipo, X-Columnas (y X-Factor para int16); los metadatos van
+      como cabeceras X-*
+    - `base64`: JSON con los metadatos y la matriz binaria en base64
+    """
+    cabeceras = {"Vary": "Accept", **(cabeceras or {})}
+    if formato == "binario":
+        datos, forma, nombres = empaquetar(columnas, tipo)
+        cabeceras.update({
+            "X-Forma": f"{forma[0]},{forma[1]}",
+            "X-Tipo": tipo,
+            "X-Columnas": ",".join(nombres),
+        })
+        if tipo == "int16":
+            cabeceras["X-Factor"] = str(FACTOR_INT16)
+        cabeceras.update({_nombre_cabecera(campo): str(valor) for campo, valor in metadatos.items()})
+        return Response(content=datos, media_type="application/octet-stream", headers=cabeceras)
+    if formato == "base64":
+        return JSONResponse({**metadatos, **a_base64(columnas, tipo)}, headers=cabeceras)
+    return JSONResponse(
+        {**metadatos, **{nombre: np.asarray(valores).tolist() for nombre, valores in columnas.items()}},
+        headers=cabeceras
+    )
+
+@router.get("/info/{archivo_id}", response_model=InfoArchivoAudio)
+async def obtener_info_archivo(archivo_id: str):
+    """
+    Metadatos y estadísticas de un archivo subido
+    
+    - **archivo_id**: ID del archivo
+    
+    Duración, canales y, por canal, pico, RMS, componente continua y muestras
+    recortadas, más la sonoridad integrada EBU R128. Se calculan una vez al
+    subir el archivo y se leen del registro, sin volver a leer el audio.
+    """
+    try:
+        info = await asyncio.to_thread(servicio_audio.obtener_info, archivo_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    info["creado"] = _fecha(info["creado"])
+    return info
+
 @router.get("/forma-onda/{archivo_id}", response_model=DatosFormaOnda)
 async def obtener_forma_onda(
     archivo_id: str,
-    cantidad_muestras: int = 1000
+    cantidad_muestras: int = Query(1000, ge=1, le=100000),
+    inicio: Optional[float] = Query(None, ge=0),
+    fin: Optional[float] = Query(None, ge=0),
+    variante: Optional[str] = None,
+    formato: Optional[Literal["json", "binario", "base64"]] = None,
+    tipo: Literal["float32", "int16"] = "float32",
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Obtener datos de forma de onda del archivo de audio
+    Obtener la envolvente de la forma de onda del archivo de audio
     
     - **archivo_id**: ID del archivo
-    - **cantidad_muestras**: Cantidad de muestras para la visualización
+    - **cantidad_muestras**: Cantidad de puntos para la visualización
+    - **inicio**: Inicio del tramo en segundos (por defecto, el comienzo)
+    - **fin**: Fin del tramo en segundos (por defecto, el final)
+    - **variante**: `original`, `procesado` o un `variante_id` (por defecto, el procesado)
+    - **formato**: `json`, `binario` o `base64`; por defecto según la cabecera Accept
+      (`application/octet-stream` → binario)
+    - **tipo**: Tipo de los valores en binario/base64: `float32` o `int16` (amplitud × 32767)
+    
+    En binario las columnas son muestras, minimos, maximos y rms.
     """
+    if inicio is not None and fin is not None and fin <= inicio:
+        raise HTTPException(status_code=400, detail="El fin del tramo debe ser mayor que el inicio")
+    formato = elegir_formato(formato, accept)
+    cabeceras, no_modificado = await _validar_cache(
+        archivo_id, variante, if_none_match,
+        {"vista": "forma-onda", "cantidad_muestras": cantidad_muestras, "inicio": inicio, "fin": fin,
+         "formato": formato, "tipo": tipo},
+        vary="Accept"
+    )
+    if no_modificado:
+        return no_modificado
     try:
-        return servicio_audio.obtener_forma_onda(archivo_id, cantidad_muestras)
+        datos = await ejecutor_trabajos.ejecutar(
+            servicio_audio.obtener_forma_onda, archivo_id, cantidad_muestras, inicio, fin, variante
+        )
+        columnas = {nombre: datos.pop(nombre) for nombre in ("muestras", "minimos", "maximos", "rms")}
+        return _responder_arreglos(formato, columnas, datos, tipo, cabeceras)
+    except ColaLlenaError:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -129,45 +570,368 @@ async def obtener_forma_onda(
 @router.get("/espectro/{archivo_id}", response_model=DatosEspectro)
 async def obtener_espectro(
     archivo_id: str,
-    cantidad_bins: int = 512
+    cantidad_bins: int = Query(512, ge=2, le=config.MAX_LONGITUD_SEGMENTO_ESPECTRO // 2 + 1),
+    ventana: Literal["hann", "hamming", "blackman", "rectangular"] = config.VENTANA_ESPECTRO_DEFAULT,
+    longitud_segmento: Optional[int] = Query(None, ge=16, le=config.MAX_LONGITUD_SEGMENTO_ESPECTRO),
+    solapamiento: float = Query(config.SOLAPAMIENTO_ESPECTRO_DEFAULT, ge=0, lt=1),
+    escala: Literal["lineal", "db"] = "lineal",
+    variante: Optional[str] = None,
+    formato: Optional[Literal["json", "binario", "base64"]] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Obtener espectro de frecuencia del archivo de audio
+    Obtener espectro de frecuencia del archivo de audio (método de Welch)
     
     - **archivo_id**: ID del archivo
     - **cantidad_bins**: Cantidad de bins para el espectro
+    - **ventana**: Ventana aplicada a cada segmento (hann, hamming, blackman, rectangular)
+    - **longitud_segmento**: Muestras por segmento; por defecto la que da `cantidad_bins` bins
+    - **solapamiento**: Fracción de solapamiento entre segmentos
+    - **escala**: Magnitud lineal (RMS) o en decibeles
+    - **variante**: `original`, `procesado` o un `variante_id` (por defecto, el procesado)
+    - **formato**: `json`, `binario` o `base64`; por defecto según la cabecera Accept
+      (`application/octet-stream` → binario)
+    
+    En binario las columnas (float32) son frecuencias y magnitudes.
     """
+    formato = elegir_formato(formato, accept)
+    cabeceras, no_modificado = await _validar_cache(
+        archivo_id, variante, if_none_match,
+        {"vista": "espectro", "cantidad_bins": cantidad_bins, "ventana": ventana,
+         "longitud_segmento": longitud_segmento, "solapamiento": solapamiento, "escala": escala,
+         "formato": formato},
+        vary="Accept"
+    )
+    if no_modificado:
+        return no_modificado
     try:
-        return servicio_audio.obtener_espectro(archivo_id, cantidad_bins)
+        datos = await ejecutor_trabajos.ejecutar(
+            servicio_audio.obtener_espectro, archivo_id, cantidad_bins,
+            ventana, longitud_segmento, solapamiento, escala, variante
+        )
+        columnas = {nombre: datos.pop(nombre) for nombre in ("frecuencias", "magnitudes")}
+        return _responder_arreglos(formato, columnas, datos, cabeceras=cabeceras)
+    except ColaLlenaError:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener espectro: {str(e)}")
 
-@router.get("/descargar/{archivo_id}")
-async def descargar_archivo_audio(archivo_id: str):
+@router.get("/espectrograma/{archivo_id}", response_model=InfoEspectrograma)
+async def obtener_info_espectrograma(
+    archivo_id: str,
+    response: Response,
+    variante: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Describir el espectrograma del archivo (se calcula la primera vez)
+    
+    - **archivo_id**: ID del archivo
+    - **variante**: `original`, `procesado` o un `variante_id` (por defecto, el procesado)
+    """
+    cabeceras, no_modificado = await _validar_cache(archivo_id, variante, if_none_match, {"vista": "espectrograma"})
+    if no_modificado:
+        return no_modificado
+    response.headers.update(cabeceras)
+    try:
+        return await ejecutor_trabajos.ejecutar(servicio_audio.obtener_info_espectrograma, archivo_id, variante)
+    except ColaLlenaError:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener espectrograma: {str(e)}")
+
+@router.get("/espectrograma/{archivo_id}/tesela")
+async def obtener_tesela_espectrograma(
+    archivo_id: str,
+    nivel: int = Query(0, ge=0),
+    x: int = Query(0, ge=0),
+    y: int = Query(0, ge=0),
+    formato: Literal["binario", "png"] = "binario",
+    variante: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Obtener una tesela del espectrograma
+    
+    - **archivo_id**: ID del archivo
+    - **nivel**: Nivel de zoom (0 = máxima resolución en tiempo)
+    - **x**: Índice de la tesela en tiempo
+    - **y**: Índice de la tesela en frecuencia (0 = frecuencias bajas)
+    - **formato**: `binario` (uint8, filas = tramas, columnas = bins) o `png`
+    - **variante**: `original`, `procesado` o un `variante_id` (por defecto, el procesado)
+    """
+    cabeceras, no_modificado = await _validar_cache(
+        archivo_id, variante, if_none_match,
+        {"vista": "tesela", "nivel": nivel, "x": x, "y": y, "formato": formato}
+    )
+    if no_modificado:
+        return no_modificado
+    try:
+        tesela = await ejecutor_trabajos.ejecutar(
+            servicio_audio.obtener_tesela_espectrograma, archivo_id, nivel, x, y, variante, formato
+        )
+    except ColaLlenaError:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener tesela: {str(e)}")
+    
+    if formato == "png":
+        return Response(content=tesela, media_type="image/png", headers=cabeceras)
+    return Response(
+        content=tesela.tobytes(),
+        media_type="application/octet-stream",
+        headers={**cabeceras, "X-Forma": f"{tesela.shape[0]},{tesela.shape[1]}", "X-Tipo": "uint8"}
+    )
+
+@router.api_route("/descargar/{archivo_id}", methods=["GET", "HEAD"])
+async def descargar_archivo_audio(
+    request: Request,
+    archivo_id: str,
+    variante: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Descargar archivo de audio procesado
     
     - **archivo_id**: ID del archivo
+    - **variante**: `original`, `procesado` o un `variante_id` (por defecto, el procesado)
+    
+    Acepta `Range` (206 con el tramo pedido, para buscar y reanudar),
+    `If-Range` e `If-None-Match` (304) con la ETag de la variante. Con
+    almacenamiento S3, lo que este nodo no tiene se reenvía desde el bucket.
     """
+    cabeceras, no_modificado = await _validar_cache(archivo_id, variante, if_none_match, {"vista": "descarga"})
+    if no_modificado:
+        return no_modificado
     try:
-        ruta_archivo = servicio_audio.obtener_archivo_procesado(archivo_id)
-        if not ruta_archivo or not os.path.exists(ruta_archivo):
+        ruta_archivo = await asyncio.to_thread(servicio_audio.obtener_archivo_procesado, archivo_id, variante)
+        if not ruta_archivo:
             raise HTTPException(status_code=404, detail="Archivo no encontrado")
         
-        nombre_archivo = f"audio_procesado_{archivo_id}.wav"
+        nombre_archivo = f"audio_procesado_{archivo_id}_{variante}.wav" if variante else f"audio_procesado_{archivo_id}.wav"
         
-        return FileResponse(
-            path=ruta_archivo,
-            filename=nombre_archivo,
-            media_type="audio/wav"
-        )
+        if await asyncio.to_thread(os.path.exists, ruta_archivo):
+            # Atiende Range/If-Range, usa la ETag que recibe en lugar de la de mtime
+            # y envía sin copias (zerocopy o pathsend) si el servidor lo permite
+            return RespuestaArchivo(
+                path=ruta_archivo,
+                filename=nombre_archivo,
+                media_type="audio/wav",
+                headers=cabeceras
+            )
+        if not servicio_audio.almacenamiento.remoto:
+            raise HTTPException(status_code=404, detail="Archivo no encontrado")
+        return await _descarga_remota(request, archivo_id, variante, nombre_archivo, cabeceras)
         
+    except HTTPException:
+        raise
+    except ColaLlenaError:
+        raise
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=404, detail=str(e) or "Archivo no encontrado")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al descargar archivo: {str(e)}")
+
+async def _descarga_remota(
+    request: Request, archivo_id: str, variante: Optional[str], nombre_archivo: str, cabeceras: dict
+) -> Response:
+    """
+    Reenviar una variante que este nodo no tiene desde el almacenamiento
+    remoto, bloque a bloque y sin bajarla completa. El tramo de Range se pide
+    tal cual al almacenamiento; If-Range se compara con la ETag de la variante.
+    """
+    rango = request.headers.get("range")
+    si_rango = request.headers.get("if-range")
+    if si_rango is not None and si_rango != cabeceras["ETag"]:
+        rango = None
+    solo_cabeceras = request.method == "HEAD"
+    try:
+        descarga = await ejecutor_trabajos.ejecutar(
+            servicio_audio.abrir_descarga, archivo_id, variante, rango, solo_cabeceras
+        )
+    except RangoInvalidoError as e:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{e.tamano}"})
+    
+    cabeceras = {
+        **cabeceras,
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(descarga.cantidad),
+        "Content-Disposition": f'attachment; filename="{nombre_archivo}"',
+    }
+    codigo = 200
+    if descarga.parcial:
+        codigo = 206
+        cabeceras["Content-Range"] = (
+            f"bytes {descarga.inicio}-{descarga.inicio + descarga.cantidad - 1}/{descarga.tamano_total}"
+        )
+    if solo_cabeceras:
+        return Response(status_code=codigo, headers=cabeceras, media_type="audio/wav")
+    
+    async def bloques():
+        try:
+            while True:
+                bloque = await asyncio.to_thread(descarga.leer)
+                if not bloque:
+                    break
+                yield bloque
+        finally:
+            # También si el cliente se desconecta: suelta la conexión con el almacenamiento
+            descarga.cerrar()
+    
+    return StreamingResponse(bloques(), status_code=codigo, media_type="audio/wav", headers=cabeceras)
+
+@router.get("/escuchar/{archivo_id}")
+async def escuchar_archivo_audio(
+    archivo_id: str,
+    formato: Literal["opus", "mp3", "flac"] = "opus",
+    inicio: float = Query(0.0, ge=0),
+    variante: Optional[str] = None
+):
+    """
+    Escuchar el audio comprimido a medida que se codifica
+    
+    - **archivo_id**: ID del archivo
+    - **formato**: `opus` (Ogg), `mp3` o `flac` (sin pérdida)
+    - **inicio**: Posición en segundos desde la que empieza la escucha
+    - **variante**: `original`, `procesado` o un `variante_id` (por defecto, el procesado)
+    
+    La respuesta se envía por bloques mientras se codifica; para saltar a
+    otra posición se vuelve a pedir con otro `inicio`.
+    """
+    try:
+        previa = await ejecutor_trabajos.ejecutar(
+            servicio_audio.abrir_previa, archivo_id, formato, inicio, variante
+        )
+    except ColaLlenaError:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al descargar archivo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al preparar la escucha: {str(e)}")
+    
+    # El primer bloque se espera antes de responder, así un error del
+    # codificador llega como código HTTP y no como un flujo vacío
+    try:
+        primero = await asyncio.to_thread(previa.leer)
+    except Exception as e:
+        previa.cerrar()
+        raise HTTPException(status_code=500, detail=f"Error al codificar audio: {str(e)}")
+    
+    async def bloques():
+        try:
+            bloque = primero
+            while bloque:
+                yield bloque
+                bloque = await asyncio.to_thread(previa.leer)
+        except IOError as e:
+            log.info("Escucha interrumpida", extra={"archivo_id": archivo_id, "error": str(e)})
+        finally:
+            # También si el cliente se desconecta: detiene el codificador
+            previa.cerrar()
+    
+    return StreamingResponse(
+        bloques(),
+        media_type=previa.tipo_mime,
+        headers={"Cache-Control": "no-cache", "X-Inicio": str(inicio)}
+    )
+
+async def _enviar_fotogramas(websocket: WebSocket, sesion: SesionEnVivo):
+    """Enviar la envolvente y el espectro a ritmo fijo, solo si llegaron muestras nuevas"""
+    intervalo = 1.0 / config.FOTOGRAMAS_POR_SEGUNDO_VIVO
+    while True:
+        await asyncio.sleep(intervalo)
+        fotograma = sesion.fotograma()
+        if fotograma is not None:
+            await websocket.send_bytes(fotograma)
+
+@router.websocket("/en-vivo")
+async def grabar_en_vivo(
+    websocket: WebSocket,
+    frecuencia: int = 48000,
+    canales: int = 1,
+    formato: str = "s16",
+    nombre: str = "grabacion.wav"
+):
+    """
+    Grabar con análisis en vivo
+
+    - **frecuencia**, **canales**: del PCM que envía el cliente (1 o 2 canales)
+    - **formato**: `s16` (int16) o `f32` (float32), little-endian e intercalado
+
+    El cliente envía bloques de PCM como mensajes binarios y `{"tipo": "fin"}`
+    al terminar. El servidor responde primero `{"tipo": "inicio", ...}` con
+    la forma de los fotogramas, luego fotogramas binarios float32
+    `[duración, mínimos, máximos, magnitudes]` a ritmo fijo y, al cerrar,
+    `{"tipo": "finalizado", "archivo_id": ...}` con la grabación ya registrada
+    como un WAV subido. Si el cliente se desconecta antes, se descarta.
+    """
+    await websocket.accept()
+    if not 8000 <= frecuencia <= 192000 or canales not in (1, 2) or formato not in FORMATOS_MUESTRA:
+        await websocket.send_json({
+            "tipo": "error",
+            "detalle": "Parámetros inválidos: frecuencia entre 8000 y 192000 Hz, 1 o 2 canales, formato s16 o f32"
+        })
+        await websocket.close(code=1003)
+        return
+
+    sesion = await asyncio.to_thread(SesionEnVivo, frecuencia, canales, formato)
+    sesiones_en_vivo.sumar(1)
+    envio = None
+    guardada = False
+    try:
+        await websocket.send_json({
+            "tipo": "inicio",
+            "frecuencia_muestreo": frecuencia,
+            "canales": canales,
+            "segundos_onda": config.SEGUNDOS_ONDA_VIVO,
+            "muestras_por_punto": sesion.muestras_por_punto,
+            "bins": sesion.cantidad_bins,
+            "frecuencias": sesion.frecuencias().tolist(),
+            "fotogramas_por_segundo": config.FOTOGRAMAS_POR_SEGUNDO_VIVO,
+        })
+        envio = asyncio.create_task(_enviar_fotogramas(websocket, sesion))
+        while True:
+            mensaje = await websocket.receive()
+            if mensaje["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(mensaje.get("code", 1000))
+            if mensaje.get("bytes"):
+                await asyncio.to_thread(sesion.agregar, mensaje["bytes"])
+            elif mensaje.get("text") and json.loads(mensaje["text"]).get("tipo") == "fin":
+                break
+
+        envio.cancel()
+        await asyncio.gather(envio, return_exceptions=True)
+        ruta = await asyncio.to_thread(sesion.cerrar)
+        archivo_id = await asyncio.to_thread(
+            servicio_audio.guardar_grabacion, ruta, nombre, sesion.estadisticas()
+        )
+        guardada = True
+        await websocket.send_json({"tipo": "finalizado", "archivo_id": archivo_id, "duracion": sesion.duracion})
+        await websocket.close()
+    except WebSocketDisconnect:
+        if not guardada:
+            log.info("Grabación en vivo cancelada", extra={"duracion": sesion.duracion})
+            await asyncio.to_thread(sesion.descartar)
+    except Exception as e:
+        log.warning("Error en la grabación en vivo", exc_info=True, extra={"duracion": sesion.duracion})
+        if not guardada:
+            await asyncio.to_thread(sesion.descartar)
+        try:
+            await websocket.send_json({"tipo": "error", "detalle": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        if envio is not None:
+            envio.cancel()
+        sesiones_en_vivo.sumar(-1)
 
 @router.delete("/limpiar/{archivo_id}")
 async def limpiar_archivo_audio(archivo_id: str):
@@ -177,7 +941,19 @@ async def limpiar_archivo_audio(archivo_id: str):
     - **archivo_id**: ID del archivo a limpiar
     """
     try:
-        servicio_audio.limpiar_archivo(archivo_id)
+        await ejecutor_trabajos.ejecutar(servicio_audio.limpiar_archivo, archivo_id)
         return {"mensaje": "Archivo limpiado correctamente"}
+    except ColaLlenaError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al limpiar archivo: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al limpiar archivo: {str(e)}") 
+
+@router.get("/almacenamiento", response_model=EstadoAlmacenamiento)
+async def obtener_estado_almacenamiento():
+    """
+    Uso del directorio de temporales y actividad del recolector
+    (archivos vencidos, expulsados por cuota y bytes liberados)
+    """
+    estado = servicio_audio.estado_almacenamiento()
+    estado["ultima_recoleccion"] = _fecha(estado["ultima_recoleccion"])
+    return estado
@@ -15,18 +15,84 @@ class ConfiguracionAudio(BaseModel):
     """Esquema para configuración de audio"""
     frecuencia_muestreo: int = Field(default=40000, description="Frecuencia de muestreo en Hz")
     bits: int = Field(default=16, description="Profundidad de bits")
+    dither: bool = Field(default=False, description="Aplicar dither triangular (TPDF) al cuantizar")
+
+class VarianteAudio(ConfiguracionAudio):
+    """Esquema para una variante convertida de un archivo"""
+    variante_id: str = Field(description="ID de la variante (usar en ?variante=)")
+
+class RespuestaConversionLote(BaseModel):
+    """Esquema para respuesta de conversión en lote"""
+    mensaje: str = Field(description="Mensaje de respuesta")
+    archivo_id: str = Field(description="ID del archivo original")
+    variantes: List[VarianteAudio] = Field(description="Variantes generadas")
+
+class EstadoTrabajo(BaseModel):
+    """Esquema para el estado de un trabajo en segundo plano"""
+    trabajo_id: str = Field(description="ID del trabajo")
+    tipo: str = Field(description="Tipo de trabajo: 'convertir' o 'convertir_lote'")
+    archivo_id: str = Field(description="ID del archivo de entrada")
+    estado: str = Field(description="'pendiente', 'en_proceso', 'completado' o 'error'")
+    porcentaje: float = Field(default=0.0, description="Porcentaje completado (0 a 100)")
+    muestras_procesadas: int = Field(default=0, description="Muestras de entrada procesadas")
+    muestras_totales: int = Field(default=0, description="Muestras de entrada a procesar")
+    muestras_por_segundo: float = Field(default=0.0, description="Velocidad de proceso en muestras por segundo")
+    velocidad: float = Field(default=0.0, description="Segundos de audio procesados por segundo")
+    creado: datetime = Field(description="Momento en que se encoló")
+    iniciado: Optional[datetime] = Field(default=None, description="Momento en que empezó a procesarse")
+    terminado: Optional[datetime] = Field(default=None, description="Momento en que terminó")
+    descargas: List[str] = Field(default_factory=list, description="URLs de descarga de los resultados")
+    error: Optional[str] = Field(default=None, description="Detalle del error si falló")
+
+class EstadoAlmacenamiento(BaseModel):
+    """Esquema para el uso del directorio de temporales"""
+    archivos: int = Field(description="Archivos registrados en la última recolección")
+    bytes_en_uso: int = Field(description="Bytes ocupados en el directorio de temporales")
+    cuota_bytes: int = Field(description="Bytes máximos antes de expulsar archivos")
+    ttl_segundos: float = Field(description="Tiempo sin acceso tras el cual se elimina un archivo")
+    archivos_expirados: int = Field(description="Archivos eliminados por falta de acceso")
+    archivos_expulsados: int = Field(description="Archivos eliminados para respetar la cuota")
+    huerfanos_eliminados: int = Field(description="Entradas sin registrar que se eliminaron")
+    bytes_liberados: int = Field(description="Bytes liberados por borrados")
+    ultima_recoleccion: Optional[datetime] = Field(default=None, description="Momento de la última recolección")
 
 class DatosFormaOnda(BaseModel):
     """Esquema para datos de forma de onda"""
-    muestras: List[float] = Field(description="Lista de valores de amplitud")
+    muestras: List[float] = Field(description="Pico de mayor amplitud de cada punto")
+    minimos: List[float] = Field(default_factory=list, description="Amplitud mínima de cada punto")
+    maximos: List[float] = Field(default_factory=list, description="Amplitud máxima de cada punto")
+    rms: List[float] = Field(default_factory=list, description="Valor RMS de cada punto")
     cantidad_muestras: int = Field(description="Cantidad total de muestras")
     frecuencia_muestreo: int = Field(description="Frecuencia de muestreo en Hz")
+    inicio: float = Field(default=0.0, description="Inicio del tramo en segundos")
+    fin: float = Field(default=0.0, description="Fin del tramo en segundos")
+    resolucion_muestras: int = Field(
+        default=1,
+        description="Los bordes de cada punto se redondean a múltiplos de esta cantidad de muestras "
+                    "(bloques de la pirámide); 1 si son exactos"
+    )
 
 class DatosEspectro(BaseModel):
     """Esquema para datos de espectro de frecuencia"""
     frecuencias: List[float] = Field(description="Lista de frecuencias en Hz")
     magnitudes: List[float] = Field(description="Lista de magnitudes del espectro")
     frecuencia_muestreo: int = Field(description="Frecuencia de muestreo en Hz")
+    escala: str = Field(default="lineal", description="Escala de las magnitudes: 'lineal' (RMS) o 'db'")
+    ventana: str = Field(default="hann", description="Ventana aplicada a cada segmento")
+    longitud_segmento: int = Field(default=0, description="Muestras por segmento de la FFT")
+    segmentos: int = Field(default=0, description="Cantidad de segmentos promediados")
+
+class InfoEspectrograma(BaseModel):
+    """Esquema para la descripción de un espectrograma en teselas"""
+    frecuencia_muestreo: int = Field(description="Frecuencia de muestreo en Hz")
+    longitud_ventana: int = Field(description="Muestras por trama de la STFT")
+    salto: int = Field(description="Muestras entre tramas consecutivas")
+    tramas: int = Field(description="Cantidad de tramas en el nivel 0")
+    bins: int = Field(description="Bins de frecuencia, de 0 a fs/2")
+    niveles: int = Field(description="Niveles de zoom; cada nivel une pares de tramas del anterior")
+    tamano_tesela: int = Field(description="Tramas × bins por tesela")
+    rango_db: List[float] = Field(description="dBFS que corresponden a los valores 0 y 255")
+    teselas: List[List[int]] = Field(description="Teselas en tiempo y en frecuencia de cada nivel")
 
 class RespuestaAudio(BaseModel):
     """Esquema para respuesta de audio"""
@@ -36,6 +102,22 @@ class RespuestaAudio(BaseModel):
     frecuencia_muestreo: Optional[int] = Field(default=None, description="Frecuencia de muestreo")
     bits: Optional[int] = Field(default=None, description="Profundidad de bits")
 
+class ResultadoSubidaLote(BaseModel):
+    """Esquema para cada línea NDJSON de una subida en lote"""
+    indice: int = Field(description="Posición de la entrada en el lote (los resultados llegan en orden de finalización)")
+    nombre: str = Field(description="Nombre del archivo o de la entrada del comprimido")
+    archivo_id: Optional[str] = Field(default=None, description="ID del archivo si se procesó")
+    formato: Optional[str] = Field(default=None, description="Formato del archivo")
+    error: Optional[str] = Field(default=None, description="Detalle del error si no se pudo procesar")
+
+class ResumenSubidaLote(BaseModel):
+    """Esquema para la última línea NDJSON de una subida en lote"""
+    fin: bool = Field(default=True, description="Marca la última línea")
+    total: int = Field(description="Entradas procesadas")
+    correctos: int = Field(description="Entradas guardadas")
+    errores: int = Field(description="Entradas con error")
+    error: Optional[str] = Field(default=None, description="Error que cortó el lote antes de terminar")
+
 class RespuestaProcesamientoAudio(BaseModel):
     """Esquema para respuesta de procesamiento de audio"""
     archivo_id: str
@@ -52,12 +134,43 @@ class EspectroFrecuencia(BaseModel):
     frecuencias: List[float]
     magnitudes: List[float]
 
+class EstadisticasCanal(BaseModel):
+    """Esquema para las estadísticas de un canal"""
+    pico: float = Field(description="Amplitud absoluta máxima (1.0 = fondo de escala)")
+    pico_dbfs: Optional[float] = Field(default=None, description="Pico en dBFS (None si el canal está en silencio)")
+    rms: float = Field(description="Valor RMS")
+    rms_dbfs: Optional[float] = Field(default=None, description="RMS en dBFS (None si el canal está en silencio)")
+    componente_continua: float = Field(description="Valor medio (desplazamiento de continua)")
+    recortes: int = Field(description="Muestras en el fondo de escala (recortadas)")
+
+class EstadisticasAudio(BaseModel):
+    """Esquema para las estadísticas calculadas al subir un archivo"""
+    duracion: float = Field(description="Duración en segundos")
+    frecuencia_muestreo: int = Field(description="Frecuencia de muestreo en Hz")
+    canales: int = Field(description="Cantidad de canales")
+    muestras: int = Field(description="Muestras por canal")
+    pico_dbfs: Optional[float] = Field(default=None, description="Pico de todos los canales en dBFS")
+    recortes: int = Field(description="Muestras recortadas en todos los canales")
+    sonoridad_integrada: Optional[float] = Field(
+        default=None, description="Sonoridad integrada EBU R128 en LUFS (None si todo queda bajo la compuerta de -70 LUFS)"
+    )
+    por_canal: List[EstadisticasCanal] = Field(description="Estadísticas de cada canal")
+
 class InfoArchivoAudio(BaseModel):
     """Esquema para información de archivo de audio"""
     archivo_id: str
     nombre: str
     formato: str
     tamano: int
+    frecuencia_muestreo: int = Field(description="Frecuencia de muestreo del WAV estandarizado en Hz")
+    canales: int = Field(description="Cantidad de canales")
+    muestras: int = Field(description="Muestras por canal")
+    duracion: float = Field(description="Duración en segundos")
+    creado: datetime = Field(description="Momento en que se subió")
+    variantes: List[str] = Field(default_factory=list, description="Variantes convertidas disponibles")
+    estadisticas: Optional[EstadisticasAudio] = Field(
+        default=None, description="Estadísticas calculadas al subir (None en archivos subidos antes de calcularlas)"
+    )
 
 class RespuestaError(BaseModel):
     """Esquema para respuestas de error"""
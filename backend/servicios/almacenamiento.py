@@ -0,0 +1,278 @@
+"""
+Almacenamiento de los WAV
+Abstrae dónde viven los WAV estándar y sus variantes. Con el almacenamiento
+local el directorio de temporales es la única copia; con S3 (o un servicio
+compatible como MinIO) el objeto es la copia de referencia y el directorio de
+temporales es una caché del nodo: cualquier proceso puede atender cualquier
+archivo bajando el objeto la primera vez que lo necesita.
+
+Las rutas del registro siguen siendo rutas dentro de DIRECTORIO_TEMPORALES;
+la clave del objeto sale del nombre del archivo, así que todos los nodos
+ubican la misma copia local y el mismo objeto.
+"""
+
+import logging
+import os
+import re
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+from backend.configuracion import config
+
+log = logging.getLogger(__name__)
+
+_RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangoInvalidoError(ValueError):
+    """Se lanza cuando el tramo pedido con Range está fuera del archivo"""
+
+    def __init__(self, tamano: int):
+        super().__init__("Rango no satisfacible")
+        self.tamano = tamano
+
+
+def tramo_simple(rango: str, tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin exclusivo) de un Range con un solo tramo. None si la cabecera
+    no es un tramo simple bien formado (se ignora y se envía todo); lanza
+    RangoInvalidoError si el tramo está fuera del archivo.
+    """
+    coincidencia = _RANGO.match(rango.strip())
+    if coincidencia is None:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        if not fin:
+            return None
+        # "bytes=-n": los últimos n bytes
+        if int(fin) == 0 or tamano == 0:
+            raise RangoInvalidoError(tamano)
+        return max(tamano - int(fin), 0), tamano
+    inicio = int(inicio)
+    if fin and int(fin) < inicio:
+        return None
+    if inicio >= tamano:
+        raise RangoInvalidoError(tamano)
+    return inicio, min(int(fin) + 1, tamano) if fin else tamano
+
+
+class DescargaRemota:
+    """
+    Lectura de un objeto (o de un tramo) a medida que llega. `leer` retorna
+    bloques hasta b"" y `cerrar` suelta la conexión aunque no se haya leído todo.
+    """
+
+    def __init__(self, cuerpo, tamano_total: int, inicio: int, cantidad: int, parcial: bool):
+        self._cuerpo = cuerpo
+        self._bloques = cuerpo.iter_chunks(config.TAMANO_BLOQUE_DESCARGA) if cuerpo is not None else iter(())
+        self.tamano_total = tamano_total
+        self.inicio = inicio
+        self.cantidad = cantidad
+        self.parcial = parcial
+
+    def leer(self) -> bytes:
+        return next(self._bloques, b"")
+
+    def cerrar(self):
+        if self._cuerpo is not None:
+            self._cuerpo.close()
+
+
+class Almacenamiento(ABC):
+    """
+    Interfaz del almacenamiento. Los WAV se escriben en una ruta de `nuevo`,
+    se publican con `publicar` antes de registrarlos y se leen siempre desde
+    la ruta que retorna `local`.
+    """
+
+    # Si el disco local es solo una caché (se puede vaciar sin perder archivos)
+    remoto = False
+
+    def __init__(self, directorio: str = config.DIRECTORIO_TEMPORALES):
+        self.directorio = directorio
+
+    def nuevo(self, sufijo: str = ".wav") -> str:
+        """Crear un archivo vacío en el directorio de temporales y retornar su ruta"""
+        os.makedirs(self.directorio, exist_ok=True)
+        descriptor, ruta = tempfile.mkstemp(suffix=sufijo, dir=self.directorio)
+        os.close(descriptor)
+        return ruta
+
+    @abstractmethod
+    def publicar(self, ruta: str):
+        """Hacer visible para los demás nodos un WAV ya escrito"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def local(self, ruta: str) -> str:
+        """Ruta de una copia local del WAV, trayéndolo si este nodo no la tiene"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def eliminar(self, ruta: str):
+        """Borrar la copia de referencia (la copia local la borra el recolector)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def abrir(self, ruta: str, rango: Optional[str] = None, solo_cabeceras: bool = False) -> DescargaRemota:
+        """
+        Leer el WAV sin copiarlo al disco local, con un tramo opcional
+        (cabecera Range). Lanza FileNotFoundError si no existe y
+        RangoInvalidoError si el tramo no es satisfacible.
+        """
+        raise NotImplementedError
+
+
+class AlmacenamientoLocal(Almacenamiento):
+    """Los WAV viven solo en el directorio de temporales de este nodo"""
+
+    def publicar(self, ruta):
+        pass
+
+    def local(self, ruta):
+        return ruta
+
+    def eliminar(self, ruta):
+        pass
+
+    def abrir(self, ruta, rango=None, solo_cabeceras=False):
+        # Las descargas locales se sirven directamente desde el archivo
+        raise FileNotFoundError(ruta)
+
+
+class AlmacenamientoS3(Almacenamiento):
+    """
+    Los WAV se guardan como objetos en un bucket S3 o compatible (MinIO).
+    Las credenciales se toman de la cadena habitual de boto3 (variables
+    AWS_ACCESS_KEY_ID y AWS_SECRET_ACCESS_KEY, perfil o rol de la instancia).
+    """
+
+    remoto = True
+
+    def __init__(
+        self,
+        bucket: str = config.S3_BUCKET,
+        prefijo: str = config.S3_PREFIJO,
+        url: Optional[str] = config.S3_URL,
+        region: Optional[str] = config.S3_REGION,
+        directorio: str = config.DIRECTORIO_TEMPORALES
+    ):
+        super().__init__(directorio)
+        self.bucket = bucket
+        self.prefijo = prefijo
+        self.url = url
+        self.region = region
+        self._cliente_s3 = None
+        self._transferencia = None
+        self._candado = threading.Lock()
+        self._bajando = {}  # ruta → candado de la descarga en curso
+
+    def _cliente(self):
+        """Cliente de boto3, creado al usarlo por primera vez (los clientes son seguros entre hilos)"""
+        with self._candado:
+            if self._cliente_s3 is None:
+                try:
+                    import boto3
+                    from boto3.s3.transfer import TransferConfig
+                    from botocore.config import Config
+                except ImportError:
+                    raise RuntimeError("El almacenamiento S3 necesita boto3 (pip install boto3)")
+                self._cliente_s3 = boto3.client(
+                    "s3", endpoint_url=self.url, region_name=self.region,
+                    # MinIO y otros compatibles no siempre resuelven el bucket como subdominio
+                    config=Config(s3={"addressing_style": "path"}, max_pool_connections=config.TRABAJADORES_POOL * 2)
+                )
+                # Multiparte por encima de una parte: ningún archivo se lee completo en memoria
+                self._transferencia = TransferConfig(
+                    multipart_threshold=config.TAMANO_PARTE_S3, multipart_chunksize=config.TAMANO_PARTE_S3
+                )
+            return self._cliente_s3
+
+    def clave(self, ruta: str) -> str:
+        return self.prefijo + os.path.basename(ruta)
+
+    def publicar(self, ruta):
+        cliente = self._cliente()
+        cliente.upload_file(ruta, self.bucket, self.clave(ruta), Config=self._transferencia)
+
+    def local(self, ruta):
+        if os.path.exists(ruta):
+            return ruta
+        # Una sola descarga por archivo aunque lo pidan varias peticiones a la vez
+        with self._candado:
+            candado = self._bajando.setdefault(ruta, threading.Lock())
+        with candado:
+            try:
+                if not os.path.exists(ruta):
+                    self._bajar(ruta)
+            finally:
+                with self._candado:
+                    self._bajando.pop(ruta, None)
+        return ruta
+
+    def _bajar(self, ruta: str):
+        from botocore.exceptions import ClientError
+
+        cliente = self._cliente()
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        # El parcial no lleva el nombre del WAV: si queda a medias, el recolector lo trata como huérfano
+        descriptor, parcial = tempfile.mkstemp(suffix=".parcial", dir=os.path.dirname(ruta) or ".")
+        os.close(descriptor)
+        try:
+            cliente.download_file(self.bucket, self.clave(ruta), parcial, Config=self._transferencia)
+            os.replace(parcial, ruta)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(ruta)
+            raise
+        finally:
+            if os.path.exists(parcial):
+                os.unlink(parcial)
+        log.debug("WAV traído del almacenamiento", extra={"ruta": ruta})
+
+    def eliminar(self, ruta):
+        self._cliente().delete_object(Bucket=self.bucket, Key=self.clave(ruta))
+
+    def abrir(self, ruta, rango=None, solo_cabeceras=False):
+        from botocore.exceptions import ClientError
+
+        cliente = self._cliente()
+        # Solo se reenvía un tramo simple; varios tramos se atienden como el archivo completo
+        if rango is not None and not _RANGO.match(rango.strip()):
+            rango = None
+        try:
+            if solo_cabeceras:
+                respuesta = cliente.head_object(Bucket=self.bucket, Key=self.clave(ruta))
+                tamano = respuesta["ContentLength"]
+                return DescargaRemota(None, tamano, 0, tamano, False)
+            opciones = {"Range": rango.strip()} if rango else {}
+            respuesta = cliente.get_object(Bucket=self.bucket, Key=self.clave(ruta), **opciones)
+        except ClientError as e:
+            codigo = e.response.get("Error", {}).get("Code")
+            if codigo in ("404", "NoSuchKey"):
+                raise FileNotFoundError(ruta)
+            if codigo == "InvalidRange":
+                tamano = cliente.head_object(Bucket=self.bucket, Key=self.clave(ruta))["ContentLength"]
+                raise RangoInvalidoError(tamano)
+            raise
+
+        contenido_rango = respuesta.get("ContentRange")
+        if contenido_rango:
+            # "bytes inicio-fin/total"
+            tramo, _, total = contenido_rango.split(" ", 1)[1].partition("/")
+            inicio = int(tramo.split("-")[0])
+            return DescargaRemota(respuesta["Body"], int(total), inicio, respuesta["ContentLength"], True)
+        tamano = respuesta["ContentLength"]
+        return DescargaRemota(respuesta["Body"], tamano, 0, tamano, False)
+
+
+def crear_almacenamiento(tipo: str = config.ALMACENAMIENTO) -> Almacenamiento:
+    """Crear el almacenamiento configurado: 'local' o 's3'"""
+    if tipo == "local":
+        return AlmacenamientoLocal()
+    if tipo == "s3":
+        return AlmacenamientoS3()
+    raise ValueError(f"Almacenamiento desconocido: {tipo}")
@@ -0,0 +1,187 @@
+"""
+Análisis en vivo de una grabación
+Recibe PCM crudo a medida que se captura, lo escribe directamente en un WAV
+temporal y mantiene una envolvente de los últimos segundos y el espectro de
+la ventana más reciente, que se actualizan en cada bloque sin releer lo
+anterior. Al terminar, el WAV ya está en el formato estándar del servicio
+y sus estadísticas (pico, RMS, sonoridad) ya están calculadas.
+"""
+
+import os
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+
+from backend.configuracion import config
+from backend.servicios.espectro import EstimadorWelch, reducir_bins, escalar
+from backend.servicios.estadisticas import AcumuladorEstadisticas
+from backend.servicios.forma_onda import a_mono
+from backend.servicios.metricas import metricas
+from backend.servicios.servicio_audio import ArchivoDemasiadoGrandeError
+
+# Formatos de muestra aceptados: nombre → tipo de NumPy (little-endian, intercalado)
+FORMATOS_MUESTRA = {"s16": np.dtype("<i2"), "f32": np.dtype("<f4")}
+
+TAMANO_CABECERA_WAV = 44
+
+sesiones_en_vivo = metricas.medidor("audio_en_vivo_sesiones", "Grabaciones en vivo en curso")
+
+
+class SesionEnVivo:
+    """
+    Una grabación en curso. `agregar` y `fotograma` pueden llamarse desde
+    hilos distintos (recepción en el pool, envío en el bucle de eventos).
+
+    Cada fotograma es un arreglo float32:
+    [duración, mínimos (puntos), máximos (puntos), magnitudes (bins)]
+    Las magnitudes son lineales (RMS por banda), como en /espectro.
+    """
+
+    def __init__(
+        self,
+        frecuencia: int,
+        canales: int,
+        formato: str = "s16",
+        segundos_onda: float = config.SEGUNDOS_ONDA_VIVO,
+        puntos_onda: int = config.PUNTOS_ONDA_VIVO,
+        longitud_segmento: int = config.LONGITUD_SEGMENTO_VIVO,
+        cantidad_bins: int = config.BINS_ESPECTRO_VIVO
+    ):
+        if formato not in FORMATOS_MUESTRA:
+            raise ValueError(f"Formato de muestra no soportado: {formato}")
+        self.frecuencia = frecuencia
+        self.canales = canales
+        self.tipo = FORMATOS_MUESTRA[formato]
+        self.longitud_segmento = longitud_segmento
+        self.cantidad_bins = cantidad_bins
+        self.muestras = 0
+        self._candado = threading.Lock()
+        self._cambios = False
+        self._sobrante = b""  # Bytes de una muestra partida entre dos mensajes
+
+        # Envolvente: cada punto resume un bloque fijo de muestras; al llenarse se desplaza
+        self.muestras_por_punto = max(int(segundos_onda * frecuencia) // puntos_onda, 1)
+        self._minimos = np.zeros(puntos_onda, dtype=np.float32)
+        self._maximos = np.zeros(puntos_onda, dtype=np.float32)
+        self._puntos = 0
+        self._bloque = np.zeros(0, dtype=np.float32)
+
+        # Últimas `longitud_segmento` muestras mono para el espectro
+        self._reciente = np.zeros(longitud_segmento, dtype=np.float32)
+        self._estadisticas = AcumuladorEstadisticas(frecuencia, canales)
+
+        descriptor, self.ruta = tempfile.mkstemp(suffix=".wav", dir=config.DIRECTORIO_TEMPORALES)
+        os.close(descriptor)
+        self._wav = sf.SoundFile(
+            self.ruta, "w", samplerate=frecuencia, channels=canales, subtype="PCM_16", format="WAV"
+        )
+
+    @property
+    def duracion(self) -> float:
+        return self.muestras / self.frecuencia
+
+    def agregar(self, datos: bytes):
+        """Escribir un bloque de PCM intercalado y actualizar la envolvente y la ventana reciente"""
+        datos = self._sobrante + datos
+        alineacion = self.tipo.itemsize * self.canales
+        completos = len(datos) // alineacion * alineacion
+        self._sobrante = datos[completos:]
+        if not completos:
+            return
+        if (self.muestras + completos // alineacion) * self.canales * 2 + TAMANO_CABECERA_WAV > config.MAX_TAMANO_ARCHIVO:
+            raise ArchivoDemasiadoGrandeError(config.MAX_TAMANO_ARCHIVO)
+
+        bloque = np.frombuffer(datos, dtype=self.tipo, count=completos // self.tipo.itemsize)
+        bloque = bloque.reshape(-1, self.canales)
+        # soundfile cuantiza float a PCM_16; int16 se escribe tal cual
+        self._wav.write(bloque)
+
+        if self.tipo.kind == "i":
+            bloque = bloque.astype(np.float32) / 32768.0
+        else:
+            # Lo que queda en el WAV de 16 bits: fuera de ±1 se recorta
+            bloque = np.clip(bloque, -1.0, 1.0)
+        self._estadisticas.agregar(bloque)
+        mono = a_mono(bloque).reshape(-1)
+
+        with self._candado:
+            self.muestras += len(mono)
+            self._actualizar_envolvente(mono)
+            if len(mono) >= self.longitud_segmento:
+                self._reciente[:] = mono[-self.longitud_segmento:]
+            else:
+                self._reciente[:-len(mono)] = self._reciente[len(mono):]
+                self._reciente[-len(mono):] = mono
+            self._cambios = True
+
+    def _actualizar_envolvente(self, mono: np.ndarray):
+        """Agregar puntos por cada bloque completo; el bloque en curso se muestra como último punto"""
+        if len(self._bloque):
+            mono = np.concatenate([self._bloque, mono])
+        completos = len(mono) // self.muestras_por_punto * self.muestras_por_punto
+        self._bloque = mono[completos:]
+        if completos:
+            matriz = mono[:completos].reshape(-1, self.muestras_por_punto)
+            self._empujar(matriz.min(axis=1), matriz.max(axis=1))
+
+    def _empujar(self, minimos: np.ndarray, maximos: np.ndarray):
+        capacidad = len(self._minimos)
+        minimos, maximos = minimos[-capacidad:], maximos[-capacidad:]
+        nuevos = len(minimos)
+        if self._puntos + nuevos > capacidad:
+            # Desplazar a la izquierda lo que sigue visible
+            desplazamiento = self._puntos + nuevos - capacidad
+            for arreglo in (self._minimos, self._maximos):
+                arreglo[:self._puntos - desplazamiento] = arreglo[desplazamiento:self._puntos]
+            self._puntos -= desplazamiento
+        self._minimos[self._puntos:self._puntos + nuevos] = minimos
+        self._maximos[self._puntos:self._puntos + nuevos] = maximos
+        self._puntos += nuevos
+
+    def frecuencias(self) -> np.ndarray:
+        """Frecuencia central de cada bin del espectro (no cambia durante la sesión)"""
+        estimador = EstimadorWelch(self.frecuencia, self.longitud_segmento)
+        frecuencias, potencia = estimador.resultado()
+        return reducir_bins(frecuencias, potencia, self.cantidad_bins)[0]
+
+    def fotograma(self) -> Optional[bytes]:
+        """Estado actual como bytes float32, o None si no llegaron muestras desde el último"""
+        with self._candado:
+            if not self._cambios:
+                return None
+            self._cambios = False
+            minimos = self._minimos[:self._puntos].copy()
+            maximos = self._maximos[:self._puntos].copy()
+            if len(self._bloque):
+                minimos = np.append(minimos, self._bloque.min())
+                maximos = np.append(maximos, self._bloque.max())
+            reciente = self._reciente.copy()
+            duracion = self.duracion
+
+        estimador = EstimadorWelch(self.frecuencia, self.longitud_segmento)
+        estimador.agregar(reciente)
+        frecuencias, potencia = estimador.resultado()
+        _, potencia = reducir_bins(frecuencias, potencia, self.cantidad_bins)
+        return np.concatenate([
+            np.array([duracion], dtype=np.float32),
+            minimos, maximos,
+            escalar(potencia, "lineal").astype(np.float32)
+        ]).astype("<f4", copy=False).tobytes()
+
+    def estadisticas(self) -> dict:
+        """Estadísticas de todo lo grabado (las mismas que calcula la subida de un WAV)"""
+        return self._estadisticas.resultado()
+
+    def cerrar(self) -> str:
+        """Terminar de escribir el WAV (completa la cabecera) y retornar su ruta"""
+        self._wav.close()
+        return self.ruta
+
+    def descartar(self):
+        """Cancelar la grabación y borrar el WAV parcial"""
+        self._wav.close()
+        if os.path.exists(self.ruta):
+            os.unlink(self.ruta)
@@ -0,0 +1,158 @@
+"""
+Bitácora estructurada
+Registros en líneas JSON (o en texto legible) con el ID de la petición que los
+originó. Los hilos que atienden peticiones solo encolan el registro; un hilo
+aparte lo formatea y lo escribe, así que registrar no bloquea en la salida.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from backend.configuracion import config
+from backend.servicios.metricas import metricas
+
+# Logger raíz del backend: los módulos usan logging.getLogger(__name__)
+NOMBRE_RAIZ = "backend"
+
+# ID de la petición en curso; lo fija el middleware y se copia a los hilos del ejecutor
+id_solicitud: contextvars.ContextVar = contextvars.ContextVar("id_solicitud", default=None)
+
+# Atributos propios de LogRecord; el resto son los campos pasados con `extra`
+_CAMPOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "id_solicitud"}
+
+
+def _campos_extra(registro: logging.LogRecord) -> dict:
+    return {clave: valor for clave, valor in vars(registro).items() if clave not in _CAMPOS_REGISTRO}
+
+
+class FormateadorJSON(logging.Formatter):
+    """Un objeto JSON por línea: fecha, nivel, origen, mensaje, id_solicitud y campos extra"""
+
+    def format(self, registro: logging.LogRecord) -> str:
+        datos = {
+            "fecha": datetime.fromtimestamp(registro.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": registro.levelname,
+            "origen": registro.name,
+            "mensaje": registro.getMessage(),
+        }
+        if getattr(registro, "id_solicitud", None):
+            datos["id_solicitud"] = registro.id_solicitud
+        datos.update(_campos_extra(registro))
+        if registro.exc_info and not registro.exc_text:
+            registro.exc_text = self.formatException(registro.exc_info)
+        if registro.exc_text:
+            datos["excepcion"] = registro.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FormateadorTexto(logging.Formatter):
+    """Formato legible para desarrollo: los campos extra van como clave=valor"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, registro: logging.LogRecord) -> str:
+        texto = super().format(registro)
+        campos = _campos_extra(registro)
+        if getattr(registro, "id_solicitud", None):
+            campos = {"id_solicitud": registro.id_solicitud, **campos}
+        if campos:
+            primera, _, resto = texto.partition("\n")
+            extra = " ".join(f"{clave}={valor}" for clave, valor in campos.items())
+            texto = f"{primera} {extra}" + (f"\n{resto}" if resto else "")
+        return texto
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """
+    Encola los registros sin bloquear. Al encolar se resuelven el mensaje y
+    la traza de la excepción (los argumentos pueden cambiar después) y se
+    anota el ID de la petición del hilo que registra. Si la cola está llena
+    el registro se descarta y se cuenta.
+    """
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+        self._candado = threading.Lock()
+
+    def prepare(self, registro: logging.LogRecord) -> logging.LogRecord:
+        registro = copy.copy(registro)
+        registro.msg = registro.getMessage()
+        registro.args = None
+        registro.id_solicitud = id_solicitud.get()
+        if registro.exc_info:
+            registro.exc_text = logging.Formatter().formatException(registro.exc_info)
+            registro.exc_info = None
+        return registro
+
+    def enqueue(self, registro: logging.LogRecord):
+        try:
+            self.queue.put_nowait(registro)
+        except queue.Full:
+            with self._candado:
+                self.descartados += 1
+
+
+_manejador: Optional[ManejadorCola] = None
+_oyente: Optional[logging.handlers.QueueListener] = None
+
+
+def configurar_bitacora(
+    nivel: str = config.NIVEL_BITACORA,
+    formato: str = config.FORMATO_BITACORA,
+    max_en_cola: int = config.MAX_REGISTROS_EN_COLA
+) -> ManejadorCola:
+    """
+    Conectar el logger del backend a la cola y arrancar el hilo que escribe
+    en stderr. Llamarla más de una vez solo actualiza el nivel.
+    """
+    global _manejador, _oyente
+    raiz = logging.getLogger(NOMBRE_RAIZ)
+    raiz.setLevel(nivel.upper())
+    if _manejador is not None:
+        return _manejador
+
+    salida = logging.StreamHandler(sys.stderr)
+    salida.setFormatter(FormateadorJSON() if formato == "json" else FormateadorTexto())
+    cola = queue.Queue(max_en_cola)
+    _manejador = ManejadorCola(cola)
+    _oyente = logging.handlers.QueueListener(cola, salida)
+    _oyente.start()
+    atexit.register(detener_bitacora)
+
+    raiz.addHandler(_manejador)
+    # Los registros del backend no se duplican en los handlers del logger raíz (uvicorn)
+    raiz.propagate = False
+    return _manejador
+
+
+def detener_bitacora():
+    """Escribir lo que quede en la cola y detener el hilo escritor"""
+    global _oyente
+    oyente, _oyente = _oyente, None
+    if oyente is not None:
+        try:
+            oyente.stop()
+        except queue.Full:
+            # Sin lugar para la marca de fin; el hilo es daemon y termina con el proceso
+            pass
+
+
+def registros_descartados() -> int:
+    return _manejador.descartados if _manejador is not None else 0
+
+
+metricas.contador_derivado(
+    "audio_bitacora_descartados_total", "Registros descartados porque la cola de la bitácora estaba llena",
+    funcion=registros_descartados
+)
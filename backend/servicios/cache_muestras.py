@@ -0,0 +1,79 @@
+"""
+Caché LRU de muestras decodificadas
+Evita releer y decodificar el mismo WAV en cada consulta de forma de onda,
+espectro o conversión
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from backend.configuracion import config
+from backend.servicios.metricas import registrar_consulta_cache
+
+
+class CacheMuestras:
+    """
+    Caché en proceso de arreglos float32 indexada por (archivo_id, variante).
+
+    Cada entrada recuerda la ruta de la que se leyó: si el archivo de una
+    variante cambia, la entrada antigua deja de coincidir y se descarta.
+    El tamaño total se limita a `limite_bytes` expulsando las entradas
+    menos usadas recientemente.
+    """
+
+    def __init__(self, limite_bytes: int = config.MEMORIA_CACHE_MUESTRAS):
+        self.limite_bytes = limite_bytes
+        self._entradas: "OrderedDict[Tuple[str, str], Tuple[str, np.ndarray, int]]" = OrderedDict()
+        self._bytes = 0
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @property
+    def bytes_usados(self) -> int:
+        return self._bytes
+
+    def obtener(self, archivo_id: str, variante: str, ruta: str) -> Optional[Tuple[np.ndarray, int]]:
+        """Devolver (muestras, frecuencia) si están en caché para esa ruta"""
+        clave = (archivo_id, variante)
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != ruta:
+                if entrada is not None:
+                    self._quitar(clave)
+                self.fallos += 1
+                registrar_consulta_cache("muestras", False)
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            registrar_consulta_cache("muestras", True)
+            return entrada[1], entrada[2]
+
+    def guardar(self, archivo_id: str, variante: str, ruta: str, muestras: np.ndarray, frecuencia: int):
+        """Guardar muestras decodificadas; se ignoran si superan el presupuesto completo"""
+        if muestras.nbytes > self.limite_bytes:
+            return
+        # Las muestras se comparten entre peticiones, nadie debe modificarlas
+        muestras.setflags(write=False)
+        clave = (archivo_id, variante)
+        with self._candado:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (ruta, muestras, frecuencia)
+            self._bytes += muestras.nbytes
+            while self._bytes > self.limite_bytes:
+                self._quitar(next(iter(self._entradas)))
+
+    def invalidar(self, archivo_id: str, variante: Optional[str] = None):
+        """Descartar una variante o todas las variantes de un archivo"""
+        with self._candado:
+            for clave in list(self._entradas):
+                if clave[0] == archivo_id and (variante is None or clave[1] == variante):
+                    self._quitar(clave)
+
+    def _quitar(self, clave: Tuple[str, str]):
+        _, muestras, _ = self._entradas.pop(clave)
+        self._bytes -= muestras.nbytes
@@ -0,0 +1,238 @@
+"""
+Motor de conversión de audio con NumPy/SciPy
+Remuestrea con un filtro polifásico y cuantiza por bloques, escribiendo el
+resultado con soundfile en una sola pasada y sin procesos externos
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from backend.configuracion import config
+from backend.servicios.metricas import duracion_etapas
+
+# Subtipo de soundfile para cada profundidad de bits (WAV de 8 bits es sin signo)
+SUBTIPOS_WAV = {8: 'PCM_U8', 16: 'PCM_16', 24: 'PCM_24', 32: 'PCM_32'}
+
+
+class RemuestreadorPolifasico:
+    """
+    Aplica `resample_poly` por bloques con el mismo resultado que sobre la señal completa.
+
+    Cada tramo que se procesa empieza en un múltiplo de `down` y lleva a cada
+    lado un margen de muestras que cubre la mitad del filtro, de modo que las
+    muestras de salida del tramo coinciden exactamente con las de la señal entera.
+    """
+
+    def __init__(self, frecuencia_origen: int, frecuencia_destino: int, tamano_tramo: int = config.TAMANO_BLOQUE_CONVERSION):
+        divisor = gcd(frecuencia_origen, frecuencia_destino)
+        self.up = frecuencia_destino // divisor
+        self.down = frecuencia_origen // divisor
+        # resample_poly usa un filtro de 10 * max(up, down) coeficientes por lado
+        media_longitud = 10 * max(self.up, self.down) // self.up + 1
+        self.margen = -(-media_longitud // self.down) * self.down
+        self.tamano_tramo = max(tamano_tramo // self.down, 1) * self.down
+        self._pendiente: Optional[np.ndarray] = None
+        self._inicio_pendiente = 0  # Posición global de la primera muestra pendiente
+        self._siguiente = 0  # Primera muestra de entrada que falta procesar
+
+    @property
+    def es_identidad(self) -> bool:
+        return self.up == self.down
+
+    def procesar(self, bloque: np.ndarray) -> np.ndarray:
+        """Agregar un bloque (muestras × canales) y devolver la salida ya disponible"""
+        if self.es_identidad:
+            return bloque
+        if self._pendiente is None:
+            self._pendiente = bloque
+        else:
+            self._pendiente = np.concatenate([self._pendiente, bloque])
+
+        salidas = []
+        fin_disponible = self._inicio_pendiente + len(self._pendiente)
+        while self._siguiente + self.tamano_tramo + self.margen <= fin_disponible:
+            salidas.append(self._tramo(self._siguiente + self.tamano_tramo, self._siguiente + self.tamano_tramo + self.margen))
+        return self._unir(salidas, bloque)
+
+    def finalizar(self) -> np.ndarray:
+        """Procesar lo que queda al terminar la señal"""
+        if self.es_identidad or self._pendiente is None:
+            return np.zeros(0, dtype=np.float32)
+        fin = self._inicio_pendiente + len(self._pendiente)
+        if self._siguiente >= fin:
+            return np.zeros(0, dtype=np.float32)
+        return self._tramo(fin, fin)
+
+    def _tramo(self, fin: int, fin_contexto: int) -> np.ndarray:
+        inicio = self._siguiente
+        inicio_contexto = max(inicio - self.margen, 0)
+        contexto = self._pendiente[inicio_contexto - self._inicio_pendiente:fin_contexto - self._inicio_pendiente]
+        # scipy.signal se importa con la primera conversión que remuestrea (tarda en cargarse)
+        from scipy.signal import resample_poly
+        salida = resample_poly(contexto, self.up, self.down, axis=0)
+
+        # Índices de salida: la muestra de entrada n cae en la salida n * up / down
+        desde = inicio * self.up // self.down - inicio_contexto * self.up // self.down
+        hasta = -(-fin * self.up // self.down) - inicio_contexto * self.up // self.down
+        self._siguiente = fin
+
+        # Descartar lo que ya no se necesita como contexto
+        descartar = max(self._siguiente - self.margen, 0) - self._inicio_pendiente
+        if descartar > 0:
+            self._pendiente = self._pendiente[descartar:]
+            self._inicio_pendiente += descartar
+        return salida[desde:hasta].astype(np.float32, copy=False)
+
+    @staticmethod
+    def _unir(salidas, referencia: np.ndarray) -> np.ndarray:
+        if not salidas:
+            return referencia[:0]
+        return salidas[0] if len(salidas) == 1 else np.concatenate(salidas)
+
+
+class Cuantizador:
+    """
+    Cuantiza muestras float a `bits` bits, con dither triangular (TPDF) opcional.
+    Devuelve enteros en el contenedor que soundfile escribe sin volver a
+    redondear: int16 para 8 y 16 bits, int32 para 24 y 32 bits.
+    """
+
+    def __init__(self, bits: int, dither: bool = False, semilla: Optional[int] = None):
+        if bits not in SUBTIPOS_WAV:
+            raise ValueError("Bits debe ser 8, 16, 24 o 32")
+        self.bits = bits
+        self.dither = dither
+        self.escala = float(2 ** (bits - 1))
+        self.tipo = np.int16 if bits <= 16 else np.int32
+        self.desplazamiento = (16 if bits <= 16 else 32) - bits
+        self._aleatorio = np.random.default_rng(semilla)
+
+    def __call__(self, muestras: np.ndarray) -> np.ndarray:
+        valores = muestras.astype(np.float64) * self.escala
+        if self.dither:
+            # TPDF: diferencia de dos uniformes, ±1 LSB
+            valores += self._aleatorio.random(valores.shape) - self._aleatorio.random(valores.shape)
+        enteros = np.clip(np.rint(valores), -self.escala, self.escala - 1).astype(np.int64)
+        return (enteros << self.desplazamiento).astype(self.tipo)
+
+
+class ConversorPCM:
+    """
+    Remuestrea, cuantiza y escribe un destino WAV a partir de bloques de entrada.
+    Acumula el tiempo de cada etapa y lo registra en las métricas al finalizar.
+    """
+
+    def __init__(
+        self,
+        ruta_destino: str,
+        frecuencia_origen: int,
+        canales: int,
+        frecuencia_destino: int,
+        bits: int,
+        dither: bool = False
+    ):
+        self.ruta_destino = ruta_destino
+        self.remuestreador = RemuestreadorPolifasico(frecuencia_origen, frecuencia_destino)
+        self.cuantizador = Cuantizador(bits, dither)
+        self.salida = sf.SoundFile(
+            ruta_destino, 'w',
+            samplerate=frecuencia_destino,
+            channels=canales,
+            subtype=SUBTIPOS_WAV[bits],
+            format='WAV'
+        )
+        self.tiempos = {"remuestreo": 0.0, "cuantizacion": 0.0, "escritura": 0.0}
+
+    def _escribir(self, salida: np.ndarray):
+        inicio = time.perf_counter()
+        enteros = self.cuantizador(salida)
+        medio = time.perf_counter()
+        self.salida.write(enteros)
+        self.tiempos["cuantizacion"] += medio - inicio
+        self.tiempos["escritura"] += time.perf_counter() - medio
+
+    def procesar(self, bloque: np.ndarray):
+        """Procesar un bloque de muestras float (muestras × canales)"""
+        inicio = time.perf_counter()
+        salida = self.remuestreador.procesar(bloque)
+        self.tiempos["remuestreo"] += time.perf_counter() - inicio
+        if len(salida):
+            self._escribir(salida)
+
+    def finalizar(self):
+        """Escribir el resto de la señal y cerrar el archivo"""
+        inicio = time.perf_counter()
+        salida = self.remuestreador.finalizar()
+        self.tiempos["remuestreo"] += time.perf_counter() - inicio
+        if len(salida):
+            self._escribir(salida)
+        self.salida.close()
+        for etapa, duracion in self.tiempos.items():
+            duracion_etapas.observar(duracion, etapa=etapa)
+
+    def abortar(self):
+        """Cerrar y eliminar el destino incompleto"""
+        self.salida.close()
+        if os.path.exists(self.ruta_destino):
+            os.unlink(self.ruta_destino)
+
+
+def convertir(
+    bloques: Iterable[np.ndarray],
+    ruta_destino: str,
+    frecuencia_origen: int,
+    canales: int,
+    frecuencia_destino: int,
+    bits: int,
+    dither: bool = False,
+    progreso: Optional[Callable[[int], None]] = None
+):
+    """
+    Convertir bloques de muestras float (muestras × canales) a un WAV con la
+    frecuencia y profundidad de bits pedidas. `progreso` recibe las muestras
+    de entrada procesadas hasta el momento.
+    """
+    conversor = ConversorPCM(ruta_destino, frecuencia_origen, canales, frecuencia_destino, bits, dither)
+    procesadas = 0
+    try:
+        for bloque in bloques:
+            conversor.procesar(bloque)
+            procesadas += len(bloque)
+            if progreso:
+                progreso(procesadas)
+        conversor.finalizar()
+    except BaseException:
+        conversor.abortar()
+        raise
+
+
+def convertir_varios(
+    bloques: Iterable[np.ndarray],
+    conversores: List[ConversorPCM],
+    trabajadores: int = config.TRABAJADORES_POOL,
+    progreso: Optional[Callable[[int], None]] = None
+):
+    """
+    Alimentar varios conversores con una sola lectura de la entrada.
+    Cada bloque se reparte entre los conversores en paralelo (el
+    remuestreo y la escritura liberan el GIL).
+    """
+    procesadas = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(len(conversores), trabajadores))) as pool:
+        try:
+            for bloque in bloques:
+                list(pool.map(lambda conversor: conversor.procesar(bloque), conversores))
+                procesadas += len(bloque)
+                if progreso:
+                    progreso(procesadas)
+            list(pool.map(lambda conversor: conversor.finalizar(), conversores))
+        except BaseException:
+            for conversor in conversores:
+                conversor.abortar()
+            raise
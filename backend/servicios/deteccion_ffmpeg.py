@@ -0,0 +1,163 @@
+"""
+Detección de ffmpeg
+Busca el ejecutable la primera vez que se necesita (no al importar) y guarda
+en disco lo que encontró: ruta, versión y códecs de audio. Los procesos que
+arrancan después (otros workers, reinicios con reload) leen ese archivo en
+lugar de volver a ejecutar ffmpeg, mientras el ejecutable no cambie.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import threading
+from dataclasses import asdict, dataclass, field
+from shutil import which
+from typing import List, Optional
+
+from backend.configuracion import config
+
+log = logging.getLogger(__name__)
+
+# Rutas donde buscar ffmpeg, en orden
+RUTAS_POSIBLES = [
+    "ffmpeg",  # Si está en PATH
+    r"C:\ffmpeg\bin\ffmpeg.exe",
+    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
+    r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe",
+    r"C:\Users\pedro\AppData\Local\Microsoft\WinGet\Links\ffmpeg.exe",  # Tu instalación
+    os.path.expanduser(r"~\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-6.1.1-full_build\bin\ffmpeg.exe")
+]
+
+
+@dataclass
+class CapacidadesFFmpeg:
+    """Lo que se sabe del ffmpeg encontrado; `ruta` es None si no hay"""
+    ruta: Optional[str] = None
+    version: Optional[str] = None
+    codificadores: List[str] = field(default_factory=list)  # Códecs de audio que puede escribir
+    decodificadores: List[str] = field(default_factory=list)  # Códecs de audio que puede leer
+
+    @property
+    def disponible(self) -> bool:
+        return self.ruta is not None
+
+    def codifica(self, codec: str) -> bool:
+        # Sin lista (no se pudo obtener) se asume que sí y decide ffmpeg al ejecutarse
+        return self.disponible and (not self.codificadores or codec in self.codificadores)
+
+
+def _resolver(ruta: str) -> Optional[str]:
+    """Ruta absoluta del ejecutable, sin ejecutarlo"""
+    if os.path.isfile(ruta):
+        return os.path.abspath(ruta)
+    return which(ruta)
+
+
+def _firma(ruta: str) -> List[float]:
+    """Cambia si se reemplaza el ejecutable (actualización de ffmpeg)"""
+    estado = os.stat(ruta)
+    return [estado.st_mtime, estado.st_size]
+
+
+def _codecs_de_audio(ruta: str, opcion: str) -> List[str]:
+    """
+    Nombres de los códecs de audio de `ffmpeg -encoders` o `-decoders`.
+    Cada línea después de la separación es: banderas (A = audio), nombre, descripción.
+    """
+    salida = subprocess.run([ruta, "-hide_banner", opcion], capture_output=True, text=True, timeout=10).stdout
+    _, _, lista = salida.partition("------")
+    codecs = []
+    for linea in lista.splitlines():
+        partes = linea.split()
+        if len(partes) >= 2 and partes[0].startswith("A"):
+            codecs.append(partes[1])
+    return sorted(codecs)
+
+
+def _verificar(ruta: str) -> Optional[CapacidadesFFmpeg]:
+    """Ejecutar ffmpeg para confirmar que funciona y listar sus códecs"""
+    try:
+        resultado = subprocess.run([ruta, "-version"], capture_output=True, text=True, timeout=5)
+    except Exception as e:
+        log.warning("Error al verificar ffmpeg", extra={"ruta": ruta, "error": str(e)})
+        return None
+    if resultado.returncode != 0:
+        log.warning("ffmpeg no responde correctamente", extra={"ruta": ruta, "error": resultado.stderr.strip()})
+        return None
+    primera = resultado.stdout.splitlines()[0] if resultado.stdout else ""
+    version = primera.split()[2] if primera.startswith("ffmpeg version") and len(primera.split()) > 2 else primera
+    try:
+        codificadores = _codecs_de_audio(ruta, "-encoders")
+        decodificadores = _codecs_de_audio(ruta, "-decoders")
+    except Exception as e:
+        # Sin lista de códecs se sigue usando; cada llamada a ffmpeg dirá si falla
+        log.warning("No se pudieron listar los códecs de ffmpeg", extra={"ruta": ruta, "error": str(e)})
+        codificadores = decodificadores = []
+    return CapacidadesFFmpeg(ruta, version, codificadores, decodificadores)
+
+
+def _leer_cache(ruta_cache: str, ruta: str) -> Optional[CapacidadesFFmpeg]:
+    try:
+        with open(ruta_cache, encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+        if datos.get("ruta") != ruta or datos.get("firma") != _firma(ruta):
+            return None
+        return CapacidadesFFmpeg(datos["ruta"], datos["version"], datos["codificadores"], datos["decodificadores"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _guardar_cache(ruta_cache: str, capacidades: CapacidadesFFmpeg):
+    """Escritura atómica: otro proceso nunca lee un archivo a medias"""
+    temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(ruta_cache) or ".", exist_ok=True)
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(dict(asdict(capacidades), firma=_firma(capacidades.ruta)), archivo)
+        os.replace(temporal, ruta_cache)
+    except OSError as e:
+        log.warning("No se pudo guardar la detección de ffmpeg", extra={"ruta": ruta_cache, "error": str(e)})
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+
+
+def detectar_ffmpeg(
+    rutas_posibles: List[str] = RUTAS_POSIBLES, ruta_cache: str = config.RUTA_CACHE_FFMPEG
+) -> CapacidadesFFmpeg:
+    """
+    Buscar el primer ffmpeg que funcione. Si la caché en disco describe el
+    mismo ejecutable (ruta, fecha y tamaño), se usa sin ejecutarlo.
+    """
+    for candidata in rutas_posibles:
+        ruta = _resolver(candidata)
+        if ruta is None:
+            continue
+        capacidades = _leer_cache(ruta_cache, ruta)
+        if capacidades is not None:
+            log.debug("ffmpeg tomado de la caché", extra={"ruta": ruta, "version": capacidades.version})
+            return capacidades
+        capacidades = _verificar(ruta)
+        if capacidades is not None:
+            log.info("ffmpeg encontrado", extra={
+                "ruta": ruta, "version": capacidades.version, "codificadores": len(capacidades.codificadores)
+            })
+            _guardar_cache(ruta_cache, capacidades)
+            return capacidades
+
+    log.warning("ffmpeg no encontrado. Algunos formatos de audio pueden no funcionar.")
+    return CapacidadesFFmpeg()
+
+
+_capacidades: Optional[CapacidadesFFmpeg] = None
+_candado = threading.Lock()
+
+
+def obtener_ffmpeg() -> CapacidadesFFmpeg:
+    """Capacidades de ffmpeg del proceso; la detección corre una sola vez"""
+    global _capacidades
+    if _capacidades is None:
+        with _candado:
+            if _capacidades is None:
+                _capacidades = detectar_ffmpeg()
+    return _capacidades
@@ -0,0 +1,137 @@
+"""
+Ejecutor de trabajos pesados
+Saca del event loop las tareas bloqueantes (decodificación, conversión, FFT)
+y las reparte en un pool de hilos con una cola acotada
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Optional
+
+from backend.configuracion import config
+from backend.servicios.metricas import metricas
+
+rechazos = metricas.contador(
+    "audio_ejecutor_rechazos_total", "Trabajos rechazados con 503 porque la cola del pool estaba llena"
+)
+
+
+class ColaLlenaError(Exception):
+    """Se lanza cuando la cola de trabajos está llena"""
+
+    def __init__(self, reintentar_despues: int):
+        super().__init__("El servidor está ocupado procesando otros archivos. Intenta de nuevo más tarde.")
+        self.reintentar_despues = reintentar_despues
+
+
+class EjecutorTrabajos:
+    """
+    Pool de trabajadores para el servicio de audio.
+
+    Los métodos de ServicioAudio se ejecutan en un pool de hilos (comparten el
+    estado del servicio). Los cálculos puros y serializables pueden enviarse
+    además a un pool de procesos con `calcular`, si está habilitado.
+    """
+
+    def __init__(
+        self,
+        trabajadores: int = config.TRABAJADORES_POOL,
+        max_en_cola: int = config.MAX_TRABAJOS_EN_COLA,
+        trabajadores_procesos: int = config.TRABAJADORES_PROCESOS,
+        reintentar_despues: int = config.REINTENTAR_DESPUES_SEGUNDOS
+    ):
+        self.trabajadores = trabajadores
+        self.max_en_cola = max_en_cola
+        self.trabajadores_procesos = trabajadores_procesos
+        self.reintentar_despues = reintentar_despues
+        self._pool_hilos: Optional[ThreadPoolExecutor] = None
+        self._pool_procesos: Optional[ProcessPoolExecutor] = None
+        self._pendientes = 0
+        self._candado = threading.Lock()
+
+    @property
+    def pendientes(self) -> int:
+        """Trabajos en ejecución o esperando en la cola"""
+        return self._pendientes
+
+    def _obtener_pool_hilos(self) -> ThreadPoolExecutor:
+        with self._candado:
+            if self._pool_hilos is None:
+                self._pool_hilos = ThreadPoolExecutor(
+                    max_workers=self.trabajadores,
+                    thread_name_prefix="audio"
+                )
+            return self._pool_hilos
+
+    def _obtener_pool_procesos(self) -> Optional[ProcessPoolExecutor]:
+        if self.trabajadores_procesos <= 0:
+            return None
+        with self._candado:
+            if self._pool_procesos is None:
+                self._pool_procesos = ProcessPoolExecutor(max_workers=self.trabajadores_procesos)
+            return self._pool_procesos
+
+    def _reservar(self):
+        with self._candado:
+            if self._pendientes >= self.trabajadores + self.max_en_cola:
+                rechazos.incrementar()
+                raise ColaLlenaError(self.reintentar_despues)
+            self._pendientes += 1
+
+    def _liberar(self, _futuro=None):
+        with self._candado:
+            self._pendientes -= 1
+
+    async def ejecutar(self, funcion: Callable, *args, **kwargs):
+        """
+        Ejecutar una función bloqueante en el pool de hilos sin bloquear el event loop.
+        Lanza ColaLlenaError si ya hay demasiados trabajos pendientes.
+        """
+        self._reservar()
+        try:
+            # El contexto (ID de la petición para la bitácora) acompaña al trabajo
+            contexto = contextvars.copy_context()
+            futuro = self._obtener_pool_hilos().submit(contexto.run, functools.partial(funcion, *args, **kwargs))
+        except Exception:
+            self._liberar()
+            raise
+        # El contador se libera cuando el trabajo termina de verdad,
+        # aunque el cliente se desconecte antes
+        futuro.add_done_callback(self._liberar)
+        return await asyncio.wrap_future(futuro)
+
+    def calcular(self, funcion: Callable, *args, **kwargs):
+        """
+        Ejecutar un cálculo puro (función de módulo con argumentos serializables).
+        Usa el pool de procesos si está habilitado; si no, lo ejecuta en el hilo actual.
+        """
+        pool = self._obtener_pool_procesos()
+        if pool is None:
+            return funcion(*args, **kwargs)
+        return pool.submit(funcion, *args, **kwargs).result()
+
+    def cerrar(self):
+        """Cerrar los pools esperando a que terminen los trabajos en curso"""
+        with self._candado:
+            pool_hilos, self._pool_hilos = self._pool_hilos, None
+            pool_procesos, self._pool_procesos = self._pool_procesos, None
+        if pool_hilos is not None:
+            pool_hilos.shutdown(wait=True)
+        if pool_procesos is not None:
+            pool_procesos.shutdown(wait=True)
+
+
+# Instancia global del ejecutor
+ejecutor_trabajos = EjecutorTrabajos()
+
+metricas.medidor(
+    "audio_ejecutor_pendientes", "Trabajos en ejecución o esperando en el pool de hilos",
+    funcion=lambda: ejecutor_trabajos.pendientes
+)
+metricas.medidor(
+    "audio_ejecutor_capacidad", "Trabajos que admite el pool antes de responder 503 (hilos más cola)",
+    funcion=lambda: ejecutor_trabajos.trabajadores + ejecutor_trabajos.max_en_cola
+)
@@ -0,0 +1,145 @@
+"""
+Motor de espectro por el método de Welch
+Promedia la potencia de segmentos con ventana y FFT real, de modo que el costo
+en memoria depende del largo del segmento y no de la duración del audio
+"""
+
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq
+
+from backend.servicios.forma_onda import a_mono
+from backend.servicios.wav_mapeado import abrir_wav
+
+# Nombre de cada ventana en scipy.signal.get_window
+VENTANAS = {
+    "hann": "hann",
+    "hamming": "hamming",
+    "blackman": "blackman",
+    "rectangular": "boxcar",
+}
+
+
+@lru_cache(maxsize=32)
+def ventana_float32(nombre: str, longitud: int) -> np.ndarray:
+    """
+    Ventana periódica de `longitud` muestras (de solo lectura, se comparte).
+    scipy.signal tarda alrededor de un segundo en importarse, así que se carga
+    recién con el primer análisis y no al arrancar el servidor.
+    """
+    from scipy.signal import get_window
+    ventana = get_window(VENTANAS.get(nombre, nombre), longitud).astype(np.float32)
+    ventana.setflags(write=False)
+    return ventana
+
+
+def longitud_por_bins(cantidad_bins: int) -> int:
+    """Largo de segmento cuya FFT real produce exactamente `cantidad_bins` bins"""
+    return 2 * (cantidad_bins - 1)
+
+
+class EstimadorWelch:
+    """Acumula la potencia de segmentos sucesivos y la promedia"""
+
+    def __init__(self, frecuencia: int, longitud_segmento: int, ventana: str = "hann"):
+        self.frecuencia = frecuencia
+        self.longitud_segmento = longitud_segmento
+        self.ventana = ventana_float32(ventana, longitud_segmento)
+        # Escala 'spectrum': una senoidal de amplitud A da un pico de A²/2
+        self._escala = 1.0 / float(self.ventana.sum()) ** 2
+        self._suma = np.zeros(longitud_segmento // 2 + 1, dtype=np.float64)
+        self.segmentos = 0
+
+    def agregar(self, segmento: np.ndarray):
+        """Agregar un segmento mono; si es más corto se completa con ceros"""
+        segmento = np.asarray(segmento, dtype=np.float32)
+        if len(segmento) < self.longitud_segmento:
+            segmento = np.pad(segmento, (0, self.longitud_segmento - len(segmento)))
+        segmento = segmento - segmento.mean()
+        self._suma += np.abs(rfft(segmento * self.ventana)) ** 2
+        self.segmentos += 1
+
+    def resultado(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Retornar frecuencias y potencia promedio de un lado"""
+        potencia = self._suma * (self._escala / max(self.segmentos, 1))
+        # Espectro de un lado: se duplica todo salvo DC y Nyquist
+        if self.longitud_segmento % 2:
+            potencia[1:] *= 2
+        else:
+            potencia[1:-1] *= 2
+        return rfftfreq(self.longitud_segmento, 1.0 / self.frecuencia), potencia
+
+
+def welch(
+    segmentos: Iterable[np.ndarray],
+    frecuencia: int,
+    longitud_segmento: int,
+    ventana: str = "hann"
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Estimar el espectro de potencia a partir de segmentos mono de
+    `longitud_segmento` muestras. Los segmentos incompletos solo se usan
+    si la señal no alcanza para uno completo.
+    """
+    estimador = EstimadorWelch(frecuencia, longitud_segmento, ventana)
+    incompleto: Optional[np.ndarray] = None
+    for segmento in segmentos:
+        if len(segmento) == longitud_segmento:
+            estimador.agregar(segmento)
+        elif incompleto is None:
+            incompleto = segmento
+    if estimador.segmentos == 0 and incompleto is not None and len(incompleto):
+        estimador.agregar(incompleto)
+    frecuencias, potencia = estimador.resultado()
+    return frecuencias, potencia, estimador.segmentos
+
+
+def segmentos_de_arreglo(muestras: np.ndarray, longitud_segmento: int, salto: int) -> Iterable[np.ndarray]:
+    """Recorrer un arreglo en segmentos solapados sin copiarlo"""
+    if len(muestras) < longitud_segmento:
+        yield muestras
+        return
+    for inicio in range(0, len(muestras) - longitud_segmento + 1, salto):
+        yield muestras[inicio:inicio + longitud_segmento]
+
+
+def welch_archivo(
+    ruta: str,
+    longitud_segmento: int,
+    solapamiento: float = 0.5,
+    ventana: str = "hann"
+) -> Tuple[np.ndarray, np.ndarray, int, int]:
+    """
+    Espectro de Welch leyendo el archivo segmento a segmento.
+    Función pura: se puede ejecutar en el pool de procesos.
+    """
+    lector = abrir_wav(ruta)
+    superposicion = min(int(longitud_segmento * solapamiento), longitud_segmento - 1)
+    segmentos = (a_mono(bloque) for bloque in lector.bloques(longitud_segmento, superposicion))
+    frecuencias, potencia, cantidad = welch(segmentos, lector.frecuencia, longitud_segmento, ventana)
+    return frecuencias, potencia, cantidad, lector.frecuencia
+
+
+def reducir_bins(frecuencias: np.ndarray, potencia: np.ndarray, cantidad_bins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Agrupar bins contiguos hasta quedar con `cantidad_bins`.
+    La potencia de cada grupo es la suma de sus bins (potencia de la banda)
+    y su frecuencia es el centro del grupo.
+    """
+    if len(potencia) <= cantidad_bins:
+        return frecuencias, potencia
+    bordes = np.linspace(0, len(potencia), cantidad_bins + 1).astype(np.int64)
+    tamanos = np.diff(bordes)
+    return (
+        np.add.reduceat(frecuencias, bordes[:-1]) / tamanos,
+        np.add.reduceat(potencia, bordes[:-1])
+    )
+
+
+def escalar(potencia: np.ndarray, escala: str) -> np.ndarray:
+    """Convertir potencia a magnitud lineal (RMS) o a decibeles"""
+    if escala == "db":
+        return 10 * np.log10(np.maximum(potencia, 1e-20))
+    return np.sqrt(potencia)
@@ -0,0 +1,232 @@
+"""
+Espectrograma en teselas
+Calcula la STFT una sola vez, la cuantiza a uint8 y la guarda en disco por
+niveles de zoom, para servir teselas (bloques tiempo × frecuencia) sin
+recalcular nada por petición
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft
+
+from backend.configuracion import config
+from backend.servicios.metricas import medir_etapa, registrar_consulta_cache
+from backend.servicios.espectro import ventana_float32
+from backend.servicios.forma_onda import a_mono
+from backend.servicios.wav_mapeado import abrir_wav
+
+SUFIJO_ESPECTROGRAMA = ".espectrograma"
+ARCHIVO_META = "meta.json"
+FILAS_POR_BLOQUE = 4096  # Tramas procesadas a la vez al armar los niveles
+
+
+def lotes_de_tramas(bloques: Iterable[np.ndarray], longitud: int, salto: int) -> Iterator[np.ndarray]:
+    """
+    Cortar bloques mono en tramas de `longitud` muestras que empiezan cada `salto`.
+    Produce matrices (tramas × longitud); hay una trama por cada inicio dentro de
+    la señal y las últimas se completan con ceros.
+    """
+    pendiente = np.zeros(0, dtype=np.float32)
+    for bloque in bloques:
+        pendiente = np.concatenate([pendiente, np.asarray(bloque, dtype=np.float32)])
+        if len(pendiente) >= longitud:
+            cantidad = (len(pendiente) - longitud) // salto + 1
+            yield sliding_window_view(pendiente, longitud)[::salto][:cantidad]
+            pendiente = pendiente[cantidad * salto:]
+    if len(pendiente):
+        cantidad = -(-len(pendiente) // salto)
+        relleno = np.pad(pendiente, (0, (cantidad - 1) * salto + longitud - len(pendiente)))
+        yield sliding_window_view(relleno, longitud)[::salto][:cantidad]
+
+
+def ruta_espectrograma(ruta_wav: str) -> str:
+    """Directorio donde se guarda el espectrograma de un WAV"""
+    return ruta_wav + SUFIJO_ESPECTROGRAMA
+
+
+class Espectrograma:
+    """
+    Espectrograma cuantizado guardado en un directorio junto al WAV.
+
+    `nivel_0.npy` tiene una fila por trama y una columna por bin de frecuencia
+    (de 0 a fs/2, sin Nyquist). Cada nivel siguiente toma el máximo de pares de
+    tramas del anterior, hasta que el nivel entra en una sola tesela de tiempo.
+    """
+
+    def __init__(self, directorio: str, meta: dict):
+        self.directorio = directorio
+        self.meta = meta
+
+    @property
+    def niveles(self) -> int:
+        return self.meta["niveles"]
+
+    @classmethod
+    def abrir(cls, directorio: str) -> "Espectrograma":
+        with open(os.path.join(directorio, ARCHIVO_META)) as archivo:
+            return cls(directorio, json.load(archivo))
+
+    @classmethod
+    def calcular(
+        cls,
+        ruta_wav: str,
+        longitud_ventana: int = config.LONGITUD_VENTANA_ESPECTROGRAMA,
+        salto: int = config.SALTO_ESPECTROGRAMA,
+        tamano_tesela: int = config.TAMANO_TESELA_ESPECTROGRAMA,
+        rango_db: Tuple[float, float] = config.RANGO_DB_ESPECTROGRAMA
+    ) -> "Espectrograma":
+        """
+        Calcular la STFT del WAV en una pasada y guardarla por niveles.
+        Si otro proceso ya lo calculó, se usa el existente.
+        """
+        destino = ruta_espectrograma(ruta_wav)
+        if os.path.exists(os.path.join(destino, ARCHIVO_META)):
+            registrar_consulta_cache("espectrogramas", True)
+            return cls.abrir(destino)
+
+        registrar_consulta_cache("espectrogramas", False)
+        with medir_etapa("espectrograma"):
+            return cls._generar(ruta_wav, destino, longitud_ventana, salto, tamano_tesela, rango_db)
+
+    @classmethod
+    def _generar(cls, ruta_wav: str, destino: str, longitud_ventana: int, salto: int, tamano_tesela: int, rango_db) -> "Espectrograma":
+        lector = abrir_wav(ruta_wav)
+        cantidad_tramas = max(1, -(-lector.muestras // salto))
+        cantidad_bins = longitud_ventana // 2
+        ventana = ventana_float32("hann", longitud_ventana)
+        # Escala 'spectrum': una senoidal de amplitud A (0 dBFS con A=1) da A²/2
+        escala = 2.0 / float(ventana.sum()) ** 2
+        db_min, db_max = rango_db
+
+        temporal = tempfile.mkdtemp(dir=os.path.dirname(ruta_wav) or ".", suffix=".tmp")
+        try:
+            nivel = np.lib.format.open_memmap(
+                os.path.join(temporal, "nivel_0.npy"), mode="w+",
+                dtype=np.uint8, shape=(cantidad_tramas, cantidad_bins)
+            )
+            bloques = (a_mono(bloque) for bloque in lector.bloques(65536))
+            fila = 0
+            for lote in lotes_de_tramas(bloques, longitud_ventana, salto):
+                nivel[fila:fila + len(lote)] = cls._cuantizar(lote, ventana, escala, cantidad_bins, db_min, db_max)
+                fila += len(lote)
+            nivel.flush()
+
+            # Niveles de zoom: máximo de pares de tramas
+            niveles = 1
+            while len(nivel) > tamano_tesela:
+                siguiente = np.lib.format.open_memmap(
+                    os.path.join(temporal, f"nivel_{niveles}.npy"), mode="w+",
+                    dtype=np.uint8, shape=(-(-len(nivel) // 2), cantidad_bins)
+                )
+                for inicio in range(0, len(nivel), 2 * FILAS_POR_BLOQUE):
+                    tramo = nivel[inicio:inicio + 2 * FILAS_POR_BLOQUE]
+                    pares = np.maximum(tramo[0::2][:len(tramo) // 2], tramo[1::2])
+                    if len(tramo) % 2:
+                        pares = np.concatenate([pares, tramo[-1:]])
+                    siguiente[inicio // 2:inicio // 2 + len(pares)] = pares
+                siguiente.flush()
+                nivel = siguiente
+                niveles += 1
+
+            meta = {
+                "frecuencia_muestreo": lector.frecuencia,
+                "longitud_ventana": longitud_ventana,
+                "salto": salto,
+                "tramas": cantidad_tramas,
+                "bins": cantidad_bins,
+                "niveles": niveles,
+                "tamano_tesela": tamano_tesela,
+                "rango_db": [db_min, db_max],
+            }
+            with open(os.path.join(temporal, ARCHIVO_META), "w") as archivo:
+                json.dump(meta, archivo)
+
+            try:
+                os.rename(temporal, destino)
+            except OSError:
+                # Otro trabajador terminó primero: usar el suyo
+                shutil.rmtree(temporal, ignore_errors=True)
+            return cls.abrir(destino)
+        except Exception:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _cuantizar(lote, ventana, escala, cantidad_bins, db_min, db_max) -> np.ndarray:
+        matriz = lote * ventana
+        potencia = np.abs(rfft(matriz, axis=1)[:, :cantidad_bins]) ** 2 * escala
+        db = 10 * np.log10(np.maximum(potencia, 1e-20))
+        return np.clip((db - db_min) * (255.0 / (db_max - db_min)), 0, 255).astype(np.uint8)
+
+    def tesela(self, nivel: int, x: int, y: int) -> np.ndarray:
+        """
+        Obtener la tesela (x, y) de un nivel: filas = tramas, columnas = bins.
+        Las teselas del borde pueden ser más chicas.
+        """
+        if not 0 <= nivel < self.niveles:
+            raise ValueError(f"Nivel fuera de rango (0 a {self.niveles - 1})")
+        datos = np.load(os.path.join(self.directorio, f"nivel_{nivel}.npy"), mmap_mode="r")
+        tamano = self.meta["tamano_tesela"]
+        if not (0 <= x * tamano < datos.shape[0] and 0 <= y * tamano < datos.shape[1]):
+            raise ValueError("Tesela fuera de rango")
+        return np.array(datos[x * tamano:(x + 1) * tamano, y * tamano:(y + 1) * tamano])
+
+    def teselas_por_nivel(self, nivel: int) -> Tuple[int, int]:
+        """Cantidad de teselas en tiempo y en frecuencia de un nivel"""
+        tamano = self.meta["tamano_tesela"]
+        tramas_nivel = self.meta["tramas"]
+        for _ in range(nivel):
+            tramas_nivel = -(-tramas_nivel // 2)
+        return -(-tramas_nivel // tamano), -(-self.meta["bins"] // tamano)
+
+
+# Paleta viridis de las teselas PNG: 256 colores RGB, 16 por línea. Está
+# escrita acá para no importar matplotlib al servir teselas.
+PALETA_PNG = bytes.fromhex(
+    "44015444025645045745055946075a46085c460a5d460b5e470d60470e61471063471164471365481467481668481769"
+    "48186a481a6c481b6d481c6e481d6f481f70482071482173482374482475482576482677482878482979472a7a472c7a"
+    "472d7b472e7c472f7d46307e46327e46337f463480453581453781453882443983443a83443b84433d84433e85423f85"
+    "4240864241864142874144874045884046883f47883f48893e49893e4a893e4c8a3d4d8a3d4e8a3c4f8a3c508b3b518b"
+    "3b528b3a538b3a548c39558c39568c38588c38598c375a8c375b8d365c8d365d8d355e8d355f8d34608d34618d33628d"
+    "33638d32648e32658e31668e31678e31688e30698e306a8e2f6b8e2f6c8e2e6d8e2e6e8e2e6f8e2d708e2d718e2c718e"
+    "2c728e2c738e2b748e2b758e2a768e2a778e2a788e29798e297a8e297b8e287c8e287d8e277e8e277f8e27808e26818e"
+    "26828e26828e25838e25848e25858e24868e24878e23888e23898e238a8d228b8d228c8d228d8d218e8d218f8d21908d"
+    "21918c20928c20928c20938c1f948c1f958b1f968b1f978b1f988b1f998a1f9a8a1e9b8a1e9c891e9d891f9e891f9f88"
+    "1fa0881fa1881fa1871fa28720a38620a48621a58521a68522a78522a88423a98324aa8325ab8225ac8226ad8127ad81"
+    "28ae8029af7f2ab07f2cb17e2db27d2eb37c2fb47c31b57b32b67a34b67935b77937b87838b9773aba763bbb753dbc74"
+    "3fbc7340bd7242be7144bf7046c06f48c16e4ac16d4cc26c4ec36b50c46a52c56954c56856c66758c7655ac8645cc863"
+    "5ec96260ca6063cb5f65cb5e67cc5c69cd5b6ccd5a6ece5870cf5773d05675d05477d1537ad1517cd2507fd34e81d34d"
+    "84d44b86d54989d5488bd6468ed64590d74393d74195d84098d83e9bd93c9dd93ba0da39a2da37a5db36a8db34aadc32"
+    "addc30b0dd2fb2dd2db5de2bb8de29bade28bddf26c0df25c2df23c5e021c8e020cae11fcde11dd0e11cd2e21bd5e21a"
+    "d8e219dae319dde318dfe318e2e418e5e419e7e419eae51aece51befe51cf1e51df4e61ef6e620f8e621fbe723fde725"
+)
+
+
+@medir_etapa("png")
+def codificar_png(tesela: np.ndarray) -> bytes:
+    """
+    Codificar una tesela como PNG con paleta: tiempo en el eje horizontal
+    y frecuencias altas arriba
+    """
+    imagen = np.ascontiguousarray(tesela.T[::-1])
+    alto, ancho = imagen.shape
+    filas = np.hstack([np.zeros((alto, 1), dtype=np.uint8), imagen]).tobytes()
+
+    def bloque(tipo: bytes, datos: bytes) -> bytes:
+        return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + bloque(b"IHDR", struct.pack(">IIBBBBB", ancho, alto, 8, 3, 0, 0, 0))
+        + bloque(b"PLTE", PALETA_PNG)
+        + bloque(b"IDAT", zlib.compress(filas, 6))
+        + bloque(b"IEND", b"")
+    )
@@ -0,0 +1,158 @@
+"""
+Estadísticas de un audio en una sola pasada
+Pico, RMS, componente continua y recortes por canal, y sonoridad integrada
+según EBU R128 (ITU-R BS.1770-4), acumulados bloque a bloque: la memoria no
+depende de la duración salvo por un valor de energía cada 100 ms
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+from backend.configuracion import config
+from backend.servicios.wav_mapeado import abrir_wav
+
+# BS.1770: bloques de 400 ms con salto de 100 ms (solapamiento del 75%)
+DURACION_SUBBLOQUE = 0.1
+SUBBLOQUES_POR_BLOQUE = 4
+UMBRAL_ABSOLUTO_LUFS = -70.0
+UMBRAL_RELATIVO_LU = -10.0
+
+# Peso de cada canal en 5.1 (L, R, C, LFE, Ls, Rs); el LFE no cuenta
+PESOS_5_1 = (1.0, 1.0, 1.0, 0.0, 1.41, 1.41)
+
+
+def filtro_k(frecuencia: int) -> np.ndarray:
+    """
+    Coeficientes (formato sos) del filtro de ponderación K para cualquier
+    frecuencia de muestreo: estante de +4 dB en agudos y pasaaltos RLB.
+    Mismo diseño que libebur128; a 48 kHz coincide con la tabla de BS.1770.
+    """
+    # Estante en agudos
+    f0, ganancia, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = math.tan(math.pi * f0 / frecuencia)
+    vh = 10 ** (ganancia / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    estante = [
+        (vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+        1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0,
+    ]
+    # Pasaaltos RLB
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = math.tan(math.pi * f0 / frecuencia)
+    a0 = 1 + k / q + k * k
+    pasaaltos = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([estante, pasaaltos])
+
+
+def _dbfs(valor: float) -> Optional[float]:
+    return 20 * math.log10(valor) if valor > 0 else None
+
+
+class AcumuladorEstadisticas:
+    """
+    Recibe bloques float32 (muestras × canales) en orden con `agregar` y
+    retorna el registro completo con `resultado`.
+    """
+
+    def __init__(self, frecuencia: int, canales: int, umbral_recorte: float = config.UMBRAL_RECORTE):
+        self.frecuencia = frecuencia
+        self.canales = canales
+        self.umbral_recorte = umbral_recorte
+        self.muestras = 0
+        self._picos = np.zeros(canales)
+        self._sumas = np.zeros(canales)
+        self._cuadrados = np.zeros(canales)
+        self._recortes = np.zeros(canales, dtype=np.int64)
+
+        self._sos = filtro_k(frecuencia)
+        self._estado_filtro = np.zeros((len(self._sos), canales, 2))
+        self._pesos = np.array(PESOS_5_1 if canales == 6 else (1.0,) * canales)
+        self._largo_subbloque = max(int(round(frecuencia * DURACION_SUBBLOQUE)), 1)
+        self._resto = np.zeros(0)  # Energía ponderada de las muestras del subbloque en curso
+        self._subbloques = []  # Energía ponderada de cada subbloque completo de 100 ms
+
+    def agregar(self, bloque: np.ndarray):
+        from scipy.signal import sosfilt
+
+        bloque = np.asarray(bloque, dtype=np.float32).reshape(len(bloque), -1)
+        if not len(bloque):
+            return
+        self.muestras += len(bloque)
+        # Un canal por fila: las reducciones sobre muestras intercaladas son
+        # accesos con salto y tardan unas diez veces más
+        planos = np.ascontiguousarray(bloque.T)
+        np.maximum(self._picos, np.maximum(planos.max(axis=1), -planos.min(axis=1)), out=self._picos)
+        self._recortes += np.count_nonzero(np.abs(planos) >= self.umbral_recorte, axis=1)
+        self._sumas += planos.sum(axis=1, dtype=np.float64)
+        self._cuadrados += np.einsum("ij,ij->i", planos, planos, dtype=np.float64)
+
+        # Energía K ponderada por muestra, sumando los canales con su peso
+        filtrado, self._estado_filtro = sosfilt(self._sos, planos, axis=1, zi=self._estado_filtro)
+        energia = self._pesos @ np.square(filtrado)
+        if len(self._resto):
+            energia = np.concatenate([self._resto, energia])
+        completos = len(energia) // self._largo_subbloque * self._largo_subbloque
+        self._resto = energia[completos:]
+        if completos:
+            self._subbloques.extend(energia[:completos].reshape(-1, self._largo_subbloque).sum(axis=1))
+
+    def sonoridad_integrada(self) -> Optional[float]:
+        """LUFS con las dos compuertas de BS.1770; None si no hay bloques sobre -70 LUFS"""
+        subbloques = np.asarray(self._subbloques)
+        if len(subbloques) < SUBBLOQUES_POR_BLOQUE:
+            return None
+        # Energía media de cada bloque de 400 ms (cuatro subbloques consecutivos)
+        acumulada = np.concatenate([[0.0], np.cumsum(subbloques)])
+        bloques = (acumulada[SUBBLOQUES_POR_BLOQUE:] - acumulada[:-SUBBLOQUES_POR_BLOQUE]) / (
+            SUBBLOQUES_POR_BLOQUE * self._largo_subbloque
+        )
+        with np.errstate(divide="ignore"):
+            sonoridad = -0.691 + 10 * np.log10(bloques)
+        sobre_absoluto = bloques[sonoridad > UMBRAL_ABSOLUTO_LUFS]
+        if not len(sobre_absoluto):
+            return None
+        umbral_relativo = -0.691 + 10 * np.log10(sobre_absoluto.mean()) + UMBRAL_RELATIVO_LU
+        sobre_relativo = bloques[(sonoridad > UMBRAL_ABSOLUTO_LUFS) & (sonoridad > umbral_relativo)]
+        return float(-0.691 + 10 * np.log10(sobre_relativo.mean()))
+
+    def resultado(self) -> dict:
+        """Registro de estadísticas (los campos de EstadisticasAudio)"""
+        cantidad = max(self.muestras, 1)
+        rms = np.sqrt(self._cuadrados / cantidad)
+        por_canal = [
+            {
+                "pico": float(self._picos[canal]),
+                "pico_dbfs": _dbfs(float(self._picos[canal])),
+                "rms": float(rms[canal]),
+                "rms_dbfs": _dbfs(float(rms[canal])),
+                "componente_continua": float(self._sumas[canal] / cantidad),
+                "recortes": int(self._recortes[canal]),
+            }
+            for canal in range(self.canales)
+        ]
+        pico = float(self._picos.max()) if self.canales else 0.0
+        return {
+            "duracion": self.muestras / self.frecuencia,
+            "frecuencia_muestreo": self.frecuencia,
+            "canales": self.canales,
+            "muestras": self.muestras,
+            "pico_dbfs": _dbfs(pico),
+            "recortes": int(self._recortes.sum()),
+            "sonoridad_integrada": self.sonoridad_integrada(),
+            "por_canal": por_canal,
+        }
+
+
+def estadisticas_archivo(ruta: str) -> dict:
+    """
+    Estadísticas de un WAV leyéndolo bloque a bloque desde el mapeo en memoria.
+    Función pura: se puede ejecutar en el pool de procesos.
+    """
+    lector = abrir_wav(ruta)
+    acumulador = AcumuladorEstadisticas(lector.frecuencia, lector.canales)
+    for bloque in lector.bloques(config.TAMANO_BLOQUE_CONVERSION):
+        acumulador.agregar(bloque)
+    return acumulador.resultado()
@@ -0,0 +1,205 @@
+"""
+Pirámide de envolventes para la forma de onda
+Guarda mínimo, máximo y energía por bloque en varios niveles de resolución
+(similar a los archivos .dat de audiowaveform), para servir cualquier zoom
+sin volver a leer las muestras
+"""
+
+import os
+import tempfile
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from backend.configuracion import config
+
+
+def a_mono(muestras: np.ndarray) -> np.ndarray:
+    """Convertir a mono promediando canales"""
+    if muestras.ndim == 2:
+        return muestras.mean(axis=1, dtype=np.float32)
+    return muestras
+
+
+def envolvente(muestras: np.ndarray, cantidad: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcular mínimo, máximo y RMS de `muestras` repartidas en `cantidad` grupos.
+    Si hay menos muestras que grupos se devuelve una muestra por punto.
+    """
+    muestras = np.asarray(muestras, dtype=np.float32)
+    if len(muestras) == 0:
+        vacio = np.zeros(0, dtype=np.float32)
+        return vacio, vacio, vacio
+    if len(muestras) <= cantidad:
+        return muestras, muestras, np.abs(muestras)
+
+    bordes = np.linspace(0, len(muestras), cantidad + 1).astype(np.int64)
+    minimos = np.minimum.reduceat(muestras, bordes[:-1])
+    maximos = np.maximum.reduceat(muestras, bordes[:-1])
+    cuadrados = np.add.reduceat(np.square(muestras, dtype=np.float64), bordes[:-1])
+    rms = np.sqrt(cuadrados / np.diff(bordes)).astype(np.float32)
+    return minimos, maximos, rms
+
+
+class PiramideFormaOnda:
+    """
+    Envolvente min/max/energía en niveles sucesivos.
+
+    El nivel 0 resume bloques de `muestras_por_bloque` muestras y cada nivel
+    siguiente une pares de bloques del anterior. Una consulta arma cada punto
+    con los nodos de los niveles que cubren su tramo, así que el costo depende
+    de la cantidad de puntos devueltos y no de la duración del audio.
+    """
+
+    def __init__(
+        self,
+        frecuencia: int,
+        total_muestras: int,
+        muestras_por_bloque: int,
+        niveles: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    ):
+        self.frecuencia = frecuencia
+        self.total_muestras = total_muestras
+        self.muestras_por_bloque = muestras_por_bloque
+        self.niveles = niveles
+
+    @classmethod
+    def construir(
+        cls,
+        bloques: Iterable[np.ndarray],
+        frecuencia: int,
+        muestras_por_bloque: int = config.MUESTRAS_POR_BLOQUE_ONDA
+    ) -> "PiramideFormaOnda":
+        """Construir la pirámide recorriendo una sola vez bloques de muestras mono"""
+        minimos, maximos, cuadrados = [], [], []
+        resto = np.zeros(0, dtype=np.float32)
+        total = 0
+
+        for bloque in bloques:
+            bloque = np.asarray(bloque, dtype=np.float32)
+            total += len(bloque)
+            if len(resto):
+                bloque = np.concatenate([resto, bloque])
+            completos = len(bloque) // muestras_por_bloque * muestras_por_bloque
+            resto = bloque[completos:]
+            if completos:
+                matriz = bloque[:completos].reshape(-1, muestras_por_bloque)
+                minimos.append(matriz.min(axis=1))
+                maximos.append(matriz.max(axis=1))
+                cuadrados.append(np.square(matriz, dtype=np.float64).sum(axis=1))
+
+        # Último bloque incompleto
+        if len(resto):
+            minimos.append(resto.min(keepdims=True))
+            maximos.append(resto.max(keepdims=True))
+            cuadrados.append(np.square(resto, dtype=np.float64).sum(keepdims=True))
+
+        if not minimos:
+            vacio = np.zeros(0, dtype=np.float32)
+            return cls(frecuencia, 0, muestras_por_bloque, [(vacio, vacio, vacio.astype(np.float64))])
+
+        nivel = (
+            np.concatenate(minimos),
+            np.concatenate(maximos),
+            np.concatenate(cuadrados)
+        )
+        niveles = [nivel]
+        while len(nivel[0]) > 1:
+            nivel = tuple(cls._unir_pares(arreglo, operacion) for arreglo, operacion in zip(
+                nivel, (np.minimum, np.maximum, np.add)
+            ))
+            niveles.append(nivel)
+
+        return cls(frecuencia, total, muestras_por_bloque, niveles)
+
+    @staticmethod
+    def _unir_pares(arreglo: np.ndarray, operacion: np.ufunc) -> np.ndarray:
+        if len(arreglo) % 2:
+            pares = operacion(arreglo[:-1:2], arreglo[1::2])
+            return np.concatenate([pares, arreglo[-1:]])
+        return operacion(arreglo[::2], arreglo[1::2])
+
+    def consultar(self, inicio: int, fin: int, cantidad: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Obtener mínimo, máximo y RMS de [inicio, fin) en `cantidad` puntos.
+        Requiere que cada punto abarque al menos `muestras_por_bloque` muestras.
+
+        El punto i abarca [inicio + i·n/cantidad, inicio + (i+1)·n/cantidad)
+        con los bordes redondeados al bloque del nivel 0 más cercano: todos
+        los puntos cubren lo mismo salvo un bloque, y mínimo, máximo y energía
+        son exactos sobre esos bloques. Cada tramo se arma con los nodos
+        alineados de la pirámide que lo cubren (a lo sumo dos por nivel), así
+        que el costo es de cantidad × niveles.
+        """
+        tamano_bloque = self.muestras_por_bloque
+        total_bloques = len(self.niveles[0][0])
+        bordes = np.rint(np.linspace(inicio, fin, cantidad + 1) / tamano_bloque).astype(np.int64)
+        bordes = np.clip(bordes, 0, total_bloques)
+        # Con tramos de un bloque el redondeo (al par en las mitades) puede juntar
+        # bordes vecinos: se los separa para que cada punto tenga al menos un bloque
+        paso = np.arange(cantidad + 1)
+        bordes = np.minimum(np.maximum.accumulate(bordes - paso), total_bloques - cantidad) + paso
+        izquierda, derecha = bordes[:-1].copy(), bordes[1:].copy()
+
+        minimos = np.full(len(izquierda), np.inf, dtype=np.float32)
+        maximos = np.full(len(izquierda), -np.inf, dtype=np.float32)
+        energia = np.zeros(len(izquierda))
+        for nivel in self.niveles:
+            activos = izquierda < derecha
+            if not activos.any():
+                break
+            # Como en un árbol de segmentos: un borde impar toma su nodo y el tramo sube de nivel
+            tomar = activos & (izquierda & 1 == 1)
+            self._acumular(nivel, izquierda[tomar], tomar, minimos, maximos, energia)
+            izquierda += tomar
+            tomar = activos & (derecha & 1 == 1)
+            derecha -= tomar
+            self._acumular(nivel, derecha[tomar], tomar, minimos, maximos, energia)
+            izquierda >>= 1
+            derecha >>= 1
+
+        muestras_por_grupo = (
+            np.minimum(bordes[1:] * tamano_bloque, self.total_muestras) - bordes[:-1] * tamano_bloque
+        )
+        rms = np.sqrt(energia / np.maximum(muestras_por_grupo, 1)).astype(np.float32)
+        return minimos, maximos, rms
+
+    @staticmethod
+    def _acumular(nivel, nodos: np.ndarray, puntos: np.ndarray, minimos, maximos, energia):
+        """Sumar los nodos `nodos` de un nivel a los puntos marcados en `puntos`"""
+        nivel_minimos, nivel_maximos, nivel_cuadrados = nivel
+        minimos[puntos] = np.minimum(minimos[puntos], nivel_minimos[nodos])
+        maximos[puntos] = np.maximum(maximos[puntos], nivel_maximos[nodos])
+        energia[puntos] += nivel_cuadrados[nodos]
+
+    def guardar(self, ruta: str):
+        """Guardar la pirámide en disco de forma atómica"""
+        arreglos = {}
+        for i, (minimos, maximos, cuadrados) in enumerate(self.niveles):
+            arreglos[f"min_{i}"] = minimos
+            arreglos[f"max_{i}"] = maximos
+            arreglos[f"cuad_{i}"] = cuadrados
+        descriptor, ruta_temporal = tempfile.mkstemp(dir=os.path.dirname(ruta) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as archivo:
+                np.savez(
+                    archivo,
+                    meta=np.array([self.frecuencia, self.total_muestras, self.muestras_por_bloque, len(self.niveles)]),
+                    **arreglos
+                )
+            os.replace(ruta_temporal, ruta)
+        except Exception:
+            if os.path.exists(ruta_temporal):
+                os.unlink(ruta_temporal)
+            raise
+
+    @classmethod
+    def cargar(cls, ruta: str) -> "PiramideFormaOnda":
+        """Cargar una pirámide guardada con `guardar`"""
+        with np.load(ruta) as datos:
+            frecuencia, total, muestras_por_bloque, cantidad_niveles = (int(v) for v in datos["meta"])
+            niveles = [
+                (datos[f"min_{i}"], datos[f"max_{i}"], datos[f"cuad_{i}"])
+                for i in range(cantidad_niveles)
+            ]
+        return cls(frecuencia, total, muestras_por_bloque, niveles)
@@ -0,0 +1,120 @@
+"""
+Entradas de una subida en lote
+Recorre los archivos subidos y el contenido de los .zip y .tar (también
+comprimidos) sin extraerlos a disco: cada entrada se entrega como una función
+que abre su flujo, para decodificarla en el pool de trabajos.
+"""
+
+import os
+import tarfile
+import tempfile
+import zipfile
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+from backend.configuracion import config
+from backend.servicios.servicio_audio import ArchivoDemasiadoGrandeError
+
+EXTENSIONES_ZIP = (".zip",)
+EXTENSIONES_TAR = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# (nombre de la entrada, función que abre su contenido o None, error si no se puede usar)
+Entrada = Tuple[str, Optional[Callable[[], BinaryIO]], Optional[str]]
+
+
+class LoteDemasiadoGrandeError(ValueError):
+    """Se lanza cuando un lote supera MAX_ARCHIVOS_LOTE entradas"""
+
+    def __init__(self, limite: int):
+        super().__init__(f"El lote tiene demasiados archivos. Máximo {limite}")
+
+
+def es_comprimido(nombre: str) -> bool:
+    nombre = nombre.lower()
+    return nombre.endswith(EXTENSIONES_ZIP) or nombre.endswith(EXTENSIONES_TAR)
+
+
+def _ignorada(ruta: str) -> bool:
+    """Carpetas y archivos ocultos o de metadatos (__MACOSX, ._archivo, .DS_Store)"""
+    partes = ruta.replace("\\", "/").split("/")
+    return any(parte.startswith(".") or parte == "__MACOSX" for parte in partes if parte)
+
+
+def _validar(nombre: str) -> Optional[str]:
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension not in config.FORMATOS_AUDIO_PERMITIDOS:
+        return f"Formato de archivo no permitido: {extension or 'sin extensión'}"
+    return None
+
+
+def _entradas_zip(flujo: BinaryIO) -> Iterator[Entrada]:
+    """
+    Cada entrada se lee y descomprime directamente del zip. ZipFile serializa
+    las lecturas del archivo subyacente, así que varias entradas pueden
+    leerse a la vez desde hilos distintos.
+    """
+    comprimido = zipfile.ZipFile(flujo)
+    for info in comprimido.infolist():
+        if info.is_dir() or _ignorada(info.filename):
+            continue
+        nombre = os.path.basename(info.filename)
+        error = _validar(nombre)
+        if error is None and info.file_size > config.MAX_TAMANO_ARCHIVO:
+            error = str(ArchivoDemasiadoGrandeError(config.MAX_TAMANO_ARCHIVO))
+        yield nombre, (None if error else (lambda info=info: comprimido.open(info))), error
+
+
+def _entradas_tar(flujo: BinaryIO) -> Iterator[Entrada]:
+    """
+    El tar se recorre en modo flujo (también .gz, .bz2 y .xz). Las entradas
+    solo pueden leerse en orden, así que cada una se copia a un temporal
+    (en memoria si es chica) antes de pasar a la siguiente.
+    """
+    with tarfile.open(fileobj=flujo, mode="r|*") as comprimido:
+        for miembro in comprimido:
+            if not miembro.isfile() or _ignorada(miembro.name):
+                continue
+            nombre = os.path.basename(miembro.name)
+            error = _validar(nombre)
+            if error is None and miembro.size > config.MAX_TAMANO_ARCHIVO:
+                error = str(ArchivoDemasiadoGrandeError(config.MAX_TAMANO_ARCHIVO))
+            if error:
+                yield nombre, None, error
+                continue
+            copia = tempfile.SpooledTemporaryFile(
+                max_size=config.TAMANO_BLOQUE_SUBIDA * 8, dir=config.DIRECTORIO_TEMPORALES
+            )
+            contenido = comprimido.extractfile(miembro)
+            while True:
+                bloque = contenido.read(config.TAMANO_BLOQUE_SUBIDA)
+                if not bloque:
+                    break
+                copia.write(bloque)
+            copia.seek(0)
+            yield nombre, (lambda copia=copia: copia), None
+
+
+def entradas_lote(archivos: List[Tuple[str, BinaryIO]]) -> Iterator[Entrada]:
+    """
+    Recorrer los archivos subidos (nombre, flujo) y el contenido de los
+    comprimidos. Un comprimido dañado produce una entrada con su error.
+    Lanza LoteDemasiadoGrandeError al pasar de MAX_ARCHIVOS_LOTE entradas.
+    """
+    cantidad = 0
+    for nombre, flujo in archivos:
+        if es_comprimido(nombre):
+            try:
+                entradas = _entradas_zip(flujo) if nombre.lower().endswith(EXTENSIONES_ZIP) else _entradas_tar(flujo)
+                for entrada in entradas:
+                    cantidad += 1
+                    if cantidad > config.MAX_ARCHIVOS_LOTE:
+                        raise LoteDemasiadoGrandeError(config.MAX_ARCHIVOS_LOTE)
+                    yield entrada
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+                yield nombre, None, f"No se pudo leer el comprimido: {e}"
+            continue
+
+        cantidad += 1
+        if cantidad > config.MAX_ARCHIVOS_LOTE:
+            raise LoteDemasiadoGrandeError(config.MAX_ARCHIVOS_LOTE)
+        error = _validar(nombre)
+        yield nombre, (None if error else (lambda flujo=flujo: flujo)), error
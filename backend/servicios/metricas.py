@@ -0,0 +1,244 @@
+"""
+Métricas del servicio en formato de texto de Prometheus
+Contadores, medidores e histogramas en memoria del proceso, con etiquetas,
+y un medidor de etapas que sirve como decorador o como bloque `with`
+"""
+
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Límites de los histogramas de duración, en segundos
+CUBETAS_DURACION = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _linea(nombre: str, etiquetas: Sequence[Tuple[str, str]], valor: float) -> str:
+    if etiquetas:
+        texto = ",".join(f'{clave}="{_escapar(str(dato))}"' for clave, dato in etiquetas)
+        return f"{nombre}{{{texto}}} {_numero(valor)}"
+    return f"{nombre} {_numero(valor)}"
+
+
+class _Metrica(ABC):
+    """Base: una familia de series identificadas por los valores de sus etiquetas"""
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series: Dict[tuple, object] = {}
+        self._candado = threading.Lock()
+
+    def _clave(self, valores: dict) -> tuple:
+        if set(valores) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}")
+        return tuple(str(valores[etiqueta]) for etiqueta in self.etiquetas)
+
+    @abstractmethod
+    def _muestras(self) -> Iterable[Tuple[str, List[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        lineas += [_linea(nombre, etiquetas, valor) for nombre, etiquetas, valor in self._muestras()]
+        return lineas
+
+
+class Contador(_Metrica):
+    """Valor que solo aumenta (peticiones, bytes, aciertos de caché)"""
+    tipo = "counter"
+
+    def incrementar(self, cantidad: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            self._series[clave] = self._series.get(clave, 0) + cantidad
+
+    def _muestras(self):
+        with self._candado:
+            series = list(self._series.items())
+        for clave, valor in series:
+            yield self.nombre, list(zip(self.etiquetas, clave)), valor
+
+
+class Medidor(_Metrica):
+    """
+    Valor que sube y baja. Con `funcion` se calcula al exponer: debe retornar
+    un número, o un diccionario {valores de las etiquetas: número}.
+    """
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), funcion: Optional[Callable] = None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def fijar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            self._series[clave] = valor
+
+    def sumar(self, cantidad: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            self._series[clave] = self._series.get(clave, 0) + cantidad
+
+    def _muestras(self):
+        if self.funcion is not None:
+            valor = self.funcion()
+            series = valor.items() if isinstance(valor, dict) else [((), valor)]
+        else:
+            with self._candado:
+                series = list(self._series.items())
+        for clave, valor in series:
+            yield self.nombre, list(zip(self.etiquetas, clave)), valor
+
+
+class ContadorDerivado(Medidor):
+    """Contador que lleva otro componente (p. ej. los aciertos de la caché) y se lee al exponer"""
+    tipo = "counter"
+
+
+class Histograma(_Metrica):
+    """Distribución de observaciones (duraciones) en cubetas acumuladas"""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), cubetas: Sequence[float] = CUBETAS_DURACION):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubetas = tuple(sorted(cubetas))
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect_left(self.cubetas, valor)
+        with self._candado:
+            serie = self._series.get(clave)
+            if serie is None:
+                # Conteos por cubeta (la última es +Inf) y suma
+                serie = self._series[clave] = [[0] * (len(self.cubetas) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def _muestras(self):
+        with self._candado:
+            series = [(clave, list(conteos), suma) for clave, (conteos, suma) in self._series.items()]
+        for clave, conteos, suma in series:
+            etiquetas = list(zip(self.etiquetas, clave))
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas + (float("inf"),), conteos):
+                acumulado += conteo
+                yield self.nombre + "_bucket", etiquetas + [("le", _numero(limite))], acumulado
+            yield self.nombre + "_sum", etiquetas, suma
+            yield self.nombre + "_count", etiquetas, acumulado
+
+
+class RegistroMetricas:
+    """Conjunto de métricas que se exponen juntas en /metricas"""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._candado = threading.Lock()
+
+    def _agregar(self, metrica: _Metrica) -> _Metrica:
+        with self._candado:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                # Registrar dos veces el mismo nombre devuelve la primera (recargas de módulos)
+                return existente
+            self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), funcion: Optional[Callable] = None) -> Medidor:
+        return self._agregar(Medidor(nombre, ayuda, etiquetas, funcion))
+
+    def contador_derivado(self, nombre: str, ayuda: str, funcion: Callable, etiquetas: Sequence[str] = ()) -> ContadorDerivado:
+        return self._agregar(ContadorDerivado(nombre, ayuda, etiquetas, funcion))
+
+    def histograma(
+        self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), cubetas: Sequence[float] = CUBETAS_DURACION
+    ) -> Histograma:
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, cubetas))
+
+    def exponer(self) -> str:
+        """Todas las métricas en el formato de texto 0.0.4 de Prometheus"""
+        with self._candado:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            try:
+                lineas += metrica.exponer()
+            except Exception as e:
+                # Un componente que falla al leerse no debe dejar sin métricas al resto
+                lineas.append(f"# ERROR {metrica.nombre}: {_escapar(str(e))}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro global del proceso
+metricas = RegistroMetricas()
+
+duracion_etapas = metricas.histograma(
+    "audio_etapa_duracion_segundos",
+    "Tiempo de cada etapa del procesamiento (decodificación, remuestreo, cuantización, FFT, serialización...)",
+    ["etapa"]
+)
+consultas_cache = metricas.contador(
+    "audio_cache_consultas_total",
+    "Consultas a las cachés del servicio por resultado (acierto o fallo)",
+    ["cache", "resultado"]
+)
+
+
+class medir_etapa:
+    """
+    Registrar la duración de una etapa en `audio_etapa_duracion_segundos`.
+    Sirve como decorador o como bloque `with`:
+
+        @medir_etapa("fft")
+        def welch(...): ...
+
+        with medir_etapa("decodificacion"):
+            ...
+    """
+
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+        self._inicio = threading.local()
+
+    def __enter__(self):
+        # Una pila por hilo: la misma instancia puede usarse anidada o desde varios hilos
+        pila = getattr(self._inicio, "pila", None)
+        if pila is None:
+            pila = self._inicio.pila = []
+        pila.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *excepcion):
+        duracion_etapas.observar(time.perf_counter() - self._inicio.pila.pop(), etapa=self.etapa)
+
+    def __call__(self, funcion: Callable) -> Callable:
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with self:
+                return funcion(*args, **kwargs)
+        return envoltura
+
+
+def registrar_consulta_cache(cache: str, acierto: bool):
+    """Contar un acierto o un fallo de una caché"""
+    consultas_cache.incrementar(cache=cache, resultado="acierto" if acierto else "fallo")
@@ -0,0 +1,165 @@
+"""
+Escucha previa comprimida
+Codifica un WAV a Opus, MP3 o FLAC a medida que se envía, desde cualquier
+posición, para escuchar un resultado sin descargar el WAV completo
+"""
+
+import subprocess
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+
+from backend.configuracion import config
+from backend.servicios.deteccion_ffmpeg import CapacidadesFFmpeg
+from backend.servicios.wav_mapeado import abrir_wav
+
+# Formato → (tipo MIME, argumentos de salida de ffmpeg); FLAC se codifica con soundfile
+FORMATOS_PREVIA = {
+    "opus": ("audio/ogg", ["-c:a", "libopus", "-b:a", config.BITRATE_PREVIA_OPUS, "-ar", "48000", "-f", "ogg"]),
+    "mp3": ("audio/mpeg", ["-c:a", "libmp3lame", "-b:a", config.BITRATE_PREVIA_MP3, "-f", "mp3"]),
+    "flac": ("audio/flac", None),
+}
+
+
+class PreviaFFmpeg:
+    """
+    Codificación con un proceso de ffmpeg que lee el WAV desde `inicio` y
+    escribe el resultado en su salida estándar. `cerrar` mata el proceso y
+    se puede llamar desde otro hilo mientras se está leyendo.
+    """
+
+    def __init__(self, ruta_ffmpeg: str, ruta: str, formato: str, inicio: float = 0.0, canales: int = 2):
+        self.tipo_mime, argumentos = FORMATOS_PREVIA[formato]
+        comando = [
+            ruta_ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin",
+            "-ss", f"{inicio:.6f}", "-i", ruta,
+            "-vn", "-ac", str(canales), *argumentos,
+            "-flush_packets", "1", "pipe:1"
+        ]
+        self._errores = tempfile.TemporaryFile()
+        # Sin búfer: cada lectura devuelve lo que ffmpeg ya escribió
+        self._proceso = subprocess.Popen(
+            comando, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=self._errores, bufsize=0
+        )
+
+    def leer(self) -> bytes:
+        """Siguiente bloque codificado; b"" al terminar"""
+        bloque = self._proceso.stdout.read(config.TAMANO_BLOQUE_PREVIA)
+        if bloque:
+            return bloque
+        codigo = self._proceso.wait()
+        if codigo > 0:
+            self._errores.seek(0)
+            detalle = self._errores.read().decode(errors="replace").strip()
+            raise IOError(f"ffmpeg terminó con código {codigo}: {detalle}")
+        return b""
+
+    def cerrar(self):
+        if self._proceso.poll() is None:
+            self._proceso.kill()
+        self._proceso.wait()
+        self._proceso.stdout.close()
+        self._errores.close()
+
+
+class _SalidaFLAC:
+    """
+    Destino de escritura para soundfile que acumula los bytes hasta que se
+    retiran. FLAC vuelve al principio solo al cerrar, para completar la
+    cabecera con el total de muestras; esas reescrituras se descartan (un
+    FLAC en flujo puede dejar ese dato en cero).
+    """
+
+    def __init__(self):
+        self.posicion = 0
+        self.fin = 0
+        self.partes = []
+
+    def write(self, datos) -> int:
+        if self.posicion == self.fin:
+            self.partes.append(bytes(datos))
+            self.fin += len(datos)
+        self.posicion += len(datos)
+        return len(datos)
+
+    def seek(self, desplazamiento: int, desde: int = 0) -> int:
+        if desde == 0:
+            self.posicion = desplazamiento
+        elif desde == 1:
+            self.posicion += desplazamiento
+        else:
+            self.posicion = self.fin + desplazamiento
+        return self.posicion
+
+    def tell(self) -> int:
+        return self.posicion
+
+    def read(self, cantidad: int = -1) -> bytes:
+        return b""
+
+    def retirar(self) -> bytes:
+        datos = b"".join(self.partes)
+        self.partes = []
+        return datos
+
+
+class PreviaFLAC:
+    """Codificación FLAC en el mismo proceso, bloque a bloque con soundfile"""
+
+    tipo_mime = FORMATOS_PREVIA["flac"][0]
+
+    def __init__(self, ruta: str, inicio: float = 0.0):
+        lector = abrir_wav(ruta)
+        self._entrada = lector.bloques(
+            config.TAMANO_BLOQUE_CONVERSION, inicio=int(inicio * lector.frecuencia)
+        )
+        self._destino = _SalidaFLAC()
+        self._salida = sf.SoundFile(
+            self._destino, "w",
+            samplerate=lector.frecuencia,
+            channels=lector.canales,
+            format="FLAC",
+            subtype="PCM_16"
+        )
+        self._candado = threading.Lock()
+        self._terminado = False
+
+    def leer(self) -> bytes:
+        with self._candado:
+            while not self._terminado:
+                bloque = next(self._entrada, None)
+                if bloque is not None:
+                    self._salida.write(np.clip(bloque, -1.0, 1.0))
+                else:
+                    self._salida.close()
+                    self._terminado = True
+                datos = self._destino.retirar()
+                if datos:
+                    return datos
+            return b""
+
+    def cerrar(self):
+        with self._candado:
+            if not self._terminado:
+                self._salida.close()
+                self._terminado = True
+
+
+def abrir_previa(ruta: str, formato: str, inicio: float = 0.0, ffmpeg: Optional[CapacidadesFFmpeg] = None):
+    """Abrir la codificación de un WAV desde `inicio` (segundos) en el formato pedido"""
+    if formato not in FORMATOS_PREVIA:
+        raise ValueError(f"Formato de escucha desconocido: {formato}")
+    if formato == "flac":
+        return PreviaFLAC(ruta, inicio)
+    if ffmpeg is None or not ffmpeg.disponible:
+        raise IOError("ffmpeg no está disponible")
+    argumentos = FORMATOS_PREVIA[formato][1]
+    codec = argumentos[argumentos.index("-c:a") + 1]
+    if not ffmpeg.codifica(codec):
+        raise IOError(f"ffmpeg no incluye el codificador {codec}")
+    # Las previas con pérdida se reducen a estéreo como máximo
+    canales = min(abrir_wav(ruta).canales, config.MAX_CANALES_PREVIA)
+    return PreviaFFmpeg(ffmpeg.ruta, ruta, formato, inicio, canales)
@@ -0,0 +1,231 @@
+"""
+Recolector de archivos temporales
+Tarea de fondo que elimina los archivos abandonados (sin acceso durante un
+tiempo), mantiene el directorio de temporales dentro de una cuota de bytes
+y hace los borrados fuera de las peticiones
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from backend.configuracion import config
+
+log = logging.getLogger(__name__)
+
+
+def _tamano(ruta: str) -> int:
+    """Bytes que ocupa un archivo o un directorio completo"""
+    if os.path.isdir(ruta):
+        return sum(
+            os.path.getsize(os.path.join(raiz, nombre))
+            for raiz, _, nombres in os.walk(ruta) for nombre in nombres
+        )
+    return os.path.getsize(ruta)
+
+
+def _base(nombre: str) -> str:
+    """WAV al que pertenece una entrada del directorio (los derivados llevan su nombre como prefijo)"""
+    indice = nombre.find(".wav")
+    return nombre[:indice + 4] if indice >= 0 else nombre
+
+
+class RecolectorTemporales:
+    """
+    Recolector del directorio de temporales.
+
+    En cada pasada elimina los archivos registrados cuyo último acceso es
+    más viejo que `ttl`, luego los menos usados recientemente hasta que el
+    total entra en `cuota_bytes` (con almacenamiento remoto solo se borran
+    sus copias locales), y por último los archivos que no figuran
+    en el registro (subidas interrumpidas, restos de un reinicio) después de
+    `gracia_huerfanos` segundos. Los borrados se hacen en un hilo aparte.
+    """
+
+    def __init__(
+        self,
+        servicio,
+        directorio: str = config.DIRECTORIO_TEMPORALES,
+        ttl: float = config.TTL_TEMPORALES_SEGUNDOS,
+        cuota_bytes: int = config.CUOTA_TEMPORALES_BYTES,
+        intervalo: float = config.INTERVALO_RECOLECCION_SEGUNDOS,
+        gracia_huerfanos: float = config.GRACIA_HUERFANOS_SEGUNDOS
+    ):
+        self.servicio = servicio
+        self.directorio = directorio
+        self.ttl = ttl
+        self.cuota_bytes = cuota_bytes
+        self.intervalo = intervalo
+        self.gracia_huerfanos = gracia_huerfanos
+        # Las bases de datos y la detección de ffmpeg viven en el mismo directorio y nunca se tocan
+        self._excluidos = tuple(
+            os.path.basename(ruta)
+            for ruta in (config.RUTA_BASE_REGISTRO, config.RUTA_BASE_TRABAJOS, config.RUTA_CACHE_FFMPEG)
+        )
+        self._tarea: Optional[asyncio.Task] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._candado = threading.Lock()
+        self.estadisticas = {
+            "archivos": 0,
+            "bytes_en_uso": 0,
+            "archivos_expirados": 0,
+            "archivos_expulsados": 0,
+            "huerfanos_eliminados": 0,
+            "bytes_liberados": 0,
+            "ultima_recoleccion": None,
+        }
+
+    async def iniciar(self):
+        """Lanzar la tarea periódica (la primera pasada es inmediata)"""
+        self._tarea = asyncio.create_task(self._ciclo())
+
+    async def detener(self):
+        """Cancelar la tarea y esperar los borrados pendientes"""
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        with self._candado:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown, wait=True)
+
+    async def _ciclo(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.recolectar)
+            except Exception:
+                log.exception("Error al recolectar temporales")
+            await asyncio.sleep(self.intervalo)
+
+    def programar(self, funcion: Callable, *args):
+        """Ejecutar una limpieza en el hilo de borrados"""
+        with self._candado:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="borrado")
+            self._pool.submit(self._registrar_errores, funcion, *args)
+
+    @staticmethod
+    def _registrar_errores(funcion: Callable, *args):
+        try:
+            funcion(*args)
+        except Exception:
+            log.exception("Error en una limpieza en segundo plano")
+
+    def programar_borrado(self, rutas: Iterable[str]):
+        """Borrar archivos o directorios en segundo plano"""
+        self.programar(self._borrar, list(rutas))
+
+    def _borrar(self, rutas):
+        liberados = 0
+        for ruta in rutas:
+            try:
+                tamano = _tamano(ruta)
+                if os.path.isdir(ruta):
+                    shutil.rmtree(ruta)
+                else:
+                    os.unlink(ruta)
+                liberados += tamano
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("No se pudo borrar", extra={"ruta": ruta, "error": str(e)})
+        with self._candado:
+            self.estadisticas["bytes_liberados"] += liberados
+
+    def _escanear(self) -> Dict[str, list]:
+        """Agrupar las entradas del directorio por WAV: base → [(ruta, bytes, modificado)]"""
+        grupos: Dict[str, list] = {}
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.startswith(self._excluidos):
+                    continue
+                try:
+                    datos = (entrada.path, _tamano(entrada.path), entrada.stat().st_mtime)
+                except FileNotFoundError:
+                    continue
+                grupos.setdefault(_base(entrada.name), []).append(datos)
+        return grupos
+
+    def recolectar(self) -> dict:
+        """Hacer una pasada completa y retornar las estadísticas acumuladas"""
+        ahora = time.time()
+        grupos = self._escanear()
+        archivos = self.servicio.registro.listar()
+
+        # WAV (original y variantes, con sus derivados) que usa cada archivo registrado;
+        # un mismo WAV puede estar compartido por varios archivos con igual contenido
+        bases_por_archivo = {}
+        referencias: Dict[str, int] = {}
+        for archivo in archivos:
+            bases = {os.path.basename(ruta) for ruta in [archivo["ruta"], *archivo["variantes"].values()]}
+            bases_por_archivo[archivo["id"]] = bases
+            for base in bases:
+                referencias[base] = referencias.get(base, 0) + 1
+        tamanos = {base: sum(tamano for _, tamano, _ in datos) for base, datos in grupos.items()}
+        total = sum(tamanos.values())
+
+        def quitar(archivo) -> int:
+            """Limpiar un archivo y retornar los bytes que deja de ocupar"""
+            self.servicio.limpiar_archivo(archivo["id"])
+            liberados = 0
+            for base in bases_por_archivo.pop(archivo["id"]):
+                referencias[base] -= 1
+                if referencias[base] == 0:
+                    liberados += tamanos.get(base, 0)
+            return liberados
+
+        soltadas = set()
+
+        def soltar(archivo) -> int:
+            """Borrar solo las copias locales (el archivo sigue en el almacenamiento remoto)"""
+            liberados = 0
+            for base in bases_por_archivo[archivo["id"]] - soltadas:
+                soltadas.add(base)
+                if base in grupos:
+                    self.programar_borrado(ruta for ruta, _, _ in grupos[base])
+                    liberados += tamanos[base]
+            return liberados
+
+        expirados = [archivo for archivo in archivos if archivo["ultimo_acceso"] < ahora - self.ttl]
+        for archivo in expirados:
+            total -= quitar(archivo)
+
+        # Cuota: expulsar los menos usados recientemente. Con almacenamiento
+        # remoto el disco es una caché y se vacía sin quitar archivos del registro
+        remoto = self.servicio.almacenamiento.remoto
+        expulsados = 0
+        vigentes = sorted(
+            (archivo for archivo in archivos if archivo["id"] in bases_por_archivo),
+            key=lambda archivo: archivo["ultimo_acceso"]
+        )
+        for archivo in vigentes:
+            if total <= self.cuota_bytes:
+                break
+            total -= soltar(archivo) if remoto else quitar(archivo)
+            expulsados += 1
+
+        # Huérfanos: entradas sin registro que ya no se están escribiendo
+        rutas_huerfanas = []
+        for base, datos in grupos.items():
+            if base in referencias:
+                continue
+            if all(modificado < ahora - self.gracia_huerfanos for _, _, modificado in datos):
+                rutas_huerfanas.extend(ruta for ruta, _, _ in datos)
+                total -= tamanos[base]
+        if rutas_huerfanas:
+            self.programar_borrado(rutas_huerfanas)
+
+        with self._candado:
+            self.estadisticas["archivos"] = len(bases_por_archivo)
+            self.estadisticas["bytes_en_uso"] = total
+            self.estadisticas["archivos_expirados"] += len(expirados)
+            self.estadisticas["archivos_expulsados"] += expulsados
+            self.estadisticas["huerfanos_eliminados"] += len(rutas_huerfanas)
+            self.estadisticas["ultima_recoleccion"] = ahora
+            return dict(self.estadisticas)
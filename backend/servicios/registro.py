@@ -0,0 +1,388 @@
+"""
+Registro de archivos subidos
+Guarda la ruta, los metadatos y las variantes de cada archivo en un almacén
+compartido (SQLite en modo WAL), de modo que varios procesos de uvicorn vean
+los mismos archivos y un reinicio no deje huérfanos los temporales.
+También lleva los contenidos deduplicados: cada WAV se indexa por una clave
+de contenido (hash de la subida, o hash más variante para una conversión) y
+se cuenta cuántas entradas lo usan
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from backend.configuracion import config
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    id TEXT PRIMARY KEY,
+    ruta TEXT NOT NULL,
+    nombre_original TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    frecuencia_muestreo INTEGER NOT NULL,
+    canales INTEGER NOT NULL,
+    muestras INTEGER NOT NULL,
+    duracion REAL NOT NULL,
+    creado REAL NOT NULL,
+    ultimo_acceso REAL NOT NULL,
+    estadisticas TEXT
+);
+CREATE INDEX IF NOT EXISTS archivos_hash ON archivos(hash);
+CREATE TABLE IF NOT EXISTS variantes (
+    archivo_id TEXT NOT NULL REFERENCES archivos(id) ON DELETE CASCADE,
+    variante TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    PRIMARY KEY (archivo_id, variante)
+);
+CREATE TABLE IF NOT EXISTS contenidos (
+    clave TEXT PRIMARY KEY,
+    ruta TEXT NOT NULL UNIQUE,
+    referencias INTEGER NOT NULL
+);
+"""
+
+# Metadatos que se calculan una vez al subir el archivo
+CAMPOS_METADATOS = ("hash", "tamano", "frecuencia_muestreo", "canales", "muestras", "duracion")
+# Además `estadisticas` (opcional): el registro de estadisticas.py, que se guarda como JSON
+
+
+class RegistroArchivos(ABC):
+    """
+    Interfaz del registro. Cada entrada es un dict con `ruta` (WAV original),
+    `nombre_original`, los metadatos de CAMPOS_METADATOS, `estadisticas`
+    (None en entradas anteriores a que se calcularan), `creado`,
+    `ultimo_acceso` y `variantes` (nombre → ruta, incluido 'procesado').
+    """
+
+    @abstractmethod
+    def agregar(self, archivo_id: str, ruta: str, nombre_original: str, metadatos: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def obtener(self, archivo_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def guardar_variante(self, archivo_id: str, variante: str, ruta: str) -> Optional[str]:
+        """Asociar una variante a un archivo; retorna la ruta que reemplaza, si había"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def eliminar(self, archivo_id: str) -> Optional[dict]:
+        """Quitar un archivo del registro y retornar su entrada"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def tocar(self, archivo_id: str):
+        """Registrar un acceso al archivo"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def listar(self) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def adquirir_contenido(self, clave: str) -> Optional[str]:
+        """Sumar una referencia al contenido con esa clave y retornar su ruta, si existe"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def registrar_contenido(self, clave: str, ruta: str) -> str:
+        """
+        Registrar un contenido nuevo con una referencia. Si otro lo registró
+        primero, se suma una referencia al existente y se retorna su ruta.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def liberar_contenido(self, ruta: str) -> bool:
+        """Quitar una referencia; retorna True si nadie más usa la ruta y se puede borrar"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clave_contenido(self, ruta: str) -> Optional[str]:
+        """Clave de contenido con la que se registró una ruta, si está registrada"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def estadisticas_contenido(self, huella: str) -> Optional[dict]:
+        """Estadísticas ya calculadas de otra entrada con la misma huella, si hay"""
+        raise NotImplementedError
+
+
+class RegistroMemoria(RegistroArchivos):
+    """Registro en un dict del proceso; sirve para un solo proceso de uvicorn"""
+
+    def __init__(self):
+        self._archivos: Dict[str, dict] = {}
+        self._contenidos: Dict[str, str] = {}  # clave → ruta
+        self._referencias: Dict[str, int] = {}  # ruta → referencias
+        self._candado = threading.Lock()
+
+    def agregar(self, archivo_id, ruta, nombre_original, metadatos):
+        ahora = time.time()
+        with self._candado:
+            self._archivos[archivo_id] = {
+                "id": archivo_id,
+                "ruta": ruta,
+                "nombre_original": nombre_original,
+                **{campo: metadatos[campo] for campo in CAMPOS_METADATOS},
+                "estadisticas": metadatos.get("estadisticas"),
+                "creado": ahora,
+                "ultimo_acceso": ahora,
+                "variantes": {},
+            }
+
+    def obtener(self, archivo_id):
+        with self._candado:
+            entrada = self._archivos.get(archivo_id)
+            return dict(entrada, variantes=dict(entrada["variantes"])) if entrada else None
+
+    def guardar_variante(self, archivo_id, variante, ruta):
+        with self._candado:
+            if archivo_id not in self._archivos:
+                raise ValueError("Archivo no encontrado")
+            variantes = self._archivos[archivo_id]["variantes"]
+            anterior = variantes.get(variante)
+            variantes[variante] = ruta
+            return anterior
+
+    def eliminar(self, archivo_id):
+        with self._candado:
+            return self._archivos.pop(archivo_id, None)
+
+    def tocar(self, archivo_id):
+        with self._candado:
+            if archivo_id in self._archivos:
+                self._archivos[archivo_id]["ultimo_acceso"] = time.time()
+
+    def listar(self):
+        with self._candado:
+            return [dict(entrada, variantes=dict(entrada["variantes"])) for entrada in self._archivos.values()]
+
+    def adquirir_contenido(self, clave):
+        with self._candado:
+            ruta = self._contenidos.get(clave)
+            if ruta is not None:
+                self._referencias[ruta] += 1
+            return ruta
+
+    def registrar_contenido(self, clave, ruta):
+        with self._candado:
+            ruta = self._contenidos.setdefault(clave, ruta)
+            self._referencias[ruta] = self._referencias.get(ruta, 0) + 1
+            return ruta
+
+    def liberar_contenido(self, ruta):
+        with self._candado:
+            if ruta not in self._referencias:
+                return True
+            self._referencias[ruta] -= 1
+            if self._referencias[ruta] > 0:
+                return False
+            del self._referencias[ruta]
+            self._contenidos = {clave: otra for clave, otra in self._contenidos.items() if otra != ruta}
+            return True
+
+    def clave_contenido(self, ruta):
+        with self._candado:
+            return next((clave for clave, otra in self._contenidos.items() if otra == ruta), None)
+
+    def estadisticas_contenido(self, huella):
+        with self._candado:
+            return next((
+                entrada["estadisticas"] for entrada in self._archivos.values()
+                if entrada["hash"] == huella and entrada["estadisticas"] is not None
+            ), None)
+
+
+class RegistroSQLite(RegistroArchivos):
+    """
+    Registro en una base SQLite compartida por todos los procesos.
+
+    Usa modo WAL para que las lecturas no esperen a las escrituras. Los
+    accesos se guardan como mucho una vez cada `intervalo_acceso` segundos
+    por archivo, para no escribir en la base en cada consulta.
+    """
+
+    def __init__(
+        self,
+        ruta_base_datos: str = config.RUTA_BASE_REGISTRO,
+        intervalo_acceso: float = config.INTERVALO_ACCESO_SEGUNDOS
+    ):
+        self.ruta_base_datos = ruta_base_datos
+        self.intervalo_acceso = intervalo_acceso
+        self._conexion: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._candado = threading.Lock()
+        self._accesos: Dict[str, float] = {}
+
+    def _conectar(self) -> sqlite3.Connection:
+        # Cada proceso abre su propia conexión (no se comparten entre fork)
+        if self._conexion is None or self._pid != os.getpid():
+            self._conexion = sqlite3.connect(self.ruta_base_datos, check_same_thread=False, timeout=30)
+            self._conexion.row_factory = sqlite3.Row
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA foreign_keys=ON")
+            self._migrar(self._conexion)
+            self._conexion.executescript(ESQUEMA)
+            self._pid = os.getpid()
+        return self._conexion
+
+    @staticmethod
+    def _migrar(conexion: sqlite3.Connection):
+        """Agregar a una base creada por una versión anterior las columnas que le faltan"""
+        columnas = {fila[1] for fila in conexion.execute("PRAGMA table_info(archivos)")}
+        if columnas and "estadisticas" not in columnas:
+            try:
+                with conexion:
+                    conexion.execute("ALTER TABLE archivos ADD COLUMN estadisticas TEXT")
+            except sqlite3.OperationalError:
+                # Otro proceso la agregó al mismo tiempo
+                pass
+
+    @staticmethod
+    def _entrada(fila: sqlite3.Row, variantes: dict) -> dict:
+        entrada = dict(fila, variantes=variantes)
+        if entrada.get("estadisticas"):
+            entrada["estadisticas"] = json.loads(entrada["estadisticas"])
+        return entrada
+
+    def agregar(self, archivo_id, ruta, nombre_original, metadatos):
+        ahora = time.time()
+        estadisticas = metadatos.get("estadisticas")
+        with self._candado:
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute(
+                    f"""
+                    INSERT INTO archivos (
+                        id, ruta, nombre_original, {', '.join(CAMPOS_METADATOS)}, creado, ultimo_acceso, estadisticas
+                    )
+                    VALUES (?, ?, ?, {', '.join('?' * len(CAMPOS_METADATOS))}, ?, ?, ?)
+                    """,
+                    (
+                        archivo_id, ruta, nombre_original, *(metadatos[campo] for campo in CAMPOS_METADATOS),
+                        ahora, ahora, json.dumps(estadisticas) if estadisticas is not None else None
+                    )
+                )
+
+    def obtener(self, archivo_id):
+        with self._candado:
+            conexion = self._conectar()
+            fila = conexion.execute("SELECT * FROM archivos WHERE id = ?", (archivo_id,)).fetchone()
+            if fila is None:
+                return None
+            variantes = conexion.execute(
+                "SELECT variante, ruta FROM variantes WHERE archivo_id = ?", (archivo_id,)
+            ).fetchall()
+        return self._entrada(fila, {variante: ruta for variante, ruta in variantes})
+
+    def guardar_variante(self, archivo_id, variante, ruta):
+        with self._candado:
+            conexion = self._conectar()
+            with conexion:
+                anterior = conexion.execute(
+                    "SELECT ruta FROM variantes WHERE archivo_id = ? AND variante = ?", (archivo_id, variante)
+                ).fetchone()
+                try:
+                    conexion.execute(
+                        "INSERT OR REPLACE INTO variantes (archivo_id, variante, ruta) VALUES (?, ?, ?)",
+                        (archivo_id, variante, ruta)
+                    )
+                except sqlite3.IntegrityError:
+                    raise ValueError("Archivo no encontrado")
+        return anterior[0] if anterior else None
+
+    def eliminar(self, archivo_id):
+        entrada = self.obtener(archivo_id)
+        if entrada is None:
+            return None
+        with self._candado:
+            conexion = self._conectar()
+            with conexion:
+                borradas = conexion.execute("DELETE FROM archivos WHERE id = ?", (archivo_id,)).rowcount
+            self._accesos.pop(archivo_id, None)
+        # Si otro proceso lo borró primero, ese proceso se encarga de los archivos
+        return entrada if borradas else None
+
+    def tocar(self, archivo_id):
+        ahora = time.time()
+        if ahora - self._accesos.get(archivo_id, 0.0) < self.intervalo_acceso:
+            return
+        with self._candado:
+            self._accesos[archivo_id] = ahora
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute("UPDATE archivos SET ultimo_acceso = ? WHERE id = ?", (ahora, archivo_id))
+
+    def listar(self):
+        with self._candado:
+            conexion = self._conectar()
+            filas = conexion.execute("SELECT * FROM archivos").fetchall()
+            variantes = conexion.execute("SELECT archivo_id, variante, ruta FROM variantes").fetchall()
+        entradas = {fila["id"]: self._entrada(fila, {}) for fila in filas}
+        for archivo_id, variante, ruta in variantes:
+            if archivo_id in entradas:
+                entradas[archivo_id]["variantes"][variante] = ruta
+        return list(entradas.values())
+
+    def adquirir_contenido(self, clave):
+        with self._candado:
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute("UPDATE contenidos SET referencias = referencias + 1 WHERE clave = ?", (clave,))
+                fila = conexion.execute("SELECT ruta FROM contenidos WHERE clave = ?", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def registrar_contenido(self, clave, ruta):
+        with self._candado:
+            conexion = self._conectar()
+            with conexion:
+                # La primera escritura toma el bloqueo de la base hasta el final de la transacción
+                conexion.execute("UPDATE contenidos SET referencias = referencias + 1 WHERE clave = ?", (clave,))
+                conexion.execute(
+                    "INSERT OR IGNORE INTO contenidos (clave, ruta, referencias) VALUES (?, ?, 1)", (clave, ruta)
+                )
+                fila = conexion.execute("SELECT ruta FROM contenidos WHERE clave = ?", (clave,)).fetchone()
+        return fila[0]
+
+    def liberar_contenido(self, ruta):
+        with self._candado:
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute("UPDATE contenidos SET referencias = referencias - 1 WHERE ruta = ?", (ruta,))
+                fila = conexion.execute("SELECT referencias FROM contenidos WHERE ruta = ?", (ruta,)).fetchone()
+                if fila is None:
+                    return True
+                if fila[0] > 0:
+                    return False
+                conexion.execute("DELETE FROM contenidos WHERE ruta = ?", (ruta,))
+        return True
+
+    def clave_contenido(self, ruta):
+        with self._candado:
+            fila = self._conectar().execute("SELECT clave FROM contenidos WHERE ruta = ?", (ruta,)).fetchone()
+        return fila[0] if fila else None
+
+    def estadisticas_contenido(self, huella):
+        with self._candado:
+            fila = self._conectar().execute(
+                "SELECT estadisticas FROM archivos WHERE hash = ? AND estadisticas IS NOT NULL LIMIT 1", (huella,)
+            ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+
+def crear_registro(tipo: str = config.REGISTRO_ARCHIVOS) -> RegistroArchivos:
+    """Crear el registro configurado: 'sqlite' (compartido) o 'memoria' (un proceso)"""
+    if tipo == "sqlite":
+        return RegistroSQLite()
+    if tipo == "memoria":
+        return RegistroMemoria()
+    raise ValueError(f"Registro de archivos desconocido: {tipo}")
@@ -5,64 +5,106 @@ Maneja la lógica de negocio para procesar archivos de audio
 
 import os
 import uuid
+import logging
+import hashlib
 import tempfile
-from typing import Optional, Tuple, List
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, List, BinaryIO, Callable, Union
 import soundfile as sf
 import numpy as np
-from scipy.fft import fft
-from scipy import signal
-import matplotlib.pyplot as plt
-import io
-import base64
-from pydub import AudioSegment
-
-# Configurar pydub para usar ffmpeg
-from pydub.utils import which
 import subprocess
 
 from backend.configuracion import config
-from backend.modelo.esquemas import ConfiguracionAudio, DatosFormaOnda, DatosEspectro
+from backend.modelo.esquemas import (
+    ConfiguracionAudio, InfoEspectrograma, VarianteAudio
+)
+from backend.servicios.ejecutor import ejecutor_trabajos
+from backend.servicios.cache_muestras import CacheMuestras
+from backend.servicios.forma_onda import PiramideFormaOnda, a_mono, envolvente
+from backend.servicios.espectro import (
+    welch, welch_archivo, segmentos_de_arreglo, longitud_por_bins, reducir_bins, escalar
+)
+from backend.servicios.espectrograma import Espectrograma, SUFIJO_ESPECTROGRAMA, codificar_png
+from backend.servicios.conversion import ConversorPCM, convertir, convertir_varios
+from backend.servicios.trabajos import cola_trabajos
+from backend.servicios.registro import crear_registro
+from backend.servicios.almacenamiento import crear_almacenamiento
+from backend.servicios.recolector import RecolectorTemporales
+from backend.servicios.previa import abrir_previa
+from backend.servicios.wav_mapeado import abrir_wav
+from backend.servicios.estadisticas import estadisticas_archivo
+from backend.servicios.metricas import metricas, medir_etapa, registrar_consulta_cache
+from backend.servicios.bitacora import configurar_bitacora
+from backend.servicios.deteccion_ffmpeg import CapacidadesFFmpeg, obtener_ffmpeg
+
+log = logging.getLogger(__name__)
+
+# Archivos derivados que se guardan junto a cada WAV temporal
+SUFIJO_PIRAMIDE = ".onda.npz"
+SUFIJOS_DERIVADOS = [SUFIJO_PIRAMIDE, SUFIJO_ESPECTROGRAMA]
+
+
+def id_variante(config_audio: ConfiguracionAudio) -> str:
+    """ID estable de la variante que produce una configuración de conversión"""
+    variante_id = f"{config_audio.frecuencia_muestreo}hz-{config_audio.bits}bits"
+    return variante_id + "-dither" if config_audio.dither else variante_id
+
+
+class ArchivoDemasiadoGrandeError(IOError):
+    """Se lanza cuando un archivo subido supera MAX_TAMANO_ARCHIVO"""
+
+    def __init__(self, limite_bytes: int):
+        super().__init__(f"El archivo es demasiado grande. Máximo {limite_bytes // (1024 * 1024)}MB")
+
+
+class LectorConHuella:
+    """Envuelve un flujo de lectura y calcula el SHA-256 de lo que se va leyendo"""
+    
+    def __init__(self, flujo: BinaryIO, huella):
+        self.flujo = flujo
+        self.huella = huella
+    
+    def read(self, cantidad: int = -1) -> bytes:
+        datos = self.flujo.read(cantidad)
+        self.huella.update(datos)
+        return datos
+
 
 class ServicioAudio:
     """Servicio para procesamiento de archivos de audio"""
     
     def __init__(self):
-        self.archivos_temporales = {}  # Archivos en memoria por sesión
-        self._configurar_ffmpeg()
-    
-    def _configurar_ffmpeg(self):
-        """Configurar ffmpeg para pydub"""
-        # Buscar ffmpeg en rutas comunes de Windows
-        rutas_posibles = [
-            "ffmpeg",  # Si está en PATH
-            r"C:\ffmpeg\bin\ffmpeg.exe",
-            r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-            r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe",
-            r"C:\Users\pedro\AppData\Local\Microsoft\WinGet\Links\ffmpeg.exe",  # Tu instalación
-            os.path.expanduser(r"~\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-6.1.1-full_build\bin\ffmpeg.exe")
-        ]
-        
-        for ruta in rutas_posibles:
-            try:
-                if os.path.exists(ruta) or which(ruta):
-                    print(f"ffmpeg encontrado en: {ruta}")
-                    # Configurar pydub para usar esta ruta
-                    AudioSegment.converter = ruta
-                    # Verificar que funciona
-                    try:
-                        result = subprocess.run([ruta, "-version"], capture_output=True, text=True, timeout=5)
-                        if result.returncode == 0:
-                            print(f"ffmpeg funciona correctamente")
-                            return
-                        else:
-                            print(f"ffmpeg no responde correctamente: {result.stderr}")
-                    except Exception as e:
-                        print(f"Error al verificar ffmpeg: {e}")
-            except Exception as e:
-                print(f"Error al verificar ruta {ruta}: {e}")
-                continue
-        
-        print("ADVERTENCIA: ffmpeg no encontrado. Algunos formatos de audio pueden no funcionar.")
+        self.registro = crear_registro()  # Archivos subidos, compartidos entre procesos
+        self.almacenamiento = crear_almacenamiento()  # Disco local o S3; los WAV se leen siempre desde `local`
+        self.recolector = RecolectorTemporales(self)  # Vencimiento, cuota y borrados en segundo plano
+        self.cache_muestras = CacheMuestras()
+        self._piramides = OrderedDict()  # Pirámides de forma de onda por ruta
+        self._candado_piramides = threading.Lock()
+    
+    @property
+    def ffmpeg(self) -> CapacidadesFFmpeg:
+        """ffmpeg disponible y sus códecs; se detecta al usarlo por primera vez"""
+        return obtener_ffmpeg()
+    
+    @property
+    def ruta_ffmpeg(self) -> Optional[str]:
+        return self.ffmpeg.ruta
+    
+    @property
+    def piramides_cargadas(self) -> int:
+        """Pirámides de forma de onda en memoria"""
+        with self._candado_piramides:
+            return len(self._piramides)
+    
+    def precargar(self):
+        """
+        Hacer por adelantado lo que se difiere al arrancar: la detección de
+        ffmpeg y la importación de scipy.signal (ventanas y remuestreo).
+        Se llama en segundo plano para que la primera petición no lo pague.
+        """
+        obtener_ffmpeg()
+        import scipy.signal  # noqa: F401
     
     def validar_archivo_audio(self, filename):
         extension = os.path.splitext(filename)[1].lower()
@@ -72,223 +114,770 @@ class ServicioAudio:
         # Devuelve la respuesta con los datos del archivo procesado
         pass
     
-    def guardar_archivo_temporal(self, contenido: bytes, nombre_original: str) -> str:
+    def _copiar_en_bloques(self, flujo: BinaryIO, destino: BinaryIO) -> int:
+        """
+        Copiar un flujo en bloques de tamaño fijo aplicando el límite de tamaño
+        a medida que llegan los bytes. Retorna la cantidad de bytes copiados.
+        """
+        total = 0
+        while True:
+            bloque = flujo.read(config.TAMANO_BLOQUE_SUBIDA)
+            if not bloque:
+                return total
+            total += len(bloque)
+            if total > config.MAX_TAMANO_ARCHIVO:
+                raise ArchivoDemasiadoGrandeError(config.MAX_TAMANO_ARCHIVO)
+            destino.write(bloque)
+    
+    def _transcodificar_con_ffmpeg(self, flujo: BinaryIO, ruta_wav: str, ruta_entrada: Optional[str] = None) -> int:
+        """
+        Transcodificar a WAV PCM de 16 bits con ffmpeg.
+        Si no hay ruta de entrada, el flujo se envía por la tubería de entrada
+        de ffmpeg bloque a bloque, sin guardarlo completo en memoria.
+        """
+        if not self.ruta_ffmpeg:
+            raise IOError("ffmpeg no está disponible")
+        
+        comando = [
+            self.ruta_ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-i", ruta_entrada or "pipe:0",
+            "-vn", "-acodec", "pcm_s16le", "-f", "wav", ruta_wav
+        ]
+        with tempfile.TemporaryFile() as errores:
+            proceso = subprocess.Popen(
+                comando,
+                stdin=subprocess.DEVNULL if ruta_entrada else subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=errores
+            )
+            total = 0
+            try:
+                if ruta_entrada is None:
+                    try:
+                        total = self._copiar_en_bloques(flujo, proceso.stdin)
+                    except BrokenPipeError:
+                        # ffmpeg terminó antes de leer todo; el código de salida dice por qué
+                        pass
+                    finally:
+                        try:
+                            proceso.stdin.close()
+                        except BrokenPipeError:
+                            pass
+                codigo = proceso.wait()
+            except BaseException:
+                proceso.kill()
+                proceso.wait()
+                raise
+            
+            if codigo != 0:
+                errores.seek(0)
+                detalle = errores.read().decode(errors="replace").strip()
+                raise IOError(f"ffmpeg terminó con código {codigo}: {detalle}")
+        return total
+    
+    def _huella_subida(self, extension: str):
+        """Hash SHA-256 del formato y del contenido subido (se completa con los bytes leídos)"""
+        return hashlib.sha256(extension.encode())
+    
+    @medir_etapa("huella")
+    def _calcular_huella(self, flujo: BinaryIO, extension: str) -> str:
+        """Calcular la huella de un flujo con acceso aleatorio y volver al inicio"""
+        huella = self._huella_subida(extension)
+        total = 0
+        while True:
+            bloque = flujo.read(config.TAMANO_BLOQUE_SUBIDA)
+            if not bloque:
+                break
+            total += len(bloque)
+            if total > config.MAX_TAMANO_ARCHIVO:
+                raise ArchivoDemasiadoGrandeError(config.MAX_TAMANO_ARCHIVO)
+            huella.update(bloque)
+        flujo.seek(0)
+        return huella.hexdigest()
+    
+    def _metadatos(self, ruta: str, huella: str, estadisticas: Optional[dict] = None) -> dict:
+        """
+        Metadatos de un WAV que se guardan en el registro. Sin estadísticas
+        se calculan en una pasada por bloques sobre el WAV recién escrito
+        (todavía en la caché del sistema); al reutilizar un contenido se
+        toman las que ya estaban registradas.
+        """
+        info = sf.info(ruta)
+        if estadisticas is None:
+            with medir_etapa("estadisticas"):
+                estadisticas = ejecutor_trabajos.calcular(estadisticas_archivo, ruta)
+        return {
+            'hash': huella,
+            'tamano': os.path.getsize(ruta),
+            'frecuencia_muestreo': info.samplerate,
+            'canales': info.channels,
+            'muestras': info.frames,
+            'duracion': info.duration,
+            'estadisticas': estadisticas
+        }
+    
+    def _liberar(self, ruta: str):
+        """Quitar una referencia a un WAV y borrarlo si nadie más lo usa"""
+        if self.registro.liberar_contenido(ruta):
+            self._eliminar_archivo(ruta)
+    
+    def guardar_archivo_temporal(self, flujo: BinaryIO, nombre_original: str) -> str:
         """
         Guardar archivo de audio, convertirlo a WAV y retornar ID.
         Esto estandariza el formato para el resto del procesamiento.
+        El contenido se lee del flujo en bloques, nunca completo en memoria.
+        Si ya se subió el mismo contenido, se reutiliza su WAV sin decodificar.
         """
-        print(f"Procesando archivo: {nombre_original}, tamaño: {len(contenido)} bytes")
         archivo_id = str(uuid.uuid4())
         extension_original = os.path.splitext(nombre_original.lower())[1]
-        print(f"Extensión detectada: {extension_original}")
+        log.debug("Procesando archivo", extra={"archivo_id": archivo_id, "nombre": nombre_original, "extension": extension_original})
+        
+        # Con acceso aleatorio se calcula la huella antes de decodificar, si eso
+        # puede ahorrar una pasada de ffmpeg; si no, se calcula mientras se lee
+        huella = ruta_existente = None
+        if flujo.seekable() and extension_original != '.wav':
+            huella = self._calcular_huella(flujo, extension_original)
+            ruta_existente = self.registro.adquirir_contenido(huella)
+            registrar_consulta_cache("contenido", ruta_existente is not None)
+            if ruta_existente is not None:
+                return self._reutilizar_contenido(archivo_id, ruta_existente, nombre_original, huella)
+        else:
+            flujo = LectorConHuella(flujo, self._huella_subida(extension_original))
         
-        # Asegurarse de que el directorio de temporales existe
-        if not os.path.exists(config.DIRECTORIO_TEMPORALES):
-            os.makedirs(config.DIRECTORIO_TEMPORALES)
-            print(f"Directorio temporal creado: {config.DIRECTORIO_TEMPORALES}")
+        # Archivo para el WAV estandarizado (crea el directorio de temporales si falta)
+        ruta_archivo = self.almacenamiento.nuevo('.wav')
 
         try:
-            # Si es un archivo WAV, procesarlo directamente con soundfile
-            if extension_original == '.wav':
-                # Guardar el archivo WAV directamente
-                archivo_wav_temp = tempfile.NamedTemporaryFile(
-                    delete=False, 
-                    suffix='.wav',
-                    dir=config.DIRECTORIO_TEMPORALES
-                )
-                archivo_wav_temp.write(contenido)
-                archivo_wav_temp.close()
+            with medir_etapa("decodificacion"):
+                # Si es un archivo WAV, copiarlo directamente y validar la cabecera
+                if extension_original == '.wav':
+                    with open(ruta_archivo, 'wb') as archivo_wav:
+                        tamano = self._copiar_en_bloques(flujo, archivo_wav)
                 
-                # Verificar que el archivo es válido
-                try:
-                    sf.read(archivo_wav_temp.name)
-                except Exception as e:
-                    os.unlink(archivo_wav_temp.name)
-                    raise IOError(f"Archivo WAV inválido: {e}")
-                
-                ruta_archivo = archivo_wav_temp.name
-            else:
-                # Para otros formatos, usar pydub
-                print(f"Procesando con pydub formato: {extension_original}")
-                try:
-                    # Cargar el audio desde los bytes en memoria
-                    print("Cargando archivo con AudioSegment.from_file...")
-                    segmento = AudioSegment.from_file(io.BytesIO(contenido), format=extension_original.replace('.', ''))
-                    print(f"Archivo cargado correctamente, duración: {len(segmento)}ms")
-                    
-                    # Crear un archivo temporal para el WAV estandarizado
-                    archivo_wav_temp = tempfile.NamedTemporaryFile(
-                        delete=False, 
-                        suffix='.wav',
+                    try:
+                        sf.info(ruta_archivo)
+                    except Exception as e:
+                        raise IOError(f"Archivo WAV inválido: {e}")
+            
+                # Formatos que ffmpeg puede leer en flujo: se envían directo por la tubería
+                elif extension_original in config.FORMATOS_TRANSCODIFICACION_TUBERIA:
+                    log.debug("Transcodificando con ffmpeg por tubería", extra={"archivo_id": archivo_id})
+                    tamano = self._transcodificar_con_ffmpeg(flujo, ruta_archivo)
+            
+                # Contenedores que necesitan acceso aleatorio (m4a): primero a disco
+                else:
+                    log.debug("Transcodificando con ffmpeg desde disco", extra={"archivo_id": archivo_id})
+                    with tempfile.NamedTemporaryFile(
+                        suffix=extension_original,
                         dir=config.DIRECTORIO_TEMPORALES
-                    )
-                    print(f"Archivo temporal creado: {archivo_wav_temp.name}")
-                    
-                    # Exportar el audio a formato WAV (PCM de 16 bits es un buen estándar intermedio)
-                    print("Exportando a WAV...")
-                    segmento.export(archivo_wav_temp.name, format='wav')
-                    archivo_wav_temp.close()
-                    print("Exportación completada")
-                    
-                    ruta_archivo = archivo_wav_temp.name
-                    
-                except Exception as e:
-                    print(f"Error con pydub para formato {extension_original}: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    raise IOError(f"No se pudo procesar el formato {extension_original}. Asegúrate de que ffmpeg esté instalado.")
-
-            # Guardar información del archivo
-            self.archivos_temporales[archivo_id] = {
-                'ruta': ruta_archivo,
-                'nombre_original': nombre_original,
-                'procesado': None
-            }
+                    ) as archivo_entrada:
+                        tamano = self._copiar_en_bloques(flujo, archivo_entrada)
+                        archivo_entrada.flush()
+                        self._transcodificar_con_ffmpeg(flujo, ruta_archivo, archivo_entrada.name)
             
-            return archivo_id
+            log.debug("Archivo recibido", extra={"archivo_id": archivo_id, "bytes": tamano})
+            
+            if huella is None:
+                huella = flujo.huella.hexdigest()
+                ruta_existente = self.registro.adquirir_contenido(huella)
+                registrar_consulta_cache("contenido", ruta_existente is not None)
+            if ruta_existente is None:
+                metadatos = self._metadatos(ruta_archivo, huella)
 
+        except ArchivoDemasiadoGrandeError:
+            os.unlink(ruta_archivo)
+            raise
         except Exception as e:
-            print(f"Error detallado al guardar archivo: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            log.warning(
+                "No se pudo procesar el archivo",
+                exc_info=True, extra={"archivo_id": archivo_id, "nombre": nombre_original}
+            )
+            if os.path.exists(ruta_archivo):
+                os.unlink(ruta_archivo)
+            if extension_original != '.wav':
+                raise IOError(f"No se pudo procesar el formato {extension_original}. Asegúrate de que ffmpeg esté instalado.")
             raise IOError(f"No se pudo procesar el archivo de audio: {e}")
+        
+        if ruta_existente is not None:
+            # Contenido ya subido: se descarta la copia nueva sin calcular estadísticas
+            os.unlink(ruta_archivo)
+            return self._reutilizar_contenido(archivo_id, ruta_existente, nombre_original, huella)
+        
+        self._registrar_wav(archivo_id, ruta_archivo, nombre_original, metadatos)
+        log.info("Archivo subido", extra={
+            "archivo_id": archivo_id, "nombre": nombre_original, "bytes": tamano,
+            "duracion": metadatos["duracion"], "reutilizado": False
+        })
+        return archivo_id
     
-    def cargar_audio(self, archivo_id: str) -> Tuple[np.ndarray, int]:
-        """Cargar archivo de audio y retornar muestras y frecuencia de muestreo"""
-        if archivo_id not in self.archivos_temporales:
+    def _reutilizar_contenido(self, archivo_id: str, ruta_existente: str, nombre_original: str, huella: str) -> str:
+        """Registrar una subida que apunta a un WAV ya guardado (con su referencia ya adquirida)"""
+        try:
+            self.registro.agregar(
+                archivo_id, ruta_existente, nombre_original,
+                self._metadatos(
+                    self.almacenamiento.local(ruta_existente), huella,
+                    self.registro.estadisticas_contenido(huella)
+                )
+            )
+        except Exception:
+            self._liberar(ruta_existente)
+            raise
+        log.info("Archivo subido", extra={"archivo_id": archivo_id, "nombre": nombre_original, "reutilizado": True})
+        return archivo_id
+    
+    def _registrar_wav(self, archivo_id: str, ruta_archivo: str, nombre_original: str, metadatos: dict):
+        """Registrar un WAV estándar recién escrito; si ya había uno con la misma huella, usar ese"""
+        # Publicarlo antes de registrarlo: desde que está en el registro otro nodo puede pedirlo
+        try:
+            self.almacenamiento.publicar(ruta_archivo)
+        except Exception:
+            os.unlink(ruta_archivo)
+            raise
+        # Registrar el contenido; si otra subida igual terminó antes, usar la suya
+        ruta_registrada = self.registro.registrar_contenido(metadatos['hash'], ruta_archivo)
+        if ruta_registrada != ruta_archivo:
+            self._eliminar_archivo(ruta_archivo)
+            ruta_archivo = ruta_registrada
+        
+        # Guardar información del archivo con los metadatos del WAV
+        try:
+            self.registro.agregar(archivo_id, ruta_archivo, nombre_original, metadatos)
+        except Exception:
+            self._liberar(ruta_archivo)
+            raise
+    
+    def guardar_grabacion(self, ruta_wav: str, nombre_original: str, estadisticas: Optional[dict] = None) -> str:
+        """
+        Registrar una grabación en vivo ya escrita como WAV PCM de 16 bits en
+        el directorio de temporales (ver analisis_vivo) y retornar su ID.
+        La huella es la misma que tendría subir ese WAV; las estadísticas
+        vienen acumuladas durante la grabación.
+        """
+        archivo_id = str(uuid.uuid4())
+        try:
+            with open(ruta_wav, 'rb') as flujo:
+                huella = self._calcular_huella(flujo, '.wav')
+            metadatos = self._metadatos(ruta_wav, huella, estadisticas)
+        except Exception:
+            os.unlink(ruta_wav)
+            raise
+        self._registrar_wav(archivo_id, ruta_wav, nombre_original, metadatos)
+        log.info("Grabación guardada", extra={
+            "archivo_id": archivo_id, "nombre": nombre_original, "duracion": metadatos["duracion"]
+        })
+        return archivo_id
+    
+    def _ruta_variante(self, archivo_id: str, variante: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Resolver la ruta de una variante: 'original', 'procesado' o el ID de
+        una variante creada por conversión en lote.
+        Sin variante se usa el archivo procesado si existe, sino el original.
+        """
+        info = self.registro.obtener(archivo_id)
+        if info is None:
             raise ValueError("Archivo no encontrado")
+        self.registro.tocar(archivo_id)
         
-        ruta_archivo = self.archivos_temporales[archivo_id]['ruta']
-        muestras, frecuencia = sf.read(ruta_archivo, always_2d=False)
+        if variante is None:
+            variante = 'procesado' if 'procesado' in info['variantes'] else 'original'
+        if variante == 'original':
+            return variante, info['ruta']
+        if variante in info['variantes']:
+            return variante, info['variantes'][variante]
+        raise ValueError(f"Variante no encontrada: {variante}")
+    
+    def _ruta_local(self, archivo_id: str, variante: Optional[str] = None) -> Tuple[str, str]:
+        """Como `_ruta_variante`, pero con el WAV ya disponible en el disco de este nodo"""
+        variante, ruta = self._ruta_variante(archivo_id, variante)
+        return variante, self.almacenamiento.local(ruta)
+    
+    def _leer_muestras(self, archivo_id: str, variante: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """Leer muestras float32 de una variante, usando la caché de muestras decodificadas"""
+        variante, ruta = self._ruta_local(archivo_id, variante)
+        
+        en_cache = self.cache_muestras.obtener(archivo_id, variante, ruta)
+        if en_cache is not None:
+            return en_cache
         
+        with medir_etapa("lectura"):
+            lector = abrir_wav(ruta)
+            muestras, frecuencia = lector.leer(), lector.frecuencia
+        if muestras.shape[1] == 1:
+            muestras = muestras[:, 0]
+        self.cache_muestras.guardar(archivo_id, variante, ruta, muestras, frecuencia)
         return muestras, frecuencia
     
+    def cargar_audio(self, archivo_id: str) -> Tuple[np.ndarray, int]:
+        """Cargar archivo de audio y retornar muestras y frecuencia de muestreo"""
+        return self._leer_muestras(archivo_id, 'original')
+    
+    def _bloques(self, archivo_id: str, variante: Optional[str] = None):
+        """
+        Recorrer una variante en bloques float32 (muestras × canales).
+        Usa las muestras en caché si están; los archivos chicos se decodifican
+        completos y quedan en caché, los grandes se leen por bloques.
+        Retorna (bloques, frecuencia, canales, total de muestras).
+        """
+        variante, ruta = self._ruta_local(archivo_id, variante)
+        en_cache = self.cache_muestras.obtener(archivo_id, variante, ruta)
+        if en_cache is None:
+            lector = abrir_wav(ruta)
+            if lector.muestras * lector.canales * 4 <= config.MAX_BYTES_ENTRADA_CACHE:
+                en_cache = self._leer_muestras(archivo_id, variante)
+        if en_cache is not None:
+            muestras, frecuencia = en_cache
+            muestras = muestras.reshape(len(muestras), -1)
+            bloques = (
+                muestras[inicio:inicio + config.TAMANO_BLOQUE_CONVERSION]
+                for inicio in range(0, len(muestras), config.TAMANO_BLOQUE_CONVERSION)
+            )
+            return bloques, frecuencia, muestras.shape[1], len(muestras)
+        
+        # Archivo grande: se lee bloque a bloque desde el mapeo en memoria
+        bloques = lector.bloques(config.TAMANO_BLOQUE_CONVERSION)
+        return bloques, lector.frecuencia, lector.canales, lector.muestras
+    
+    def _clave_conversion(self, archivo_id: str, variante_id: str) -> str:
+        """Clave de contenido de una conversión: huella del original más la configuración"""
+        info = self.registro.obtener(archivo_id)
+        if info is None:
+            raise ValueError("Archivo no encontrado")
+        return f"{info['hash']}:{variante_id}"
+    
+    def _registrar_conversion(self, clave: str, ruta: str) -> str:
+        """Registrar el resultado de una conversión; si otro la hizo antes, usar la suya"""
+        ruta_registrada = self.registro.registrar_contenido(clave, ruta)
+        if ruta_registrada != ruta:
+            self._eliminar_archivo(ruta)
+        return ruta_registrada
+    
+    def _asignar_variante(self, archivo_id: str, variante: str, ruta: str):
+        """Asociar un WAV (ya referenciado) a una variante y liberar el que reemplaza"""
+        try:
+            anterior = self.registro.guardar_variante(archivo_id, variante, ruta)
+        except ValueError:
+            self._liberar(ruta)
+            raise
+        if anterior:
+            self._liberar(anterior)
+        self.cache_muestras.invalidar(archivo_id, variante)
+    
     def convertir_audio(
         self, 
         archivo_id: str, 
-        config_audio: ConfiguracionAudio
+        config_audio: ConfiguracionAudio,
+        progreso: Optional[Callable[[int, int, int], None]] = None
     ) -> str:
-        """Convertir archivo de audio con nueva configuración usando pydub."""
-        if archivo_id not in self.archivos_temporales:
-            raise ValueError("Archivo no encontrado")
+        """
+        Convertir archivo de audio con nueva configuración.
+        Remuestrea con filtro polifásico y cuantiza por bloques en una sola pasada.
+        Si el mismo contenido ya se convirtió con esta configuración, se reutiliza.
+        `progreso` recibe (muestras procesadas, total de muestras, frecuencia original).
+        """
+        clave = self._clave_conversion(archivo_id, id_variante(config_audio))
+        ruta_procesado = self.registro.adquirir_contenido(clave)
+        registrar_consulta_cache("conversiones", ruta_procesado is not None)
         
-        ruta_archivo_original = self.archivos_temporales[archivo_id]['ruta']
-
-        try:
-            # Cargar audio original con pydub
-            segmento = AudioSegment.from_file(ruta_archivo_original)
-
-            # Cambiar frecuencia de muestreo
-            segmento = segmento.set_frame_rate(config_audio.frecuencia_muestreo)
-
-            # Cambiar profundidad de bits (sample_width está en bytes: 1=8-bit, 2=16-bit, etc.)
-            segmento = segmento.set_sample_width(config_audio.bits // 8)
-
-            # Guardar archivo procesado en un nuevo archivo temporal
-            archivo_procesado = tempfile.NamedTemporaryFile(
-                delete=False,
-                suffix='.wav',
-                dir=config.DIRECTORIO_TEMPORALES
-            )
-            
-            segmento.export(archivo_procesado.name, format='wav')
-            archivo_procesado.close()
+        if ruta_procesado is None:
+            bloques, frecuencia, canales, total = self._bloques(archivo_id, 'original')
             
-            # Limpiar archivo procesado anterior si existía
-            if self.archivos_temporales[archivo_id].get('procesado'):
-                ruta_antigua = self.archivos_temporales[archivo_id]['procesado']
-                if os.path.exists(ruta_antigua):
-                    os.unlink(ruta_antigua)
+            # Guardar archivo procesado en un nuevo archivo temporal
+            ruta_nueva = self.almacenamiento.nuevo('.wav')
 
-            # Actualizar información del archivo con la nueva ruta
-            self.archivos_temporales[archivo_id]['procesado'] = archivo_procesado.name
-            
-            return archivo_procesado.name
+            try:
+                with medir_etapa("conversion"):
+                    convertir(
+                        bloques,
+                        ruta_nueva,
+                        frecuencia,
+                        canales,
+                        config_audio.frecuencia_muestreo,
+                        config_audio.bits,
+                        config_audio.dither,
+                        progreso=progreso and (lambda procesadas: progreso(procesadas, total, frecuencia))
+                    )
+                self.almacenamiento.publicar(ruta_nueva)
+            except Exception as e:
+                if os.path.exists(ruta_nueva):
+                    os.unlink(ruta_nueva)
+                raise IOError(f"Error al convertir audio: {e}")
             
-        except Exception as e:
-            raise IOError(f"Error al convertir audio con pydub: {e}")
+            ruta_procesado = self._registrar_conversion(clave, ruta_nueva)
+        
+        # Registrar la nueva ruta y liberar el archivo procesado anterior si existía
+        self._asignar_variante(archivo_id, 'procesado', ruta_procesado)
+        
+        return ruta_procesado
     
-    def obtener_forma_onda(self, archivo_id: str, cantidad_muestras: int = 1000) -> DatosFormaOnda:
-        """Obtener datos de forma de onda del archivo de audio"""
-        if archivo_id not in self.archivos_temporales:
-            raise ValueError("Archivo no encontrado")
+    def convertir_lote(
+        self,
+        archivo_id: str,
+        destinos: List[ConfiguracionAudio],
+        progreso: Optional[Callable[[int, int, int], None]] = None
+    ) -> List[VarianteAudio]:
+        """
+        Convertir el original a varias configuraciones leyéndolo una sola vez.
+        Cada resultado queda disponible como una variante con su propio ID;
+        las configuraciones ya convertidas para el mismo contenido se reutilizan.
+        """
+        # Configuraciones repetidas producen la misma variante
+        unicos = {id_variante(destino): destino for destino in destinos}
+        claves = {variante_id: self._clave_conversion(archivo_id, variante_id) for variante_id in unicos}
+        rutas = {}
+        for variante_id, clave in claves.items():
+            ruta = self.registro.adquirir_contenido(clave)
+            registrar_consulta_cache("conversiones", ruta is not None)
+            if ruta is not None:
+                rutas[variante_id] = ruta
         
-        # Usar archivo procesado si existe, sino el original
-        ruta_archivo = (
-            self.archivos_temporales[archivo_id].get('procesado') or 
-            self.archivos_temporales[archivo_id]['ruta']
-        )
+        pendientes = {variante_id: destino for variante_id, destino in unicos.items() if variante_id not in rutas}
+        if pendientes:
+            conversores = {}
+            try:
+                bloques, frecuencia, canales, total = self._bloques(archivo_id, 'original')
+                for variante_id, destino in pendientes.items():
+                    conversores[variante_id] = ConversorPCM(
+                        self.almacenamiento.nuevo('.wav'), frecuencia, canales,
+                        destino.frecuencia_muestreo, destino.bits, destino.dither
+                    )
+                with medir_etapa("conversion"):
+                    convertir_varios(
+                        bloques, list(conversores.values()),
+                        progreso=progreso and (lambda procesadas: progreso(procesadas, total, frecuencia))
+                    )
+                for conversor in conversores.values():
+                    self.almacenamiento.publicar(conversor.ruta_destino)
+            except Exception as e:
+                for conversor in conversores.values():
+                    conversor.abortar()
+                for ruta in rutas.values():
+                    self._liberar(ruta)
+                raise IOError(f"Error al convertir audio: {e}")
+            
+            for variante_id, conversor in conversores.items():
+                rutas[variante_id] = self._registrar_conversion(claves[variante_id], conversor.ruta_destino)
         
-        muestras, frecuencia = sf.read(ruta_archivo, always_2d=False)
+        # Reemplazar variantes anteriores con la misma configuración
+        for variante_id, ruta in rutas.items():
+            self._asignar_variante(archivo_id, variante_id, ruta)
         
-        # Convertir a mono si es estéreo
-        if muestras.ndim == 2:
-            muestras = muestras.mean(axis=1)
+        return [
+            VarianteAudio(variante_id=variante_id, **destino.model_dump())
+            for variante_id, destino in unicos.items()
+        ]
+    
+    def trabajo_convertir(self, archivo_id: str, parametros: dict, progreso) -> dict:
+        """Trabajo en segundo plano: conversión simple (ver `convertir_audio`)"""
+        config_audio = ConfiguracionAudio(**parametros)
+        self.convertir_audio(archivo_id, config_audio, progreso)
+        return {"variantes": ["procesado"]}
+    
+    def trabajo_convertir_lote(self, archivo_id: str, parametros: dict, progreso) -> dict:
+        """Trabajo en segundo plano: conversión en lote (ver `convertir_lote`)"""
+        destinos = [ConfiguracionAudio(**destino) for destino in parametros["destinos"]]
+        variantes = self.convertir_lote(archivo_id, destinos, progreso)
+        return {"variantes": [variante.variante_id for variante in variantes]}
+    
+    def _obtener_piramide(self, archivo_id: str, variante: Optional[str] = None) -> PiramideFormaOnda:
+        """
+        Obtener la pirámide de envolventes de una variante.
+        Se calcula una sola vez por archivo y se guarda junto al WAV.
+        """
+        variante, ruta = self._ruta_variante(archivo_id, variante)
         
-        # Reducir cantidad de muestras para visualización
-        factor = max(1, len(muestras) // cantidad_muestras)
-        muestras_reducidas = muestras[::factor]
+        with self._candado_piramides:
+            piramide = self._piramides.get(ruta)
+            if piramide is not None:
+                self._piramides.move_to_end(ruta)
+                registrar_consulta_cache("piramides", True)
+                return piramide
+        registrar_consulta_cache("piramides", False)
         
-        return DatosFormaOnda(
-            muestras=muestras_reducidas.tolist(),
-            cantidad_muestras=len(muestras_reducidas),
-            frecuencia_muestreo=frecuencia
-        )
+        ruta_piramide = ruta + SUFIJO_PIRAMIDE
+        if os.path.exists(ruta_piramide):
+            piramide = PiramideFormaOnda.cargar(ruta_piramide)
+        else:
+            en_cache = self.cache_muestras.obtener(archivo_id, variante, ruta)
+            if en_cache is not None:
+                bloques = [a_mono(en_cache[0])]
+                frecuencia = en_cache[1]
+            else:
+                lector = abrir_wav(self.almacenamiento.local(ruta))
+                frecuencia = lector.frecuencia
+                bloques = (
+                    a_mono(bloque)
+                    for bloque in lector.bloques(config.MUESTRAS_POR_BLOQUE_ONDA * 1024)
+                )
+            with medir_etapa("piramide"):
+                piramide = PiramideFormaOnda.construir(bloques, frecuencia)
+            piramide.guardar(ruta_piramide)
+        
+        with self._candado_piramides:
+            self._piramides[ruta] = piramide
+            while len(self._piramides) > config.MAX_PIRAMIDES_EN_MEMORIA:
+                self._piramides.popitem(last=False)
+        return piramide
     
-    def obtener_espectro(self, archivo_id: str, cantidad_bins: int = 512) -> DatosEspectro:
-        """Obtener espectro de frecuencia del archivo de audio"""
-        if archivo_id not in self.archivos_temporales:
-            raise ValueError("Archivo no encontrado")
+    def obtener_forma_onda(
+        self,
+        archivo_id: str,
+        cantidad_muestras: int = 1000,
+        inicio: Optional[float] = None,
+        fin: Optional[float] = None,
+        variante: Optional[str] = None
+    ) -> dict:
+        """
+        Obtener la envolvente (mínimo, máximo y RMS) de la forma de onda
+        entre `inicio` y `fin` (en segundos) con `cantidad_muestras` puntos.
+        Retorna los campos de DatosFormaOnda con arreglos de NumPy, para que
+        el controlador elija cómo serializarlos.
+        """
+        # Sin variante se usa el archivo procesado si existe, sino el original
+        variante, ruta = self._ruta_variante(archivo_id, variante)
+        piramide = self._obtener_piramide(archivo_id, variante)
+        frecuencia = piramide.frecuencia
         
-        # Usar archivo procesado si existe, sino el original
-        ruta_archivo = (
-            self.archivos_temporales[archivo_id].get('procesado') or 
-            self.archivos_temporales[archivo_id]['ruta']
-        )
+        # Rango en muestras, recortado a la duración del archivo
+        muestra_inicio = 0 if inicio is None else int(inicio * frecuencia)
+        muestra_fin = piramide.total_muestras if fin is None else int(np.ceil(fin * frecuencia))
+        muestra_inicio = min(max(muestra_inicio, 0), piramide.total_muestras)
+        muestra_fin = min(max(muestra_fin, muestra_inicio), piramide.total_muestras)
         
-        muestras, frecuencia = sf.read(ruta_archivo, always_2d=False)
+        resolucion = 1
+        if muestra_fin == muestra_inicio:
+            minimos = maximos = rms = np.zeros(0, dtype=np.float32)
+        elif (muestra_fin - muestra_inicio) / cantidad_muestras >= piramide.muestras_por_bloque:
+            # Puntos de igual tramo, con los bordes redondeados a bloques de la pirámide
+            minimos, maximos, rms = piramide.consultar(muestra_inicio, muestra_fin, cantidad_muestras)
+            resolucion = piramide.muestras_por_bloque
+        else:
+            # Zoom más fino que el nivel base: leer solo el tramo pedido
+            en_cache = self.cache_muestras.obtener(archivo_id, variante, ruta)
+            if en_cache is not None:
+                tramo = en_cache[0][muestra_inicio:muestra_fin]
+            else:
+                tramo = abrir_wav(self.almacenamiento.local(ruta)).leer(muestra_inicio, muestra_fin)
+            minimos, maximos, rms = envolvente(a_mono(tramo), cantidad_muestras)
         
-        # Convertir a mono si es estéreo
-        if muestras.ndim == 2:
-            muestras = muestras.mean(axis=1)
+        # Valor representativo de cada punto: el pico con mayor amplitud
+        picos = np.where(np.abs(maximos) >= np.abs(minimos), maximos, minimos)
         
-        # Calcular FFT
-        espectro = np.abs(fft(muestras))[:cantidad_bins]
+        return {
+            'muestras': picos,
+            'minimos': minimos,
+            'maximos': maximos,
+            'rms': rms,
+            'cantidad_muestras': len(picos),
+            'frecuencia_muestreo': frecuencia,
+            'inicio': muestra_inicio / frecuencia,
+            'fin': muestra_fin / frecuencia,
+            'resolucion_muestras': resolucion
+        }
+    
+    def obtener_espectro(
+        self,
+        archivo_id: str,
+        cantidad_bins: int = 512,
+        ventana: str = config.VENTANA_ESPECTRO_DEFAULT,
+        longitud_segmento: Optional[int] = None,
+        solapamiento: float = config.SOLAPAMIENTO_ESPECTRO_DEFAULT,
+        escala: str = "lineal",
+        variante: Optional[str] = None
+    ) -> dict:
+        """
+        Obtener el espectro de frecuencia por el método de Welch.
+        Sin longitud de segmento se elige la que produce exactamente `cantidad_bins` bins;
+        si la FFT produce más bins, se agrupan sumando la potencia de cada banda.
+        Retorna los campos de DatosEspectro con arreglos de NumPy.
+        """
+        longitud_segmento = longitud_segmento or longitud_por_bins(cantidad_bins)
         
-        # Calcular frecuencias correspondientes
-        frecuencias = np.linspace(0, frecuencia/2, cantidad_bins)
+        # Sin variante se usa el archivo procesado si existe, sino el original
+        variante, ruta = self._ruta_local(archivo_id, variante)
+        with medir_etapa("fft"):
+            en_cache = self.cache_muestras.obtener(archivo_id, variante, ruta)
+            if en_cache is not None:
+                muestras, frecuencia = en_cache
+                salto = longitud_segmento - min(int(longitud_segmento * solapamiento), longitud_segmento - 1)
+                segmentos = (
+                    a_mono(segmento)
+                    for segmento in segmentos_de_arreglo(muestras, longitud_segmento, salto)
+                )
+                frecuencias, potencia, cantidad = welch(segmentos, frecuencia, longitud_segmento, ventana)
+            else:
+                # Leer segmento a segmento; es un cálculo puro que puede ir al pool de procesos
+                frecuencias, potencia, cantidad, frecuencia = ejecutor_trabajos.calcular(
+                    welch_archivo, ruta, longitud_segmento, solapamiento, ventana
+                )
+        
+        frecuencias, potencia = reducir_bins(frecuencias, potencia, cantidad_bins)
         
-        return DatosEspectro(
-            frecuencias=frecuencias.tolist(),
-            magnitudes=espectro.tolist(),
-            frecuencia_muestreo=frecuencia
+        return {
+            'frecuencias': frecuencias,
+            'magnitudes': escalar(potencia, escala),
+            'frecuencia_muestreo': frecuencia,
+            'escala': escala,
+            'ventana': ventana,
+            'longitud_segmento': longitud_segmento,
+            'segmentos': cantidad
+        }
+    
+    def _obtener_espectrograma(self, archivo_id: str, variante: Optional[str] = None) -> Espectrograma:
+        """Abrir el espectrograma guardado o calcularlo la primera vez"""
+        # Sin variante se usa el archivo procesado si existe, sino el original
+        _, ruta = self._ruta_local(archivo_id, variante)
+        return Espectrograma.calcular(ruta)
+    
+    def obtener_info_espectrograma(self, archivo_id: str, variante: Optional[str] = None) -> InfoEspectrograma:
+        """Describir el espectrograma (niveles y teselas disponibles)"""
+        espectrograma = self._obtener_espectrograma(archivo_id, variante)
+        return InfoEspectrograma(
+            **espectrograma.meta,
+            teselas=[list(espectrograma.teselas_por_nivel(nivel)) for nivel in range(espectrograma.niveles)]
         )
     
-    def obtener_archivo_procesado(self, archivo_id: str) -> Optional[str]:
-        """Obtener ruta del archivo procesado para descarga"""
-        if archivo_id not in self.archivos_temporales:
+    def obtener_tesela_espectrograma(
+        self, archivo_id: str, nivel: int, x: int, y: int, variante: Optional[str] = None, formato: str = "binario"
+    ) -> Union[np.ndarray, bytes]:
+        """
+        Obtener una tesela uint8 del espectrograma (filas = tramas, columnas = bins),
+        o con formato "png" la imagen ya codificada
+        """
+        tesela = self._obtener_espectrograma(archivo_id, variante).tesela(nivel, x, y)
+        if formato == "png":
+            return codificar_png(tesela)
+        return tesela
+    
+    def obtener_info(self, archivo_id: str) -> dict:
+        """
+        Metadatos y estadísticas calculados al subir el archivo (campos de
+        InfoArchivoAudio); se leen del registro sin tocar las muestras
+        """
+        info = self.registro.obtener(archivo_id)
+        if info is None:
+            raise ValueError("Archivo no encontrado")
+        self.registro.tocar(archivo_id)
+        return {
+            'archivo_id': archivo_id,
+            'nombre': info['nombre_original'],
+            'formato': os.path.splitext(info['nombre_original'])[1].lower(),
+            'tamano': info['tamano'],
+            'frecuencia_muestreo': info['frecuencia_muestreo'],
+            'canales': info['canales'],
+            'muestras': info['muestras'],
+            'duracion': info['duracion'],
+            'creado': info['creado'],
+            'variantes': sorted(info['variantes']),
+            'estadisticas': info['estadisticas']
+        }
+    
+    def existe_archivo(self, archivo_id: str) -> bool:
+        """Indicar si hay un archivo subido con ese ID"""
+        return self.registro.obtener(archivo_id) is not None
+    
+    def obtener_archivo_procesado(self, archivo_id: str, variante: Optional[str] = None) -> Optional[str]:
+        """
+        Obtener ruta del archivo procesado (o de una variante) para descarga.
+        Con almacenamiento remoto puede no estar en este nodo: ver `abrir_descarga`.
+        """
+        if not self.existe_archivo(archivo_id):
             return None
         
-        return (
-            self.archivos_temporales[archivo_id].get('procesado') or 
-            self.archivos_temporales[archivo_id]['ruta']
+        return self._ruta_variante(archivo_id, variante)[1]
+
+    def abrir_descarga(
+        self, archivo_id: str, variante: Optional[str] = None, rango: Optional[str] = None, solo_cabeceras: bool = False
+    ):
+        """
+        Leer una variante desde el almacenamiento remoto sin traerla a este
+        nodo, con el tramo de la cabecera Range si hay (ver `Almacenamiento.abrir`)
+        """
+        _, ruta = self._ruta_variante(archivo_id, variante)
+        return self.almacenamiento.abrir(ruta, rango, solo_cabeceras)
+
+    def abrir_previa(
+        self, archivo_id: str, formato: str, inicio: float = 0.0, variante: Optional[str] = None
+    ):
+        """
+        Abrir la codificación comprimida de una variante a partir de `inicio`
+        segundos. Retorna un objeto con `tipo_mime`, `leer()` (bloques hasta b"")
+        y `cerrar()`.
+        """
+        _, ruta = self._ruta_local(archivo_id, variante)
+        return abrir_previa(ruta, formato, inicio, self.ffmpeg)
+
+    def clave_contenido(self, archivo_id: str, variante: Optional[str] = None) -> str:
+        """
+        Clave de contenido de una variante: la huella del original, o la huella
+        más la configuración de la conversión. Cambia solo si cambia el WAV.
+        """
+        _, ruta = self._ruta_variante(archivo_id, variante)
+        # Una ruta sin clave registrada es un temporal único que nunca se reescribe
+        return self.registro.clave_contenido(ruta) or os.path.basename(ruta)
+
+    def _eliminar_archivo(self, ruta: str):
+        """
+        Eliminar un WAV temporal junto con los datos derivados guardados a su lado.
+        El borrado en disco (y en el almacenamiento remoto) se hace en segundo plano.
+        """
+        with self._candado_piramides:
+            self._piramides.pop(ruta, None)
+        self.recolector.programar_borrado([ruta] + [ruta + sufijo for sufijo in SUFIJOS_DERIVADOS])
+        if self.almacenamiento.remoto:
+            self.recolector.programar(self.almacenamiento.eliminar, ruta)
+    
+    def estado_almacenamiento(self) -> dict:
+        """Uso del directorio de temporales y lo liberado por el recolector"""
+        return dict(
+            self.recolector.estadisticas,
+            cuota_bytes=self.recolector.cuota_bytes,
+            ttl_segundos=self.recolector.ttl
         )
     
     def limpiar_archivo(self, archivo_id: str):
         """Limpiar archivos temporales de un archivo específico"""
-        if archivo_id in self.archivos_temporales:
-            archivo_info = self.archivos_temporales[archivo_id]
-            
-            # Eliminar archivo original
-            if os.path.exists(archivo_info['ruta']):
-                os.unlink(archivo_info['ruta'])
-            
-            # Eliminar archivo procesado si existe
-            if archivo_info.get('procesado') and os.path.exists(archivo_info['procesado']):
-                os.unlink(archivo_info['procesado'])
+        archivo_info = self.registro.eliminar(archivo_id)
+        if archivo_info is not None:
+            # Liberar archivo original, procesado y variantes; se borran
+            # los que no comparte ningún otro archivo
+            self._liberar(archivo_info['ruta'])
+            for ruta_variante in archivo_info['variantes'].values():
+                self._liberar(ruta_variante)
             
-            # Remover de la memoria
-            del self.archivos_temporales[archivo_id]
+            self.cache_muestras.invalidar(archivo_id)
+
+# Instancia global del servicio, con la bitácora ya configurada
+configurar_bitacora()
+servicio_audio = ServicioAudio()
+
+# Trabajos en segundo plano que ofrece el servicio
+cola_trabajos.registrar("convertir", servicio_audio.trabajo_convertir)
+cola_trabajos.registrar("convertir_lote", servicio_audio.trabajo_convertir_lote) 
 
-# Instancia global del servicio
-servicio_audio = ServicioAudio() 
\ No newline at end of file
+# Estado del almacenamiento y de las cachés, leído al exponer las métricas.
+# El uso de temporales se actualiza en cada pasada del recolector.
+metricas.medidor(
+    "audio_temporales_bytes", "Bytes en el directorio de temporales (última pasada del recolector)",
+    funcion=lambda: servicio_audio.recolector.estadisticas["bytes_en_uso"]
+)
+metricas.medidor(
+    "audio_temporales_archivos", "Archivos registrados en el directorio de temporales",
+    funcion=lambda: servicio_audio.recolector.estadisticas["archivos"]
+)
+metricas.medidor(
+    "audio_temporales_cuota_bytes", "Cuota del directorio de temporales",
+    funcion=lambda: servicio_audio.recolector.cuota_bytes
+)
+metricas.contador_derivado(
+    "audio_temporales_bytes_liberados_total", "Bytes borrados por el recolector y las limpiezas",
+    funcion=lambda: servicio_audio.recolector.estadisticas["bytes_liberados"]
+)
+metricas.medidor(
+    "audio_cache_muestras_bytes", "Bytes de muestras decodificadas en la caché",
+    funcion=lambda: servicio_audio.cache_muestras.bytes_usados
+)
+metricas.medidor(
+    "audio_piramides_en_memoria", "Pirámides de forma de onda cargadas",
+    funcion=lambda: servicio_audio.piramides_cargadas
+)
@@ -0,0 +1,335 @@
+"""
+Cola de trabajos en segundo plano
+Las conversiones largas se encolan y se procesan fuera de la petición HTTP;
+el estado y el progreso se guardan en SQLite para sobrevivir a reinicios
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from backend.configuracion import config
+from backend.servicios.ejecutor import ColaLlenaError
+from backend.servicios.metricas import metricas
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+COMPLETADO = "completado"
+ERROR = "error"
+ESTADOS_FINALES = (COMPLETADO, ERROR)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    archivo_id TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    procesadas INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    frecuencia INTEGER NOT NULL DEFAULT 0,
+    creado REAL NOT NULL,
+    iniciado REAL,
+    terminado REAL,
+    resultado TEXT,
+    error TEXT,
+    proceso INTEGER
+)
+"""
+
+# Firma de un manejador: (archivo_id, parametros, progreso) -> resultado.
+# `progreso(procesadas, total, frecuencia)` informa muestras de entrada procesadas.
+Manejador = Callable[[str, dict, Callable[[int, int, int], None]], dict]
+
+
+class TrabajoInterrumpidoError(Exception):
+    """Se lanza desde el callback de progreso cuando la cola se está deteniendo"""
+
+
+def _proceso_vivo(pid: Optional[int]) -> bool:
+    """Indicar si otro proceso de este equipo con ese PID sigue en ejecución"""
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ColaTrabajos:
+    """
+    Cola persistente de trabajos con trabajadores asíncronos.
+
+    Cada tipo de trabajo tiene un manejador bloqueante que se ejecuta en un
+    pool de hilos propio, así las conversiones largas no ocupan el pool de
+    las peticiones interactivas. Los trabajos que quedaron pendientes o a
+    medias al detener el servidor se vuelven a encolar al iniciar.
+
+    Con varios procesos de uvicorn cada uno procesa lo que recibe; un
+    trabajo se marca como tomado en la base antes de ejecutarse, así dos
+    procesos nunca procesan el mismo.
+    """
+
+    def __init__(
+        self,
+        ruta_base_datos: str = config.RUTA_BASE_TRABAJOS,
+        trabajadores: int = config.TRABAJADORES_FONDO,
+        max_en_cola: int = config.MAX_TRABAJOS_FONDO_EN_COLA,
+        intervalo_progreso: float = config.INTERVALO_PROGRESO_SEGUNDOS,
+        retencion: float = config.RETENCION_TRABAJOS_SEGUNDOS
+    ):
+        self.ruta_base_datos = ruta_base_datos
+        self.trabajadores = trabajadores
+        self.max_en_cola = max_en_cola
+        self.intervalo_progreso = intervalo_progreso
+        self.retencion = retencion
+        self._manejadores: Dict[str, Manejador] = {}
+        self._activos: Dict[str, dict] = {}  # Trabajos pendientes o en proceso
+        self._candado = threading.Lock()
+        self._conexion: Optional[sqlite3.Connection] = None
+        self._cola: Optional[asyncio.Queue] = None
+        self._tareas = []
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._deteniendo = False
+
+    def registrar(self, tipo: str, manejador: Manejador):
+        """Asociar un tipo de trabajo con la función que lo procesa"""
+        self._manejadores[tipo] = manejador
+
+    @property
+    def en_cola(self) -> int:
+        """Trabajos pendientes o en proceso"""
+        return len(self._activos)
+
+    async def iniciar(self):
+        """Abrir la base de datos, recuperar trabajos sin terminar y lanzar los trabajadores"""
+        self._conexion = sqlite3.connect(self.ruta_base_datos, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        with self._candado, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(ESQUEMA)
+            self._conexion.execute(
+                "DELETE FROM trabajos WHERE terminado IS NOT NULL AND terminado < ?",
+                (time.time() - self.retencion,)
+            )
+            # Lo que estaba en proceso en un proceso que ya no existe se reinicia desde cero
+            huerfanos = [
+                fila["id"] for fila in self._conexion.execute(
+                    "SELECT id, proceso FROM trabajos WHERE estado = ?", (EN_PROCESO,)
+                )
+                if not _proceso_vivo(fila["proceso"])
+            ]
+            self._conexion.executemany(
+                "UPDATE trabajos SET estado = ?, procesadas = 0, iniciado = NULL, proceso = NULL WHERE id = ?",
+                [(PENDIENTE, trabajo_id) for trabajo_id in huerfanos]
+            )
+            filas = self._conexion.execute(
+                "SELECT * FROM trabajos WHERE estado = ? ORDER BY creado", (PENDIENTE,)
+            ).fetchall()
+
+        self._deteniendo = False
+        self._cola = asyncio.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=self.trabajadores, thread_name_prefix="trabajo")
+        for fila in filas:
+            trabajo = self._desde_fila(fila)
+            self._activos[trabajo["id"]] = trabajo
+            self._cola.put_nowait(trabajo["id"])
+        self._tareas = [asyncio.create_task(self._trabajador()) for _ in range(self.trabajadores)]
+
+    async def detener(self):
+        """
+        Detener los trabajadores. Los trabajos en curso se interrumpen en el
+        siguiente bloque y quedan pendientes para el próximo inicio.
+        """
+        self._deteniendo = True
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown, wait=True)
+            self._pool = None
+        if self._conexion is not None:
+            with self._candado:
+                self._conexion.close()
+                self._conexion = None
+
+    async def enviar(self, tipo: str, archivo_id: str, parametros: dict) -> dict:
+        """
+        Encolar un trabajo y devolver su estado inicial.
+        Lanza ColaLlenaError si ya hay demasiados trabajos sin terminar.
+        """
+        if tipo not in self._manejadores:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        if self._cola is None:
+            raise RuntimeError("La cola de trabajos no está iniciada")
+        if len(self._activos) >= self.max_en_cola:
+            raise ColaLlenaError(config.REINTENTAR_DESPUES_SEGUNDOS)
+
+        trabajo = {
+            "id": str(uuid.uuid4()),
+            "tipo": tipo,
+            "archivo_id": archivo_id,
+            "parametros": parametros,
+            "estado": PENDIENTE,
+            "procesadas": 0,
+            "total": 0,
+            "frecuencia": 0,
+            "creado": time.time(),
+            "iniciado": None,
+            "terminado": None,
+            "resultado": None,
+            "error": None,
+            "proceso": None,
+        }
+        # Se reserva el lugar antes de escribir, para que otro envío que llegue
+        # mientras tanto vea la cola con este trabajo al comparar con el máximo
+        self._activos[trabajo["id"]] = trabajo
+        try:
+            await asyncio.to_thread(self._insertar, trabajo)
+        except BaseException:
+            self._activos.pop(trabajo["id"], None)
+            raise
+        self._cola.put_nowait(trabajo["id"])
+        return dict(trabajo)
+
+    def _insertar(self, trabajo: dict):
+        with self._candado, self._conexion:
+            self._conexion.execute(
+                "INSERT INTO trabajos (id, tipo, archivo_id, parametros, estado, creado) VALUES (?, ?, ?, ?, ?, ?)",
+                (trabajo["id"], trabajo["tipo"], trabajo["archivo_id"], json.dumps(trabajo["parametros"]),
+                 PENDIENTE, trabajo["creado"])
+            )
+
+    def obtener(self, trabajo_id: str) -> Optional[dict]:
+        """Estado actual de un trabajo, o None si no existe"""
+        trabajo = self._activos.get(trabajo_id)
+        if trabajo is not None:
+            return dict(trabajo)
+        if self._conexion is None:
+            return None
+        with self._candado:
+            fila = self._conexion.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        return self._desde_fila(fila) if fila else None
+
+    async def eventos(self, trabajo_id: str) -> AsyncIterator[dict]:
+        """Producir el estado del trabajo cada vez que cambia, hasta que termina"""
+        anterior = None
+        while True:
+            # Un trabajo terminado se lee de SQLite: fuera del bucle de eventos
+            trabajo = await asyncio.to_thread(self.obtener, trabajo_id)
+            if trabajo is None:
+                return
+            if trabajo != anterior:
+                yield trabajo
+                anterior = trabajo
+            if trabajo["estado"] in ESTADOS_FINALES:
+                return
+            await asyncio.sleep(self.intervalo_progreso)
+
+    async def _trabajador(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            trabajo_id = await self._cola.get()
+            trabajo = self._activos.get(trabajo_id)
+            if trabajo is None:
+                continue
+            await bucle.run_in_executor(self._pool, self._procesar, trabajo)
+
+    def _procesar(self, trabajo: dict):
+        """Ejecutar un trabajo en un hilo del pool y registrar su resultado"""
+        if not self._tomar(trabajo):
+            # Otro proceso ya lo tomó
+            self._activos.pop(trabajo["id"], None)
+            return
+        ultimo_guardado = trabajo["iniciado"]
+
+        def progreso(procesadas: int, total: int, frecuencia: int):
+            nonlocal ultimo_guardado
+            if self._deteniendo:
+                raise TrabajoInterrumpidoError()
+            trabajo["procesadas"] = procesadas
+            trabajo["total"] = total
+            trabajo["frecuencia"] = frecuencia
+            ahora = time.time()
+            if ahora - ultimo_guardado >= self.intervalo_progreso:
+                self._guardar(trabajo)
+                ultimo_guardado = ahora
+
+        try:
+            resultado = self._manejadores[trabajo["tipo"]](trabajo["archivo_id"], trabajo["parametros"], progreso)
+            trabajo["resultado"] = resultado
+            trabajo["estado"] = COMPLETADO
+            trabajo["procesadas"] = trabajo["total"]
+        except Exception as e:
+            if isinstance(e, TrabajoInterrumpidoError) or self._deteniendo:
+                # Queda en proceso en la base de datos y se reinicia al volver a iniciar
+                self._activos.pop(trabajo["id"], None)
+                return
+            trabajo["error"] = str(e)
+            trabajo["estado"] = ERROR
+        trabajo["terminado"] = time.time()
+        self._guardar(trabajo)
+        self._activos.pop(trabajo["id"], None)
+
+    def _tomar(self, trabajo: dict) -> bool:
+        """Marcar el trabajo como en proceso si sigue pendiente en la base"""
+        iniciado = time.time()
+        with self._candado:
+            if self._conexion is None:
+                return False
+            with self._conexion:
+                tomado = self._conexion.execute(
+                    "UPDATE trabajos SET estado = ?, iniciado = ?, proceso = ? WHERE id = ? AND estado = ?",
+                    (EN_PROCESO, iniciado, os.getpid(), trabajo["id"], PENDIENTE)
+                ).rowcount == 1
+        if tomado:
+            trabajo["estado"] = EN_PROCESO
+            trabajo["iniciado"] = iniciado
+            trabajo["proceso"] = os.getpid()
+        return tomado
+
+    def _guardar(self, trabajo: dict):
+        with self._candado:
+            if self._conexion is None:
+                return
+            with self._conexion:
+                self._conexion.execute(
+                    """
+                    UPDATE trabajos SET estado = ?, procesadas = ?, total = ?, frecuencia = ?,
+                        iniciado = ?, terminado = ?, resultado = ?, error = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        trabajo["estado"], trabajo["procesadas"], trabajo["total"], trabajo["frecuencia"],
+                        trabajo["iniciado"], trabajo["terminado"],
+                        json.dumps(trabajo["resultado"]) if trabajo["resultado"] is not None else None,
+                        trabajo["error"], trabajo["id"]
+                    )
+                )
+
+    @staticmethod
+    def _desde_fila(fila: sqlite3.Row) -> dict:
+        trabajo = dict(fila)
+        trabajo["parametros"] = json.loads(trabajo["parametros"])
+        trabajo["resultado"] = json.loads(trabajo["resultado"]) if trabajo["resultado"] else None
+        return trabajo
+
+
+# Instancia global de la cola
+cola_trabajos = ColaTrabajos()
+
+metricas.medidor(
+    "audio_trabajos_fondo_en_cola", "Trabajos en segundo plano pendientes o en proceso",
+    funcion=lambda: cola_trabajos.en_cola
+)
@@ -0,0 +1,52 @@
+"""
+Codificación compacta de resultados numéricos
+Empaqueta columnas de NumPy como una matriz binaria little-endian (float32 o
+int16), opcionalmente en base64, para no serializar miles de floats en JSON
+"""
+
+import base64
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FORMATOS = ("json", "binario", "base64")
+TIPOS = {"float32": "<f4", "int16": "<i2"}
+FACTOR_INT16 = 32767  # Amplitud ±1.0 ↦ ±32767
+
+
+def elegir_formato(formato: Optional[str], accept: Optional[str]) -> str:
+    """
+    Elegir el formato de respuesta: el parámetro explícito tiene prioridad;
+    si no, `Accept: application/octet-stream` pide binario y todo lo demás JSON
+    """
+    if formato:
+        return formato
+    if accept and "application/octet-stream" in accept:
+        return "binario"
+    return "json"
+
+
+def empaquetar(columnas: Dict[str, np.ndarray], tipo: str = "float32") -> Tuple[bytes, Tuple[int, int], List[str]]:
+    """
+    Unir columnas de igual largo en una matriz (filas × columnas) y retornar
+    sus bytes en orden de filas, la forma y los nombres de las columnas.
+    Con int16 los valores se escalan por FACTOR_INT16 (pensado para amplitudes en ±1).
+    """
+    nombres = list(columnas)
+    matriz = np.column_stack([np.asarray(columnas[nombre], dtype=np.float32) for nombre in nombres])
+    if tipo == "int16":
+        matriz = np.clip(np.rint(matriz * FACTOR_INT16), -32768, 32767)
+    datos = matriz.astype(TIPOS[tipo], copy=False)
+    return datos.tobytes(), datos.shape, nombres
+
+
+def a_base64(columnas: Dict[str, np.ndarray], tipo: str = "float32") -> dict:
+    """Representación JSON compacta: la matriz binaria en base64 con su descripción"""
+    datos, forma, nombres = empaquetar(columnas, tipo)
+    return {
+        "forma": list(forma),
+        "tipo": tipo,
+        "columnas": nombres,
+        "factor": FACTOR_INT16 if tipo == "int16" else 1,
+        "datos": base64.b64encode(datos).decode("ascii"),
+    }
@@ -0,0 +1,185 @@
+"""
+Acceso a muestras de WAV mapeados en memoria
+Mapea la sección de datos PCM con numpy.memmap en su tipo nativo y convierte
+a float32 solo los tramos que se leen, sin cargar la señal completa
+"""
+
+import mmap
+import struct
+from typing import Iterator, Optional
+
+import numpy as np
+import soundfile as sf
+
+# Códigos de formato de la cabecera fmt
+FORMATO_PCM = 1
+FORMATO_FLOAT = 3
+FORMATO_EXTENSIBLE = 0xFFFE
+
+# (formato, bits) → tipo de NumPy de cada muestra; 24 bits se arma a partir de bytes
+TIPOS_PCM = {
+    (FORMATO_PCM, 8): np.dtype("u1"),
+    (FORMATO_PCM, 16): np.dtype("<i2"),
+    (FORMATO_PCM, 24): np.dtype("u1"),
+    (FORMATO_PCM, 32): np.dtype("<i4"),
+    (FORMATO_FLOAT, 32): np.dtype("<f4"),
+    (FORMATO_FLOAT, 64): np.dtype("<f8"),
+}
+
+
+def _leer_cabecera(ruta: str) -> dict:
+    """
+    Recorrer los chunks RIFF/RF64 hasta `data` y retornar el formato y la
+    posición de los datos. Lanza ValueError si no es un WAV PCM o float.
+    """
+    with open(ruta, "rb") as archivo:
+        riff = archivo.read(12)
+        if len(riff) < 12 or riff[:4] not in (b"RIFF", b"RF64") or riff[8:12] != b"WAVE":
+            raise ValueError("No es un archivo WAV")
+        tamano_archivo = archivo.seek(0, 2)
+        archivo.seek(12)
+
+        formato = None
+        tamano_ds64 = None
+        while True:
+            encabezado = archivo.read(8)
+            if len(encabezado) < 8:
+                raise ValueError("WAV sin sección de datos")
+            nombre, tamano = struct.unpack("<4sI", encabezado)
+            inicio = archivo.tell()
+            if nombre == b"ds64":
+                # RF64: el tamaño real de data está en 64 bits
+                tamano_ds64 = struct.unpack("<QQ", archivo.read(16))[1]
+            elif nombre == b"fmt ":
+                campos = archivo.read(min(tamano, 40))
+                codigo, canales, frecuencia, _, alineacion, bits = struct.unpack("<HHIIHH", campos[:16])
+                if codigo == FORMATO_EXTENSIBLE and len(campos) >= 26:
+                    # Los dos primeros bytes del GUID del subformato son el código real
+                    codigo = struct.unpack("<H", campos[24:26])[0]
+                formato = (codigo, canales, frecuencia, alineacion, bits)
+            elif nombre == b"data":
+                if formato is None:
+                    raise ValueError("WAV sin cabecera de formato")
+                if tamano_ds64 is not None and tamano == 0xFFFFFFFF:
+                    tamano = tamano_ds64
+                # Un tamaño mayor al archivo (escritura sin terminar) se recorta a lo disponible
+                tamano = min(tamano, tamano_archivo - inicio)
+                codigo, canales, frecuencia, alineacion, bits = formato
+                if (codigo, bits) not in TIPOS_PCM or alineacion != canales * bits // 8:
+                    raise ValueError(f"Formato WAV no soportado: código {codigo}, {bits} bits")
+                return {
+                    "codigo": codigo,
+                    "canales": canales,
+                    "frecuencia": frecuencia,
+                    "bits": bits,
+                    "desplazamiento": inicio,
+                    "muestras": tamano // alineacion,
+                }
+            # Los chunks de tamaño impar llevan un byte de relleno
+            archivo.seek(inicio + tamano + (tamano & 1))
+
+
+class WavMapeado:
+    """
+    Lector de un WAV PCM (8, 16, 24 o 32 bits) o float (32 o 64 bits) con
+    los datos mapeados en memoria. Solo se leen del disco las páginas de
+    los tramos pedidos, y la conversión a float32 se hace por tramo.
+    """
+
+    def __init__(self, ruta: str):
+        cabecera = _leer_cabecera(ruta)
+        self.ruta = ruta
+        self.frecuencia = cabecera["frecuencia"]
+        self.canales = cabecera["canales"]
+        self.muestras = cabecera["muestras"]
+        self.bits = cabecera["bits"]
+        self._codigo = cabecera["codigo"]
+        tipo = TIPOS_PCM[(self._codigo, self.bits)]
+        forma = (self.muestras, self.canales, 3) if self.bits == 24 else (self.muestras, self.canales)
+        # memmap no acepta mapear cero bytes
+        self._datos = np.memmap(
+            ruta, dtype=tipo, mode="r", offset=cabecera["desplazamiento"], shape=forma
+        ) if self.muestras else np.zeros(forma, dtype=tipo)
+        # numpy mapea desde el múltiplo de ALLOCATIONGRANULARITY anterior a los datos
+        self._inicio_mapa = cabecera["desplazamiento"] % mmap.ALLOCATIONGRANULARITY
+        self._bytes_por_muestra = self.canales * self.bits // 8
+
+    def leer(self, inicio: int = 0, fin: Optional[int] = None) -> np.ndarray:
+        """Muestras [inicio, fin) como float32 (muestras × canales) en ±1"""
+        fin = self.muestras if fin is None else min(fin, self.muestras)
+        inicio = min(max(inicio, 0), fin)
+        tramo = self._datos[inicio:fin]
+        if self._codigo == FORMATO_FLOAT:
+            # Siempre una copia: un arreglo que apunte al mapeo mantiene el archivo abierto
+            return np.array(tramo, dtype=np.float32)
+        if self.bits == 8:
+            return (tramo.astype(np.float32) - 128.0) / 128.0
+        if self.bits == 24:
+            # Los tres bytes van en la parte alta de un int32; el desplazamiento aritmético extiende el signo
+            enteros = np.zeros(tramo.shape[:2] + (4,), dtype=np.uint8)
+            enteros[..., 1:] = tramo
+            return (enteros.view("<i4")[..., 0] >> 8).astype(np.float32) / float(2 ** 23)
+        return tramo.astype(np.float32) / float(2 ** (self.bits - 1))
+
+    def bloques(
+        self, tamano: int, superposicion: int = 0, inicio: int = 0, fin: Optional[int] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        Recorrer [inicio, fin) en bloques float32 de `tamano` muestras; cada
+        bloque repite las últimas `superposicion` del anterior, como
+        `soundfile.blocks`. El último bloque puede ser más corto.
+        """
+        fin = self.muestras if fin is None else min(fin, self.muestras)
+        salto = tamano - superposicion
+        posicion = inicio
+        while posicion < fin:
+            yield self.leer(posicion, min(posicion + tamano, fin))
+            if posicion + tamano >= fin:
+                return
+            posicion += salto
+            self._soltar(posicion)
+
+    def _soltar(self, hasta: int):
+        """
+        Quitar del proceso las páginas ya recorridas. Son páginas del archivo
+        sin modificar: siguen en la caché del sistema y se vuelven a leer si
+        hacen falta, pero un recorrido completo no acumula memoria residente.
+        """
+        mapa = getattr(self._datos, "_mmap", None)
+        if mapa is None or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        fin = self._inicio_mapa + hasta * self._bytes_por_muestra
+        fin -= fin % mmap.PAGESIZE
+        if fin > 0:
+            mapa.madvise(mmap.MADV_DONTNEED, 0, fin)
+
+
+class LectorSoundfile:
+    """Misma interfaz que WavMapeado para formatos que numpy no puede mapear"""
+
+    def __init__(self, ruta: str):
+        info = sf.info(ruta)
+        self.ruta = ruta
+        self.frecuencia = info.samplerate
+        self.canales = info.channels
+        self.muestras = info.frames
+
+    def leer(self, inicio: int = 0, fin: Optional[int] = None) -> np.ndarray:
+        muestras, _ = sf.read(self.ruta, start=inicio, stop=fin, dtype="float32", always_2d=True)
+        return muestras
+
+    def bloques(
+        self, tamano: int, superposicion: int = 0, inicio: int = 0, fin: Optional[int] = None
+    ) -> Iterator[np.ndarray]:
+        return sf.blocks(
+            self.ruta, blocksize=tamano, overlap=superposicion, start=inicio, stop=fin,
+            dtype="float32", always_2d=True
+        )
+
+
+def abrir_wav(ruta: str):
+    """Abrir un WAV mapeado en memoria; si el formato no lo permite, leerlo con soundfile"""
+    try:
+        return WavMapeado(ruta)
+    except ValueError:
+        return LectorSoundfile(ruta)
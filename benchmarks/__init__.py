@@ -0,0 +1,4 @@
+"""
+Benchmarks del servicio de audio
+Ejecutar con: python -m benchmarks --help
+"""
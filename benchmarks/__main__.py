@@ -0,0 +1,222 @@
+"""
+Ejecutar los benchmarks y guardar los resultados en JSON
+
+    python -m benchmarks --salida resultados.json
+    python -m benchmarks --rapido --base resultados.json
+
+Con --base se compara cada caso contra una ejecución anterior y el proceso
+termina con código 1 si alguno es más lento que la tolerancia.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from backend.configuracion import config
+
+
+def _lista(tipo):
+    return lambda texto: [tipo(valor) for valor in texto.split(",") if valor]
+
+
+# Valores por defecto de la matriz de fixtures: completa y con --rapido
+POR_DEFECTO = {
+    "senales": ["seno", "ruido", "chirp"],
+    "duraciones": [10.0, 60.0],
+    "frecuencias": [44100, 96000],
+    "canales": [2],
+    "formatos": ["wav16", "flac"],
+    "repeticiones": 3,
+}
+POR_DEFECTO_RAPIDO = dict(POR_DEFECTO, duraciones=[5.0], frecuencias=[44100], formatos=["wav16"], repeticiones=1)
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks del servicio de audio")
+    parser.add_argument("--senales", type=_lista(str), help="seno, ruido, chirp")
+    parser.add_argument("--duraciones", type=_lista(float), help="Segundos")
+    parser.add_argument("--frecuencias", type=_lista(int))
+    parser.add_argument("--canales", type=_lista(int))
+    parser.add_argument("--formatos", type=_lista(str), help="wav16, wav24, flac, mp3")
+    parser.add_argument("--repeticiones", type=int)
+    parser.add_argument("--casos", type=_lista(str), default=[], help="Filtrar casos cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--sin-http", action="store_true", help="Medir solo los métodos del servicio")
+    parser.add_argument("--rapido", action="store_true", help="Señales cortas, un solo formato y una repetición")
+    parser.add_argument("--fixtures", help="Directorio donde guardar y reutilizar los archivos generados")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--base", help="Resultados anteriores contra los que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Aumento relativo de tiempo que cuenta como regresión")
+    argumentos = parser.parse_args()
+    # Lo que se pasa explícitamente tiene prioridad sobre --rapido
+    for nombre, valor in (POR_DEFECTO_RAPIDO if argumentos.rapido else POR_DEFECTO).items():
+        if getattr(argumentos, nombre) is None:
+            setattr(argumentos, nombre, valor)
+    return argumentos
+
+
+def _aislar_configuracion(directorio: str):
+    """
+    Usar un directorio de temporales propio, con su registro y su cola de
+    trabajos, para no mezclar los benchmarks con los archivos del servidor.
+    Tiene que correr antes de importar los servicios (leen la configuración al crearse).
+    """
+    temporales = os.path.join(directorio, "temp")
+    os.makedirs(temporales)
+    config.DIRECTORIO_TEMPORALES = temporales
+    config.RUTA_BASE_REGISTRO = os.path.join(temporales, "registro.sqlite3")
+    config.RUTA_BASE_TRABAJOS = os.path.join(temporales, "trabajos.sqlite3")
+    config.RUTA_CACHE_FFMPEG = os.path.join(temporales, "ffmpeg.json")
+
+
+def _entorno() -> dict:
+    import numpy
+    import scipy
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "scipy": scipy.__version__,
+        "ffmpeg": shutil.which("ffmpeg") is not None,
+    }
+
+
+def comparar(resultados: list, base: dict, tolerancia: float) -> list:
+    """Relación de tiempos contra la base para cada caso que aparece en ambas"""
+    anteriores = {
+        (resultado["caso"], resultado["fixture"]["nombre"]): resultado
+        for resultado in base.get("resultados", [])
+        if resultado.get("tiempo_mediana_s")
+    }
+    comparaciones = []
+    for resultado in resultados:
+        anterior = anteriores.get((resultado["caso"], resultado["fixture"]["nombre"]))
+        if anterior is None or not resultado.get("tiempo_mediana_s"):
+            continue
+        relacion = resultado["tiempo_mediana_s"] / anterior["tiempo_mediana_s"]
+        comparaciones.append({
+            "caso": resultado["caso"],
+            "fixture": resultado["fixture"]["nombre"],
+            "base_s": anterior["tiempo_mediana_s"],
+            "actual_s": resultado["tiempo_mediana_s"],
+            "relacion": relacion,
+            "regresion": relacion > 1 + tolerancia,
+        })
+    return comparaciones
+
+
+async def _ejecutar(argumentos, fixtures: list) -> list:
+    # Se importan acá, después de aislar la configuración; lo que imprime
+    # el servicio al iniciar va a stderr para no mezclarse con el JSON
+    import httpx
+    with contextlib.redirect_stdout(sys.stderr):
+        from backend.aplicacion import aplicacion
+        from benchmarks.casos import casos_http, casos_servicio
+    from benchmarks.medicion import medir
+
+    resultados = []
+    async with aplicacion.router.lifespan_context(aplicacion):
+        transporte = httpx.ASGITransport(app=aplicacion)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=None) as cliente:
+            for fixture, ruta in fixtures:
+                casos = casos_servicio(ruta, fixture)
+                if not argumentos.sin_http:
+                    casos += casos_http(ruta, fixture, cliente)
+                for caso in casos:
+                    if argumentos.casos and not any(filtro in caso.nombre for filtro in argumentos.casos):
+                        continue
+                    resultado = {"caso": caso.nombre, "fixture": dict(fixture.como_dict(), nombre=fixture.nombre)}
+                    try:
+                        # Los mensajes del servicio no se mezclan con el reporte
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            resultado.update(await medir(
+                                caso.ejecutar, caso.muestras, argumentos.repeticiones, caso.preparar, caso.limpiar
+                            ))
+                        print(
+                            f"{caso.nombre:28} {fixture.nombre:36} {resultado['tiempo_mediana_s'] * 1000:10.1f} ms"
+                            f" {resultado['muestras_por_segundo'] / 1e6:8.2f} M muestras/s",
+                            file=sys.stderr
+                        )
+                    except Exception as e:
+                        resultado["error"] = str(e)
+                        print(f"{caso.nombre:28} {fixture.nombre:36} ERROR: {e}", file=sys.stderr)
+                    resultados.append(resultado)
+    return resultados
+
+
+def main() -> int:
+    argumentos = _argumentos()
+    directorio = tempfile.mkdtemp(prefix="benchmark-audio-")
+    try:
+        _aislar_configuracion(directorio)
+        from benchmarks.fixtures import Fixture, escribir_fixture
+
+        directorio_fixtures = argumentos.fixtures or os.path.join(directorio, "fixtures")
+        os.makedirs(directorio_fixtures, exist_ok=True)
+        fixtures = []
+        for senal, duracion, frecuencia, canales, formato in itertools.product(
+            argumentos.senales, argumentos.duraciones, argumentos.frecuencias, argumentos.canales, argumentos.formatos
+        ):
+            fixture = Fixture(senal, duracion, frecuencia, canales, formato)
+            ruta = escribir_fixture(fixture, directorio_fixtures)
+            if ruta is None:
+                print(f"Se omite {fixture.nombre}: hace falta ffmpeg", file=sys.stderr)
+                continue
+            fixtures.append((fixture, ruta))
+
+        inicio = time.time()
+        resultados = asyncio.run(_ejecutar(argumentos, fixtures))
+        reporte = {
+            "version": 1,
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "duracion_s": time.time() - inicio,
+            "entorno": _entorno(),
+            "parametros": {
+                "senales": argumentos.senales,
+                "duraciones": argumentos.duraciones,
+                "frecuencias": argumentos.frecuencias,
+                "canales": argumentos.canales,
+                "formatos": argumentos.formatos,
+                "repeticiones": argumentos.repeticiones,
+            },
+            "resultados": resultados,
+        }
+
+        codigo = 0
+        if argumentos.base:
+            with open(argumentos.base) as archivo:
+                comparaciones = comparar(resultados, json.load(archivo), argumentos.tolerancia)
+            reporte["comparacion"] = {"base": argumentos.base, "tolerancia": argumentos.tolerancia, "casos": comparaciones}
+            for comparacion in comparaciones:
+                marca = "REGRESIÓN" if comparacion["regresion"] else ""
+                print(
+                    f"{comparacion['caso']:28} {comparacion['fixture']:36} x{comparacion['relacion']:.2f} {marca}",
+                    file=sys.stderr
+                )
+            if any(comparacion["regresion"] for comparacion in comparaciones):
+                codigo = 1
+
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if argumentos.salida:
+            with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+                archivo.write(texto + "\n")
+        else:
+            print(texto)
+        return codigo
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
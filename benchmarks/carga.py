@@ -0,0 +1,476 @@
+"""
+Prueba de carga con tráfico concurrente mezclado
+
+    python -m benchmarks.carga --concurrencia 1,4,16 --grafico curvas.png
+    python -m benchmarks.carga --servidor uvicorn --trabajadores 1,2,4
+    python -m benchmarks.carga --url http://localhost:8000 --concurrencia 8
+
+Cada usuario virtual repite, hasta que se cumple la duración del nivel, un
+perfil elegido al azar según la mezcla: `subir` sube un archivo, `convertir`
+encola una conversión y consulta el trabajo hasta que termina y `visor` pide
+la información, la forma de onda y el espectro de un archivo ya subido. Por
+cada combinación de trabajadores y concurrencia se reportan latencias
+(p50/p95/p99), solicitudes por segundo y errores de cada ruta.
+
+Trabajadores son los hilos del pool del servicio con el cliente ASGI en el
+mismo proceso (--servidor asgi) o los procesos de uvicorn (--servidor uvicorn).
+Con --url se prueba un servidor ya levantado y no se varían los trabajadores.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.__main__ import _aislar_configuracion, _entorno, _lista
+
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POR_DEFECTO = {
+    "concurrencia": [1, 2, 4, 8, 16],
+    "trabajadores": sorted({1, os.cpu_count() or 1}),
+    "duracion": 10.0,
+    "duraciones": [10.0],
+    "frecuencias": [44100],
+    "canales": [2],
+    "formatos": ["wav16"],
+}
+POR_DEFECTO_RAPIDO = dict(POR_DEFECTO, concurrencia=[1, 4], trabajadores=[1], duracion=3.0, duraciones=[5.0])
+
+MEZCLA_POR_DEFECTO = "subir=1,convertir=1,visor=6"
+FRECUENCIAS_CONVERSION = (22050, 32000, 48000)
+INTERVALO_SONDEO_SEGUNDOS = 0.1  # Cada cuánto consulta el perfil `convertir` el estado del trabajo
+ESPERA_SERVIDOR_SEGUNDOS = 60  # Tiempo máximo para que uvicorn responda en /salud
+
+# Marca de las subidas; es global para que los barridos siguientes no repitan contenido
+_subidas = itertools.count()
+
+
+def _mezcla(texto: str) -> Dict[str, float]:
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in PERFILES:
+            raise argparse.ArgumentTypeError(f"Perfil desconocido: {nombre} (opciones: {', '.join(PERFILES)})")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.carga", description="Prueba de carga del servicio de audio")
+    parser.add_argument("--concurrencia", type=_lista(int), help="Usuarios virtuales simultáneos de cada nivel")
+    parser.add_argument("--trabajadores", type=_lista(int), help="Hilos del pool (asgi) o procesos de uvicorn")
+    parser.add_argument("--duracion", type=float, help="Segundos que dura cada nivel")
+    parser.add_argument("--mezcla", type=_mezcla, default=_mezcla(MEZCLA_POR_DEFECTO), help=f"Pesos de cada perfil ({MEZCLA_POR_DEFECTO})")
+    parser.add_argument("--espera", type=float, default=0.0, help="Segundos que cada usuario espera entre perfiles")
+    parser.add_argument("--duraciones", type=_lista(float), help="Segundos de audio de los archivos")
+    parser.add_argument("--frecuencias", type=_lista(int))
+    parser.add_argument("--canales", type=_lista(int))
+    parser.add_argument("--formatos", type=_lista(str), help="wav16, wav24, flac, mp3")
+    parser.add_argument("--archivos-visor", type=int, default=4, help="Archivos subidos antes de cada barrido para `visor` y `convertir`")
+    parser.add_argument("--servidor", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--url", help="Probar un servidor ya levantado en esta URL")
+    parser.add_argument("--tiempo-limite", type=float, default=60.0, help="Segundos antes de contar una solicitud como error")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--rapido", action="store_true", help="Pocos niveles cortos con archivos de 5 segundos")
+    parser.add_argument("--fixtures", help="Directorio donde guardar y reutilizar los archivos generados")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--grafico", help="Imagen con las curvas de escalado (hace falta matplotlib)")
+    argumentos = parser.parse_args()
+    for nombre, valor in (POR_DEFECTO_RAPIDO if argumentos.rapido else POR_DEFECTO).items():
+        if getattr(argumentos, nombre) is None:
+            setattr(argumentos, nombre, valor)
+    if argumentos.url:
+        argumentos.trabajadores = [None]
+    return argumentos
+
+
+class Registro:
+    """Latencia y código de estado de cada solicitud, agrupadas por ruta"""
+
+    def __init__(self):
+        self.solicitudes = defaultdict(list)
+
+    def anotar(self, ruta: str, latencia: float, estado: int):
+        self.solicitudes[ruta].append((latencia, estado))
+
+    @staticmethod
+    def _resumir(solicitudes: List[Tuple[float, int]], segundos: float) -> dict:
+        latencias = np.array([latencia for latencia, _ in solicitudes])
+        estados = np.array([estado for _, estado in solicitudes])
+        errores = int(np.count_nonzero((estados >= 400) | (estados == 0)))
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+        return {
+            "solicitudes": len(solicitudes),
+            "errores": errores,
+            "rechazos_503": int(np.count_nonzero(estados == 503)),
+            "sin_respuesta": int(np.count_nonzero(estados == 0)),
+            "tasa_error": errores / len(solicitudes),
+            "solicitudes_por_segundo": len(solicitudes) / segundos,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(latencias.max() * 1000),
+        }
+
+    def resumen(self, segundos: float) -> dict:
+        """Estadísticas por ruta y del total. Las latencias incluyen las solicitudes con error."""
+        rutas = {ruta: self._resumir(solicitudes, segundos) for ruta, solicitudes in sorted(self.solicitudes.items())}
+        todas = list(itertools.chain.from_iterable(self.solicitudes.values()))
+        return {"total": self._resumir(todas, segundos) if todas else None, "rutas": rutas}
+
+
+class Contexto:
+    """Lo que comparten los usuarios virtuales de un barrido"""
+
+    def __init__(self, cliente, archivos: List[Tuple[str, bytes, str]], semilla: int):
+        self.cliente = cliente
+        self.archivos = archivos  # (nombre, contenido, formato)
+        self.archivos_id: List[str] = []
+        self.aleatorio = random.Random(semilla)
+
+    def contenido_unico(self) -> Tuple[str, bytes]:
+        """
+        Un archivo para subir. En los WAV se reemplaza la última muestra por un
+        contador, para que la deduplicación no convierta las subidas en aciertos;
+        los demás formatos se repiten tal cual.
+        """
+        nombre, contenido, formato = self.aleatorio.choice(self.archivos)
+        if formato.startswith("wav"):
+            contenido = contenido[:-4] + struct.pack("<I", next(_subidas))
+        return nombre, contenido
+
+
+async def _pedir(contexto: Contexto, registro: Optional[Registro], ruta: str, metodo: str, url: str, **opciones):
+    """Hacer una solicitud y anotarla; retorna la respuesta o None si falló"""
+    import httpx
+    inicio = time.perf_counter()
+    try:
+        respuesta = await contexto.cliente.request(metodo, url, **opciones)
+    except httpx.HTTPError:
+        if registro is not None:
+            registro.anotar(ruta, time.perf_counter() - inicio, 0)
+        return None
+    if registro is not None:
+        registro.anotar(ruta, time.perf_counter() - inicio, respuesta.status_code)
+    return respuesta if respuesta.status_code < 400 else None
+
+
+async def _subir(contexto: Contexto, registro: Optional[Registro]) -> Optional[str]:
+    nombre, contenido = contexto.contenido_unico()
+    respuesta = await _pedir(contexto, registro, "POST /subir", "POST", "/api/audio/subir", files={"audio": (nombre, contenido)})
+    return respuesta.json()["archivo_id"] if respuesta is not None else None
+
+
+async def perfil_subir(contexto: Contexto, registro: Registro):
+    await _subir(contexto, registro)
+
+
+async def perfil_convertir(contexto: Contexto, registro: Registro):
+    """Encolar una conversión de un archivo compartido y esperar a que termine"""
+    inicio = time.perf_counter()
+    archivo_id = contexto.aleatorio.choice(contexto.archivos_id)
+    respuesta = await _pedir(
+        contexto, registro, "POST /trabajos/convertir", "POST", f"/api/audio/trabajos/convertir/{archivo_id}",
+        data={"frecuencia_muestreo": contexto.aleatorio.choice(FRECUENCIAS_CONVERSION), "bits": 16}
+    )
+    if respuesta is None:
+        return
+    trabajo_id = respuesta.json()["trabajo_id"]
+    while True:
+        await asyncio.sleep(INTERVALO_SONDEO_SEGUNDOS)
+        respuesta = await _pedir(contexto, registro, "GET /trabajos", "GET", f"/api/audio/trabajos/{trabajo_id}")
+        if respuesta is None:
+            return
+        estado = respuesta.json()["estado"]
+        if estado in ("completado", "error"):
+            # Tiempo desde que se encoló hasta que terminó, visto por el cliente
+            registro.anotar("conversión completa", time.perf_counter() - inicio, 200 if estado == "completado" else 500)
+            return
+
+
+async def perfil_visor(contexto: Contexto, registro: Optional[Registro], archivo_id: Optional[str] = None):
+    """Lo que pide la página al abrir un archivo"""
+    archivo_id = archivo_id or contexto.aleatorio.choice(contexto.archivos_id)
+    await _pedir(contexto, registro, "GET /info", "GET", f"/api/audio/info/{archivo_id}")
+    await _pedir(contexto, registro, "GET /forma-onda", "GET", f"/api/audio/forma-onda/{archivo_id}?cantidad_muestras=2000")
+    await _pedir(contexto, registro, "GET /espectro", "GET", f"/api/audio/espectro/{archivo_id}?cantidad_bins=512")
+
+
+PERFILES = {
+    "subir": perfil_subir,
+    "convertir": perfil_convertir,
+    "visor": perfil_visor,
+}
+
+
+async def _preparar(contexto: Contexto, cantidad: int):
+    """Subir los archivos compartidos y pedir una vez lo que mira el visor, fuera de la medición"""
+    for _ in range(cantidad):
+        archivo_id = await _subir(contexto, None)
+        if archivo_id is None:
+            raise RuntimeError("No se pudieron subir los archivos de la prueba")
+        contexto.archivos_id.append(archivo_id)
+    for archivo_id in contexto.archivos_id:
+        await perfil_visor(contexto, None, archivo_id)
+
+
+async def _nivel(contexto: Contexto, concurrencia: int, duracion: float, mezcla: Dict[str, float], espera: float) -> dict:
+    """Correr `concurrencia` usuarios durante `duracion` segundos; las solicitudes en curso al final se esperan"""
+    registro = Registro()
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    fin = time.perf_counter() + duracion
+
+    async def usuario():
+        while time.perf_counter() < fin:
+            perfil = contexto.aleatorio.choices(nombres, pesos)[0]
+            await PERFILES[perfil](contexto, registro)
+            if espera:
+                await asyncio.sleep(espera)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concurrencia)))
+    segundos = time.perf_counter() - inicio
+    return dict(registro.resumen(segundos), concurrencia=concurrencia, duracion_s=segundos)
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as conector:
+        conector.bind(("127.0.0.1", 0))
+        return conector.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def _servidor_uvicorn(trabajadores: int, directorio: str, tiempo_limite: float):
+    """
+    Levantar uvicorn con `trabajadores` procesos. Corre con su propio
+    directorio de trabajo, así que sus temporales (rutas relativas en la
+    configuración) no se mezclan con los del servidor de desarrollo.
+    """
+    import httpx
+    puerto = _puerto_libre()
+    os.makedirs(directorio)
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ_PROYECTO, os.environ.get("PYTHONPATH")])))
+    proceso = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.aplicacion:aplicacion",
+            "--host", "127.0.0.1", "--port", str(puerto),
+            "--workers", str(trabajadores), "--log-level", "warning",
+        ],
+        cwd=directorio, env=entorno, stdout=sys.stderr
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{puerto}", timeout=tiempo_limite, limits=httpx.Limits(max_connections=None)
+        ) as cliente:
+            limite = time.monotonic() + ESPERA_SERVIDOR_SEGUNDOS
+            while True:
+                if proceso.poll() is not None:
+                    raise RuntimeError(f"uvicorn terminó con código {proceso.returncode}")
+                try:
+                    if (await cliente.get("/salud")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > limite:
+                    raise RuntimeError("uvicorn no respondió a tiempo")
+                await asyncio.sleep(0.2)
+            yield cliente
+    finally:
+        proceso.terminate()
+        try:
+            proceso.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+
+
+@contextlib.asynccontextmanager
+async def _servidores(argumentos, directorio: str):
+    """Retorna una función que abre el cliente para una cantidad de trabajadores"""
+    import httpx
+    opciones = {"timeout": argumentos.tiempo_limite, "limits": httpx.Limits(max_connections=None)}
+
+    if argumentos.url:
+        @contextlib.asynccontextmanager
+        async def abrir(_trabajadores):
+            async with httpx.AsyncClient(base_url=argumentos.url, **opciones) as cliente:
+                yield cliente
+        yield abrir
+
+    elif argumentos.servidor == "uvicorn":
+        def abrir(trabajadores):
+            return _servidor_uvicorn(
+                trabajadores, os.path.join(directorio, f"uvicorn-{trabajadores}"), argumentos.tiempo_limite
+            )
+        yield abrir
+
+    else:
+        # En el mismo proceso: se importa después de aislar la configuración
+        with contextlib.redirect_stdout(sys.stderr):
+            from backend.aplicacion import aplicacion
+        from backend.servicios.ejecutor import ejecutor_trabajos
+
+        @contextlib.asynccontextmanager
+        async def abrir(trabajadores):
+            # El pool se crea de nuevo con el tamaño pedido en el primer trabajo
+            ejecutor_trabajos.cerrar()
+            ejecutor_trabajos.trabajadores = trabajadores
+            transporte = httpx.ASGITransport(app=aplicacion)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://carga", **opciones) as cliente:
+                yield cliente
+
+        async with aplicacion.router.lifespan_context(aplicacion):
+            yield abrir
+
+
+def _imprimir(nivel: dict):
+    cabecera = f"trabajadores={nivel['trabajadores']} concurrencia={nivel['concurrencia']}"
+    print(cabecera, file=sys.stderr)
+    for ruta, datos in list(nivel["rutas"].items()) + [("total", nivel["total"])]:
+        if datos is None:
+            continue
+        print(
+            f"  {ruta:26} {datos['solicitudes']:6d} {datos['solicitudes_por_segundo']:8.1f} sol/s"
+            f" p50 {datos['p50_ms']:8.1f}  p95 {datos['p95_ms']:8.1f}  p99 {datos['p99_ms']:8.1f} ms"
+            f"  errores {datos['tasa_error'] * 100:5.1f}%",
+            file=sys.stderr
+        )
+
+
+async def _ejecutar(argumentos, archivos: list, directorio: str) -> list:
+    niveles = []
+    async with _servidores(argumentos, directorio) as abrir:
+        for trabajadores in argumentos.trabajadores:
+            async with abrir(trabajadores) as cliente:
+                contexto = Contexto(cliente, archivos, argumentos.semilla)
+                await _preparar(contexto, argumentos.archivos_visor)
+                for concurrencia in argumentos.concurrencia:
+                    nivel = await _nivel(contexto, concurrencia, argumentos.duracion, argumentos.mezcla, argumentos.espera)
+                    nivel["trabajadores"] = trabajadores
+                    _imprimir(nivel)
+                    niveles.append(nivel)
+    return niveles
+
+
+def graficar(niveles: list, ruta: str) -> bool:
+    """
+    Curvas de escalado: solicitudes por segundo, p95 y tasa de error del
+    total. El eje son los trabajadores si se probó más de una cantidad (una
+    curva por concurrencia); si no, la concurrencia.
+    Retorna False si matplotlib no está instalado.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    niveles = [nivel for nivel in niveles if nivel["total"] is not None]
+    if len({nivel["trabajadores"] for nivel in niveles}) > 1:
+        eje, serie = "trabajadores", "concurrencia"
+    else:
+        eje, serie = "concurrencia", "trabajadores"
+    metricas = (
+        ("solicitudes_por_segundo", "Solicitudes por segundo", 1),
+        ("p95_ms", "Latencia p95 (ms)", 1),
+        ("tasa_error", "Errores (%)", 100),
+    )
+    figura, ejes = plt.subplots(1, len(metricas), figsize=(5 * len(metricas), 4), constrained_layout=True)
+    for valor in sorted({nivel[serie] for nivel in niveles}, key=lambda valor: (valor is None, valor)):
+        puntos = sorted((nivel[eje], nivel["total"]) for nivel in niveles if nivel[serie] == valor)
+        for grafico, (clave, _, escala) in zip(ejes, metricas):
+            grafico.plot(
+                [x for x, _ in puntos], [total[clave] * escala for _, total in puntos],
+                marker="o", label=f"{serie} {valor}"
+            )
+    for grafico, (_, titulo, _) in zip(ejes, metricas):
+        grafico.set_title(titulo)
+        grafico.set_xlabel(eje.capitalize())
+        grafico.set_xticks(sorted({nivel[eje] for nivel in niveles if nivel[eje] is not None}))
+        grafico.set_ylim(bottom=0)
+        grafico.grid(True, alpha=0.3)
+    ejes[0].legend()
+    figura.savefig(ruta, dpi=120)
+    plt.close(figura)
+    return True
+
+
+def main() -> int:
+    argumentos = _argumentos()
+    directorio = tempfile.mkdtemp(prefix="carga-audio-")
+    try:
+        _aislar_configuracion(directorio)
+        from benchmarks.fixtures import Fixture, escribir_fixture
+
+        directorio_fixtures = argumentos.fixtures or os.path.join(directorio, "fixtures")
+        os.makedirs(directorio_fixtures, exist_ok=True)
+        archivos = []
+        for duracion, frecuencia, canales, formato in itertools.product(
+            argumentos.duraciones, argumentos.frecuencias, argumentos.canales, argumentos.formatos
+        ):
+            fixture = Fixture("ruido", duracion, frecuencia, canales, formato)
+            ruta = escribir_fixture(fixture, directorio_fixtures)
+            if ruta is None:
+                print(f"Se omite {fixture.nombre}: hace falta ffmpeg", file=sys.stderr)
+                continue
+            with open(ruta, "rb") as archivo:
+                archivos.append((os.path.basename(ruta), archivo.read(), formato))
+        if not archivos:
+            print("No hay archivos para la prueba", file=sys.stderr)
+            return 1
+
+        inicio = time.time()
+        niveles = asyncio.run(_ejecutar(argumentos, archivos, directorio))
+        reporte = {
+            "version": 1,
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "duracion_s": time.time() - inicio,
+            "entorno": _entorno(),
+            "parametros": {
+                "servidor": argumentos.url or argumentos.servidor,
+                "concurrencia": argumentos.concurrencia,
+                "trabajadores": argumentos.trabajadores,
+                "duracion": argumentos.duracion,
+                "mezcla": argumentos.mezcla,
+                "espera": argumentos.espera,
+                "duraciones": argumentos.duraciones,
+                "frecuencias": argumentos.frecuencias,
+                "canales": argumentos.canales,
+                "formatos": argumentos.formatos,
+                "archivos_visor": argumentos.archivos_visor,
+            },
+            "niveles": niveles,
+        }
+
+        if argumentos.grafico and not graficar(niveles, argumentos.grafico):
+            print("Se omite el gráfico: hace falta matplotlib", file=sys.stderr)
+
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if argumentos.salida:
+            with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+                archivo.write(texto + "\n")
+        else:
+            print(texto)
+        return 0
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Casos de benchmark
+Cada caso ejercita un camino crítico del servicio de audio, llamando al
+servicio directamente o a los endpoints HTTP a través de un cliente ASGI en
+el mismo proceso
+"""
+
+import io
+import json
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Union
+
+import httpx
+
+from backend.modelo.esquemas import ConfiguracionAudio
+from backend.servicios.servicio_audio import servicio_audio
+from benchmarks.fixtures import Fixture
+
+Paso = Callable[..., Union[None, dict, Awaitable[Optional[dict]]]]
+
+
+@dataclass
+class Caso:
+    nombre: str
+    muestras: int  # Muestras de entrada que procesa cada repetición
+    ejecutar: Paso
+    preparar: Optional[Paso] = None
+    limpiar: Optional[Paso] = None
+
+
+def _destino(fixture: Fixture) -> ConfiguracionAudio:
+    """Conversión representativa: cambio de frecuencia y de profundidad de bits"""
+    frecuencia = 48000 if fixture.frecuencia != 48000 else 44100
+    return ConfiguracionAudio(frecuencia_muestreo=frecuencia, bits=24)
+
+
+def _verificar(respuesta: httpx.Response) -> httpx.Response:
+    if respuesta.status_code >= 400:
+        raise RuntimeError(f"HTTP {respuesta.status_code}: {respuesta.text[:200]}")
+    return respuesta
+
+
+def casos_servicio(ruta: str, fixture: Fixture) -> List[Caso]:
+    """Métodos de ServicioAudio llamados directamente"""
+    nombre_archivo = os.path.basename(ruta)
+
+    def subir() -> str:
+        with open(ruta, "rb") as flujo:
+            return servicio_audio.guardar_archivo_temporal(flujo, nombre_archivo)
+
+    def preparar() -> dict:
+        return {"archivo_id": subir()}
+
+    def preparar_con_piramide() -> dict:
+        estado = preparar()
+        servicio_audio.obtener_forma_onda(estado["archivo_id"], 2000)
+        return estado
+
+    def limpiar(estado: dict):
+        # Libera el contenido: la próxima subida vuelve a decodificar en lugar de reutilizarlo
+        if "archivo_id" in estado:
+            servicio_audio.limpiar_archivo(estado["archivo_id"])
+
+    def ejecutar_subida(estado: dict):
+        estado["archivo_id"] = subir()
+
+    mitad = fixture.duracion / 2
+    return [
+        Caso("servicio.subir", fixture.muestras, ejecutar_subida, limpiar=limpiar),
+        Caso(
+            "servicio.convertir", fixture.muestras,
+            lambda estado: servicio_audio.convertir_audio(estado["archivo_id"], _destino(fixture)),
+            preparar, limpiar
+        ),
+        Caso(
+            "servicio.forma_onda", fixture.muestras,
+            lambda estado: servicio_audio.obtener_forma_onda(estado["archivo_id"], 2000),
+            preparar, limpiar
+        ),
+        Caso(
+            "servicio.forma_onda_tramo", min(fixture.frecuencia, fixture.muestras),
+            lambda estado: servicio_audio.obtener_forma_onda(estado["archivo_id"], 2000, mitad, mitad + 1.0),
+            preparar_con_piramide, limpiar
+        ),
+        Caso(
+            "servicio.espectro", fixture.muestras,
+            lambda estado: servicio_audio.obtener_espectro(estado["archivo_id"], 512),
+            preparar, limpiar
+        ),
+    ]
+
+
+def casos_http(ruta: str, fixture: Fixture, cliente: httpx.AsyncClient) -> List[Caso]:
+    """Endpoints de /api/audio, incluida la serialización de las respuestas"""
+    nombre_archivo = os.path.basename(ruta)
+    with open(ruta, "rb") as archivo:
+        contenido = archivo.read()
+    comprimido = io.BytesIO()
+    with zipfile.ZipFile(comprimido, "w", zipfile.ZIP_STORED) as lote_zip:
+        lote_zip.writestr(nombre_archivo, contenido)
+
+    async def subir() -> str:
+        respuesta = _verificar(await cliente.post("/api/audio/subir", files={"audio": (nombre_archivo, contenido)}))
+        return respuesta.json()["archivo_id"]
+
+    async def preparar() -> dict:
+        return {"archivo_id": await subir()}
+
+    async def preparar_con_piramide() -> dict:
+        estado = await preparar()
+        servicio_audio.obtener_forma_onda(estado["archivo_id"], 2000)
+        return estado
+
+    def limpiar(estado: dict):
+        if "archivo_id" in estado:
+            servicio_audio.limpiar_archivo(estado["archivo_id"])
+        for archivo_id in set(estado.get("archivo_ids", [])):
+            servicio_audio.limpiar_archivo(archivo_id)
+
+    async def ejecutar_subida(estado: dict):
+        estado["archivo_id"] = await subir()
+
+    async def ejecutar_subida_lote(estado: dict):
+        # Un archivo suelto y el mismo dentro de un .zip: recorre los dos caminos del lote
+        respuesta = _verificar(await cliente.post("/api/audio/subir-lote", files=[
+            ("audios", (nombre_archivo, contenido)),
+            ("audios", ("lote.zip", comprimido.getvalue())),
+        ]))
+        lineas = [json.loads(linea) for linea in respuesta.text.splitlines() if linea]
+        estado["archivo_ids"] = [linea["archivo_id"] for linea in lineas if "archivo_id" in linea]
+        errores = [linea["error"] for linea in lineas if "error" in linea]
+        if errores:
+            raise RuntimeError(f"Lote con errores: {errores[0]}")
+
+    def obtener(ruta_api: str, codigo: int = 200, **cabeceras):
+        async def ejecutar(estado: dict):
+            respuesta = _verificar(await cliente.get(ruta_api.format(**estado), headers=cabeceras))
+            if respuesta.status_code != codigo:
+                raise RuntimeError(f"HTTP {respuesta.status_code}, se esperaba {codigo}")
+        return ejecutar
+
+    async def convertir(estado: dict):
+        destino = _destino(fixture)
+        _verificar(await cliente.post(
+            f"/api/audio/convertir/{estado['archivo_id']}",
+            data={"frecuencia_muestreo": destino.frecuencia_muestreo, "bits": destino.bits}
+        ))
+
+    return [
+        Caso("http.subir", fixture.muestras, ejecutar_subida, limpiar=limpiar),
+        Caso("http.subir_lote", 2 * fixture.muestras, ejecutar_subida_lote, limpiar=limpiar),
+        Caso("http.convertir", fixture.muestras, convertir, preparar, limpiar),
+        Caso(
+            "http.forma_onda_json", fixture.muestras,
+            obtener("/api/audio/forma-onda/{archivo_id}?cantidad_muestras=10000"),
+            preparar_con_piramide, limpiar
+        ),
+        Caso(
+            "http.forma_onda_binario", fixture.muestras,
+            obtener("/api/audio/forma-onda/{archivo_id}?cantidad_muestras=10000&formato=binario"),
+            preparar_con_piramide, limpiar
+        ),
+        Caso(
+            "http.espectro", fixture.muestras,
+            obtener("/api/audio/espectro/{archivo_id}?cantidad_bins=512"),
+            preparar, limpiar
+        ),
+        Caso("http.descargar", fixture.muestras, obtener("/api/audio/descargar/{archivo_id}"), preparar, limpiar),
+        # Un reproductor que busca: solo el primer MB, que tiene que llegar como 206
+        Caso(
+            "http.descargar_tramo", fixture.muestras,
+            obtener("/api/audio/descargar/{archivo_id}", 206, Range="bytes=0-1048575"),
+            preparar, limpiar
+        ),
+    ]
@@ -0,0 +1,97 @@
+"""
+Archivos de prueba sintéticos
+Genera senoidales, ruido y barridos (chirp) con la duración, frecuencia de
+muestreo, canales y formato pedidos
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+SENALES = ("seno", "ruido", "chirp")
+
+# Formato → (extensión, subtipo de soundfile); mp3 se codifica con ffmpeg desde un WAV
+FORMATOS = {
+    "wav16": (".wav", "PCM_16"),
+    "wav24": (".wav", "PCM_24"),
+    "flac": (".flac", "PCM_16"),
+    "mp3": (".mp3", None),
+}
+
+
+@dataclass(frozen=True)
+class Fixture:
+    """Descripción de un archivo de prueba"""
+    senal: str
+    duracion: float
+    frecuencia: int
+    canales: int
+    formato: str
+
+    @property
+    def nombre(self) -> str:
+        return f"{self.senal}-{self.duracion:g}s-{self.frecuencia}hz-{self.canales}ch-{self.formato}"
+
+    @property
+    def muestras(self) -> int:
+        return int(self.duracion * self.frecuencia)
+
+    def como_dict(self) -> dict:
+        return asdict(self)
+
+
+def generar_senal(fixture: Fixture, semilla: int = 0) -> np.ndarray:
+    """Muestras float32 (muestras × canales) de la señal descrita"""
+    t = np.arange(fixture.muestras) / fixture.frecuencia
+    columnas = []
+    for canal in range(fixture.canales):
+        if fixture.senal == "seno":
+            # Una nota distinta por canal, a -6 dBFS
+            columna = 0.5 * np.sin(2 * np.pi * 440.0 * (canal + 1) * t)
+        elif fixture.senal == "ruido":
+            aleatorio = np.random.default_rng(semilla + canal)
+            columna = np.clip(aleatorio.normal(0.0, 0.2, len(t)), -1.0, 1.0)
+        elif fixture.senal == "chirp":
+            # Barrido logarítmico de 20 Hz hasta el 90% de Nyquist
+            columna = 0.5 * signal.chirp(
+                t, f0=20.0, t1=max(fixture.duracion, 1e-3), f1=0.45 * fixture.frecuencia, method="logarithmic"
+            )
+        else:
+            raise ValueError(f"Señal desconocida: {fixture.senal}")
+        columnas.append(columna)
+    return np.stack(columnas, axis=1).astype(np.float32)
+
+
+def escribir_fixture(fixture: Fixture, directorio: str, ruta_ffmpeg: Optional[str] = None) -> Optional[str]:
+    """
+    Escribir el archivo de la fixture en `directorio` (si no existe ya) y
+    retornar su ruta. Retorna None si el formato necesita ffmpeg y no hay.
+    """
+    extension, subtipo = FORMATOS[fixture.formato]
+    ruta = os.path.join(directorio, fixture.nombre + extension)
+    if os.path.exists(ruta):
+        return ruta
+
+    muestras = generar_senal(fixture)
+    if subtipo is not None:
+        sf.write(ruta, muestras, fixture.frecuencia, subtype=subtipo)
+        return ruta
+
+    ruta_ffmpeg = ruta_ffmpeg or shutil.which("ffmpeg")
+    if not ruta_ffmpeg:
+        return None
+    with tempfile.NamedTemporaryFile(suffix=".wav", dir=directorio) as temporal:
+        sf.write(temporal.name, muestras, fixture.frecuencia, subtype="PCM_16")
+        subprocess.run(
+            [ruta_ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", temporal.name,
+             "-c:a", "libmp3lame", "-b:a", "192k", ruta],
+            check=True
+        )
+    return ruta
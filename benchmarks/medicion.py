@@ -0,0 +1,113 @@
+"""
+Medición de tiempo y memoria
+Cronometra cada repetición de un caso y muestrea la memoria residente del
+proceso mientras corre, para reportar el pico
+"""
+
+import inspect
+import os
+import statistics
+import threading
+import time
+from typing import Awaitable, Callable, Optional, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_actual() -> Optional[int]:
+    """Memoria residente actual del proceso en bytes (None si no se puede medir)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGINA
+    except OSError:
+        pass
+    if resource is not None:
+        # Sin /proc solo está el pico histórico (KB en Linux, bytes en macOS)
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if os.uname().sysname == "Darwin" else pico * 1024
+    return None
+
+
+class MuestreadorMemoria:
+    """Hilo que lee la memoria residente cada `intervalo` segundos y guarda el máximo"""
+
+    def __init__(self, intervalo: float = 0.002):
+        self.intervalo = intervalo
+        self.inicial: Optional[int] = None
+        self.pico: Optional[int] = None
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def _muestrear(self):
+        while not self._detener.is_set():
+            actual = rss_actual()
+            if actual is not None:
+                self.pico = max(self.pico or 0, actual)
+            self._detener.wait(self.intervalo)
+
+    def __enter__(self):
+        self.inicial = self.pico = rss_actual()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *excepcion):
+        self._detener.set()
+        self._hilo.join()
+        actual = rss_actual()
+        if actual is not None:
+            self.pico = max(self.pico or 0, actual)
+
+
+async def _llamar(funcion: Callable, *argumentos):
+    resultado = funcion(*argumentos)
+    if inspect.isawaitable(resultado):
+        resultado = await resultado
+    return resultado
+
+
+async def medir(
+    ejecutar: Callable[[dict], Union[None, Awaitable[None]]],
+    muestras: int,
+    repeticiones: int = 3,
+    preparar: Optional[Callable[[], Union[dict, Awaitable[dict]]]] = None,
+    limpiar: Optional[Callable[[dict], Union[None, Awaitable[None]]]] = None
+) -> dict:
+    """
+    Ejecutar un caso `repeticiones` veces. `preparar` y `limpiar` (fuera del
+    tiempo medido) arman y desarman el estado que recibe `ejecutar`; pueden
+    ser funciones comunes o corrutinas. `muestras` son las muestras de
+    entrada que procesa cada repetición, para calcular el rendimiento.
+    """
+    tiempos = []
+    pico = incremento = None
+    for _ in range(repeticiones):
+        estado = await _llamar(preparar) if preparar else {}
+        try:
+            with MuestreadorMemoria() as memoria:
+                inicio = time.perf_counter()
+                await _llamar(ejecutar, estado)
+                tiempos.append(time.perf_counter() - inicio)
+        finally:
+            if limpiar:
+                await _llamar(limpiar, estado)
+        if memoria.pico is not None:
+            pico = max(pico or 0, memoria.pico)
+            incremento = max(incremento or 0, memoria.pico - memoria.inicial)
+
+    mediana = statistics.median(tiempos)
+    return {
+        "repeticiones": repeticiones,
+        "muestras": muestras,
+        "tiempo_mediana_s": mediana,
+        "tiempo_min_s": min(tiempos),
+        "tiempo_max_s": max(tiempos),
+        "muestras_por_segundo": muestras / mediana if mediana > 0 else None,
+        "rss_pico_mb": pico / 2 ** 20 if pico is not None else None,
+        "rss_incremento_mb": incremento / 2 ** 20 if incremento is not None else None,
+    }
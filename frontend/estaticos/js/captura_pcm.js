@@ -0,0 +1,35 @@
+// captura_pcm.js
+// AudioWorklet que junta las muestras del micrófono (canal 0) en bloques
+// y los pasa al hilo principal, que los envía por el WebSocket
+
+const MUESTRAS_POR_BLOQUE = 2048;
+
+class CapturaPCM extends AudioWorkletProcessor {
+    constructor() {
+        super();
+        this.bloque = new Float32Array(MUESTRAS_POR_BLOQUE);
+        this.ocupadas = 0;
+    }
+
+    process(entradas) {
+        const canal = entradas[0][0];
+        if (!canal) return true;
+
+        let leidas = 0;
+        while (leidas < canal.length) {
+            const cantidad = Math.min(canal.length - leidas, MUESTRAS_POR_BLOQUE - this.ocupadas);
+            this.bloque.set(canal.subarray(leidas, leidas + cantidad), this.ocupadas);
+            this.ocupadas += cantidad;
+            leidas += cantidad;
+            if (this.ocupadas === MUESTRAS_POR_BLOQUE) {
+                // Se transfiere el buffer (sin copiarlo) y se empieza uno nuevo
+                this.port.postMessage(this.bloque, [this.bloque.buffer]);
+                this.bloque = new Float32Array(MUESTRAS_POR_BLOQUE);
+                this.ocupadas = 0;
+            }
+        }
+        return true;
+    }
+}
+
+registerProcessor('captura-pcm', CapturaPCM);
@@ -21,9 +21,7 @@ document.addEventListener('DOMContentLoaded', function () {
     const audioPreview = document.getElementById('audio-preview');
     const audioPreviewContainer = document.getElementById('audio-preview-container');
 
-    let mediaRecorder = null;
-    let audioChunks = [];
-    let blobGrabado = null;
+    let grabacion = null; // Micrófono, AudioContext y WebSocket de la grabación en curso
     let archivoIdActual = null; // Guardar ID del archivo subido
 
     // Configurar drag & drop
@@ -48,18 +46,22 @@ document.addEventListener('DOMContentLoaded', function () {
             const files = e.dataTransfer.files;
             if (files.length > 0) {
                 inputAudio.files = files;
-                mostrarNotificacion('Archivo Seleccionado', '📁 Archivo listo: ' + files[0].name, 'success');
+                mostrarNotificacion('Archivo Seleccionado', '📁 Archivo listo: ' + nombresSeleccionados(files), 'success');
             }
         });
 
         // Mostrar archivo seleccionado
         inputAudio.addEventListener('change', function() {
             if (this.files.length > 0) {
-                mostrarNotificacion('Archivo Seleccionado', '📁 Archivo listo: ' + this.files[0].name, 'success');
+                mostrarNotificacion('Archivo Seleccionado', '📁 Archivo listo: ' + nombresSeleccionados(this.files), 'success');
             }
         });
     }
 
+    function nombresSeleccionados(files) {
+        return files.length > 1 ? `${files[0].name} y ${files.length - 1} más` : files[0].name;
+    }
+
     // Función para mostrar notificaciones en la parte superior
     function mostrarNotificacion(titulo, mensaje, tipo = 'success') {
         const notification = document.createElement('div');
@@ -113,9 +115,11 @@ document.addEventListener('DOMContentLoaded', function () {
         elemento.classList.remove('d-none');
     }
 
-    // Grabación de audio
+    // Grabación de audio con análisis en vivo: el PCM del micrófono se envía
+    // por WebSocket mientras se captura y el servidor devuelve la envolvente
+    // y el espectro; al detener, la grabación ya quedó guardada en el servidor
     btnGrabar.addEventListener('click', async function () {
-        if (!navigator.mediaDevices || !navigator.mediaDevices.getUserMedia) {
+        if (!navigator.mediaDevices || !navigator.mediaDevices.getUserMedia || !window.AudioWorkletNode) {
             mostrarMensaje('Tu navegador no soporta grabación de audio', 'error');
             return;
         }
@@ -127,43 +131,90 @@ document.addEventListener('DOMContentLoaded', function () {
             audioPreviewContainer.classList.add('d-none');
             mensajeAudio.classList.add('d-none');
             
-            audioChunks = [];
-            blobGrabado = null;
-            
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-            mediaRecorder = new MediaRecorder(stream);
+            const contexto = new AudioContext();
+            await contexto.audioWorklet.addModule('/estaticos/js/captura_pcm.js');
+            const fuente = contexto.createMediaStreamSource(stream);
+            const captura = new AudioWorkletNode(contexto, 'captura-pcm');
             
-            mediaRecorder.ondataavailable = e => {
-                if (e.data.size > 0) audioChunks.push(e.data);
+            const protocolo = location.protocol === 'https:' ? 'wss:' : 'ws:';
+            const socket = new WebSocket(
+                `${protocolo}//${location.host}/api/audio/en-vivo?frecuencia=${contexto.sampleRate}&canales=1&formato=s16`
+            );
+            socket.binaryType = 'arraybuffer';
+            grabacion = { stream, contexto, fuente, socket };
+            let bins = 0; // Bins del espectro en cada fotograma, según el mensaje de inicio
+            
+            // float32 → int16: la mitad de bytes por la red
+            captura.port.onmessage = e => {
+                if (socket.readyState !== WebSocket.OPEN) return;
+                const bloque = e.data;
+                const pcm = new Int16Array(bloque.length);
+                for (let i = 0; i < bloque.length; i++) {
+                    const valor = Math.max(-1, Math.min(1, bloque[i]));
+                    pcm[i] = valor < 0 ? valor * 32768 : valor * 32767;
+                }
+                socket.send(pcm.buffer);
             };
             
-            mediaRecorder.onstop = () => {
-                const blob = new Blob(audioChunks, { type: 'audio/webm' });
-                blobGrabado = blob;
-                audioPreview.src = URL.createObjectURL(blob);
-                audioPreviewContainer.classList.remove('d-none');
-                inputAudio.value = '';
-                mostrarNotificacion('Éxito', 'Audio grabado exitosamente', 'success');
+            socket.onopen = () => {
+                fuente.connect(captura);
             };
             
-            mediaRecorder.start();
+            socket.onmessage = async e => {
+                if (e.data instanceof ArrayBuffer) {
+                    graficarFotograma(new Float32Array(e.data), bins);
+                    return;
+                }
+                const mensaje = JSON.parse(e.data);
+                if (mensaje.tipo === 'inicio') {
+                    bins = mensaje.bins;
+                } else if (mensaje.tipo === 'finalizado') {
+                    inputAudio.value = '';
+                    archivoIdActual = mensaje.archivo_id;
+                    audioPreview.src = `/api/audio/descargar/${archivoIdActual}`;
+                    audioPreviewContainer.classList.remove('d-none');
+                    mostrarNotificacion('Éxito', 'Audio grabado exitosamente', 'success');
+                    await mostrarArchivoSubido();
+                } else if (mensaje.tipo === 'error') {
+                    mostrarMensaje('Error en la grabación: ' + mensaje.detalle, 'error');
+                    detenerCaptura();
+                }
+            };
+            
+            socket.onerror = () => {
+                mostrarMensaje('Se perdió la conexión con el servidor durante la grabación', 'error');
+                detenerCaptura();
+            };
             
         } catch (error) {
             mostrarMensaje('Error al acceder al micrófono: ' + error.message, 'error');
-            btnGrabar.classList.remove('d-none');
-            btnDetener.classList.add('d-none');
-            grabandoLabel.classList.add('d-none');
+            detenerCaptura();
         }
     });
 
-    btnDetener.addEventListener('click', function () {
-        if (mediaRecorder && mediaRecorder.state === 'recording') {
-            mediaRecorder.stop();
-            mediaRecorder.stream.getTracks().forEach(track => track.stop());
+    // Dejar de capturar; con `finalizar` se pide al servidor que guarde la grabación
+    function detenerCaptura(finalizar = false) {
+        if (grabacion) {
+            const { stream, contexto, fuente, socket } = grabacion;
+            fuente.disconnect();
+            stream.getTracks().forEach(track => track.stop());
+            contexto.close();
+            if (finalizar && socket.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ tipo: 'fin' }));
+            } else if (socket.readyState <= WebSocket.OPEN) {
+                socket.close();
+            }
+            grabacion = null;
         }
         btnGrabar.classList.remove('d-none');
         btnDetener.classList.add('d-none');
         grabandoLabel.classList.add('d-none');
+        grabandoLabel.innerHTML = '<i class="fas fa-circle"></i> Grabando...';
+    }
+
+    btnDetener.addEventListener('click', function () {
+        detenerCaptura(true);
     });
 
     // Subir audio (grabado o cargado)
@@ -173,15 +224,18 @@ document.addEventListener('DOMContentLoaded', function () {
         // Ocultar reproductor convertido al subir nuevo audio
         document.getElementById('app-reproductor-convertido').classList.add('d-none');
         
-        let archivo = inputAudio.files[0];
-        if (!archivo && blobGrabado) {
-            archivo = new File([blobGrabado], 'grabacion.webm', { type: 'audio/webm' });
-        }
+        const archivo = inputAudio.files[0];
         if (!archivo) {
             mostrarMensaje('Selecciona o graba un archivo de audio.', 'error');
             return;
         }
         
+        // Varios archivos o un comprimido: una sola petición al endpoint de lote
+        if (inputAudio.files.length > 1 || /\.(zip|tar|tgz|gz|bz2|tbz2|xz|txz)$/i.test(archivo.name)) {
+            await subirLote(inputAudio.files);
+            return;
+        }
+        
         const formData = new FormData();
         formData.append('audio', archivo);
         
@@ -199,28 +253,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 console.log('Archivo subido exitosamente, mostrando mensaje...'); // Debug
                 mostrarNotificacion('Archivo Subido', '✅ ¡Audio subido exitosamente! El archivo está listo para procesar.', 'success');
                 archivoIdActual = data.archivo_id; // Guardar el ID
-                await actualizarVisualizacion();
-                
-                // Actualizar y mostrar el reproductor de audio convertido
-                const appReproductor = document.getElementById('app-reproductor-convertido');
-                const audioPlayer = document.getElementById('audio-convertido-preview');
-                
-                // Se agrega un timestamp para evitar que el navegador use una versión en caché del audio
-                const audioUrl = `/api/audio/descargar/${archivoIdActual}?t=${new Date().getTime()}`;
-                
-                audioPlayer.src = audioUrl;
-                audioPlayer.load();
-                appReproductor.classList.remove('d-none');
-                
-                // Animación de entrada
-                appReproductor.style.opacity = '0';
-                appReproductor.style.transform = 'translateY(20px)';
-                setTimeout(() => {
-                    appReproductor.style.transition = 'all 0.5s ease';
-                    appReproductor.style.opacity = '1';
-                    appReproductor.style.transform = 'translateY(0)';
-                }, 100);
-
+                await mostrarArchivoSubido();
             } else {
                 mostrarMensaje(data.detail || data.error || 'Error al subir audio.', 'error');
             }
@@ -229,6 +262,87 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
+    // Subir varios archivos o comprimidos; los resultados llegan como NDJSON
+    // a medida que el servidor termina cada archivo
+    async function subirLote(archivos) {
+        const formData = new FormData();
+        for (const archivo of archivos) {
+            formData.append('audios', archivo);
+        }
+        
+        mostrarLoading(mensajeAudio);
+        
+        try {
+            const resp = await fetch('/api/audio/subir-lote', { method: 'POST', body: formData });
+            if (!resp.ok) {
+                const data = await resp.json();
+                mostrarMensaje(data.detail || 'Error al subir el lote.', 'error');
+                return;
+            }
+            
+            const lector = resp.body.pipeThrough(new TextDecoderStream()).getReader();
+            let pendiente = '';
+            let primerId = null;
+            let resumen = null;
+            while (true) {
+                const { value, done } = await lector.read();
+                if (done) break;
+                pendiente += value;
+                const lineas = pendiente.split('\n');
+                pendiente = lineas.pop();
+                for (const texto of lineas.filter(Boolean)) {
+                    const resultado = JSON.parse(texto);
+                    if (resultado.fin) {
+                        resumen = resultado;
+                    } else if (resultado.error) {
+                        mostrarMensaje(`${resultado.nombre}: ${resultado.error}`, 'error');
+                    } else {
+                        primerId = primerId || resultado.archivo_id;
+                        mensajeAudio.innerHTML = `<span class="loading-spinner"></span> ${resultado.nombre} listo`;
+                    }
+                }
+            }
+            
+            mensajeAudio.classList.add('d-none');
+            if (resumen) {
+                if (resumen.error) mostrarMensaje(resumen.error, 'error');
+                mostrarNotificacion('Lote Subido', `✅ ${resumen.correctos} de ${resumen.total} archivos listos para procesar.`, 'success');
+            }
+            if (primerId) {
+                archivoIdActual = primerId;
+                await mostrarArchivoSubido();
+            }
+        } catch (error) {
+            mostrarMensaje('Error de conexión: ' + error.message, 'error');
+        }
+    }
+
+    // Mostrar la visualización y el reproductor del archivo recién subido o grabado
+    async function mostrarArchivoSubido() {
+        await actualizarVisualizacion();
+        
+        // Actualizar y mostrar el reproductor de audio convertido
+        const appReproductor = document.getElementById('app-reproductor-convertido');
+        const audioPlayer = document.getElementById('audio-convertido-preview');
+        
+        // Se agrega un timestamp para evitar que el navegador use una versión en caché del audio
+        const audioUrl = `/api/audio/descargar/${archivoIdActual}?t=${new Date().getTime()}`;
+        
+        audioPlayer.src = audioUrl;
+        audioPlayer.load();
+        appReproductor.classList.remove('d-none');
+        
+        // Animación de entrada
+        appReproductor.style.opacity = '0';
+        appReproductor.style.transform = 'translateY(20px)';
+        setTimeout(() => {
+            appReproductor.style.transition = 'all 0.5s ease';
+            appReproductor.style.opacity = '1';
+            appReproductor.style.transform = 'translateY(0)';
+        }, 100);
+    }
+
+
     // Convertir audio
     formConversion.addEventListener('submit', async function (e) {
         e.preventDefault();
@@ -247,14 +361,21 @@ document.addEventListener('DOMContentLoaded', function () {
 
             mostrarLoading(mensajeConversion);
             
-            const resp = await fetch(`/api/audio/convertir/${archivoIdActual}`, {
+            // La conversión se encola y el progreso llega por Server-Sent Events
+            const resp = await fetch(`/api/audio/trabajos/convertir/${archivoIdActual}`, {
                 method: 'POST',
                 body: formData
             });
 
-            const data = await resp.json();
+            const trabajo = await resp.json();
+            if (!resp.ok) {
+                mostrarMensaje(`Error del servidor: ${trabajo.detail || trabajo.error || 'Error desconocido.'}`, 'error');
+                return;
+            }
 
-            if (resp.ok) {
+            const data = await seguirTrabajo(trabajo.trabajo_id);
+
+            if (data.estado === 'completado') {
                 mostrarNotificacion('Conversión Completada', '🎵 ¡Audio convertido exitosamente! El archivo procesado está listo.', 'success');
                 archivoIdActual = data.archivo_id; 
                 await actualizarVisualizacion();
@@ -278,7 +399,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 }, 100);
 
             } else {
-                mostrarMensaje(`Error del servidor: ${data.detail || data.error || 'Error desconocido.'}`, 'error');
+                mostrarMensaje(`Error del servidor: ${data.error || 'Error desconocido.'}`, 'error');
             }
         } catch (error) {
             console.error('Error en la función de conversión:', error);
@@ -286,6 +407,27 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
+    // Seguir un trabajo en segundo plano hasta que termine, mostrando el progreso
+    function seguirTrabajo(trabajoId) {
+        return new Promise((resolve, reject) => {
+            const fuente = new EventSource(`/api/audio/trabajos/${trabajoId}/eventos`);
+            fuente.onmessage = function (evento) {
+                const estado = JSON.parse(evento.data);
+                if (estado.estado === 'en_proceso') {
+                    mensajeConversion.innerHTML = `<span class="loading-spinner"></span> Procesando... ${estado.porcentaje.toFixed(0)}% (${estado.velocidad.toFixed(1)}x)`;
+                }
+                if (estado.estado === 'completado' || estado.estado === 'error') {
+                    fuente.close();
+                    resolve(estado);
+                }
+            };
+            fuente.onerror = function () {
+                fuente.close();
+                reject(new Error('Se perdió la conexión con el servidor'));
+            };
+        });
+    }
+
     // Descargar audio procesado
     btnDescargar.addEventListener('click', function (e) {
         if (!archivoIdActual) {
@@ -304,24 +446,40 @@ document.addEventListener('DOMContentLoaded', function () {
     });
 
     // Visualización de forma de onda y espectro
+    // Pedir columnas numéricas en binario (float32 little-endian, filas × columnas)
+    async function obtenerColumnas(url) {
+        const resp = await fetch(url, { headers: { 'Accept': 'application/octet-stream' } });
+        if (!resp.ok) return null;
+        const [filas, cantidadColumnas] = resp.headers.get('X-Forma').split(',').map(Number);
+        const nombres = resp.headers.get('X-Columnas').split(',');
+        const matriz = new Float32Array(await resp.arrayBuffer());
+        const columnas = {};
+        nombres.forEach((nombre, j) => {
+            const columna = new Float32Array(filas);
+            for (let i = 0; i < filas; i++) {
+                columna[i] = matriz[i * cantidadColumnas + j];
+            }
+            columnas[nombre] = columna;
+        });
+        return columnas;
+    }
+
     async function actualizarVisualizacion() {
         if (!archivoIdActual) return;
 
         try {
             // Forma de onda
-            const respOnda = await fetch(`/api/audio/forma-onda/${archivoIdActual}`);
-            const dataOnda = await respOnda.json();
-            if (respOnda.ok && dataOnda.muestras) {
-                graficarFormaOnda(dataOnda.muestras);
+            const onda = await obtenerColumnas(`/api/audio/forma-onda/${archivoIdActual}`);
+            if (onda) {
+                graficarFormaOnda(onda.minimos, onda.maximos);
             } else {
-                graficarFormaOnda([]);
+                graficarFormaOnda([], []);
             }
             
             // Espectro
-            const respEspectro = await fetch(`/api/audio/espectro/${archivoIdActual}`);
-            const dataEspectro = await respEspectro.json();
-            if (respEspectro.ok && dataEspectro.magnitudes) {
-                graficarEspectro(dataEspectro.magnitudes);
+            const espectro = await obtenerColumnas(`/api/audio/espectro/${archivoIdActual}`);
+            if (espectro) {
+                graficarEspectro(espectro.magnitudes);
             } else {
                 graficarEspectro([]);
             }
@@ -330,12 +488,20 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
-    // Graficar forma de onda con mejor diseño
-    function graficarFormaOnda(datos) {
+    // Fotograma de la grabación en vivo: [duración, mínimos, máximos, magnitudes]
+    function graficarFotograma(datos, bins) {
+        const puntos = (datos.length - 1 - bins) / 2;
+        grabandoLabel.innerHTML = `<i class="fas fa-circle"></i> Grabando... ${datos[0].toFixed(1)} s`;
+        graficarFormaOnda(datos.subarray(1, 1 + puntos), datos.subarray(1 + puntos, 1 + 2 * puntos));
+        graficarEspectro(datos.subarray(1 + 2 * puntos));
+    }
+
+    // Graficar la envolvente (mínimo/máximo por punto) de la forma de onda
+    function graficarFormaOnda(minimos, maximos) {
         const ctx = canvasOnda.getContext('2d');
         ctx.clearRect(0, 0, canvasOnda.width, canvasOnda.height);
         
-        if (datos.length === 0) {
+        if (minimos.length === 0) {
             // Mostrar mensaje cuando no hay datos
             ctx.fillStyle = '#a8a8a8';
             ctx.font = '14px Arial';
@@ -350,24 +516,37 @@ document.addEventListener('DOMContentLoaded', function () {
         gradient.addColorStop(0.5, '#764ba2');
         gradient.addColorStop(1, '#667eea');
         
-        ctx.beginPath();
-        ctx.strokeStyle = gradient;
-        ctx.lineWidth = 3;
-        ctx.lineCap = 'round';
-        ctx.lineJoin = 'round';
+        // Escalar por la amplitud máxima, centrado en el eje
+        let amplitud = 0;
+        for (let i = 0; i < minimos.length; i++) {
+            amplitud = Math.max(amplitud, Math.abs(minimos[i]), Math.abs(maximos[i]));
+        }
+        amplitud = amplitud || 1;
+        const mitad = canvasOnda.height / 2;
+        const paso = canvasOnda.width / minimos.length;
+        const y = valor => mitad - (valor / amplitud) * mitad;
         
-        for (let i = 0; i < datos.length; i++) {
-            const x = (i / datos.length) * canvasOnda.width;
-            const y = (1 - (datos[i] - Math.min(...datos)) / (Math.max(...datos) - Math.min(...datos) || 1)) * canvasOnda.height;
-            if (i === 0) ctx.moveTo(x, y);
-            else ctx.lineTo(x, y);
+        // Contorno superior (máximos) y regreso por el inferior (mínimos)
+        ctx.beginPath();
+        for (let i = 0; i < maximos.length; i++) {
+            const x = i * paso;
+            if (i === 0) ctx.moveTo(x, y(maximos[i]));
+            else ctx.lineTo(x, y(maximos[i]));
         }
+        for (let i = minimos.length - 1; i >= 0; i--) {
+            ctx.lineTo(i * paso + paso, y(minimos[i]));
+        }
+        ctx.closePath();
         
-        ctx.stroke();
+        ctx.fillStyle = gradient;
+        ctx.strokeStyle = gradient;
+        ctx.lineWidth = 1;
+        ctx.lineJoin = 'round';
         
         // Agregar sombra
         ctx.shadowColor = 'rgba(102, 126, 234, 0.5)';
         ctx.shadowBlur = 10;
+        ctx.fill();
         ctx.stroke();
         ctx.shadowBlur = 0;
     }
@@ -412,7 +591,7 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     // Inicializar visualización vacía
-    graficarFormaOnda([]);
+    graficarFormaOnda([], []);
     graficarEspectro([]);
     
     // Agregar animación de entrada a las tarjetas